@@ -0,0 +1,86 @@
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .roles import PROFILE_RELATIONS, get_role_context
+from .tokens import TOKEN_VERSION_CLAIM, current_token_version, has_role_claims, role_context_from_claims
+
+
+class RoleJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that loads the user together with its student, teacher
+    and parent profiles in one query and primes the request's RoleContext.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = self.user_model.objects.select_related(*PROFILE_RELATIONS).get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        get_role_context(user)
+        return user
+
+
+class ClaimsUser(TokenUser):
+    """A user backed only by token claims, with its RoleContext pre-built"""
+
+    def __init__(self, token):
+        super().__init__(token)
+        self._role_context = role_context_from_claims(token)
+
+    @cached_property
+    def role(self):
+        return self.token.get("role", "")
+
+
+class StatelessJWTAuthentication(RoleJWTAuthentication):
+    """
+    Authenticate safe (read-only) requests from token claims alone.
+
+    Tokens issued by RoleTokenObtainPairSerializer embed the role, staff
+    flag and profile ids, so GET/HEAD/OPTIONS requests never load the user
+    row; only the token version is checked, normally from cache. Unsafe
+    methods, and tokens without the claims, fall back to loading the user;
+    their version is checked too, a missing one counting as 0. Creating or
+    deleting a profile bumps the version (accounts.signals), so profile ids
+    in older tokens are never trusted.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        if request.method in SAFE_METHODS and has_role_claims(validated_token):
+            user = ClaimsUser(validated_token)
+            self.check_token_version(validated_token, current_token_version(user.id))
+            return user, validated_token
+
+        user = self.get_user(validated_token)
+        self.check_token_version(validated_token, user.token_version)
+        return user, validated_token
+
+    def check_token_version(self, validated_token, current_version):
+        if current_version is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        # Tokens issued without the claim predate any revocation, i.e. version 0
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != current_version:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from accounts.authentication import RoleJWTAuthentication, StatelessJWTAuthentication
+from accounts.models import User
+from accounts.roles import get_role_context
+from accounts.serializers import RoleTokenObtainPairSerializer
+
+BACKENDS = [JWTAuthentication, RoleJWTAuthentication, StatelessJWTAuthentication]
+
+
+class Command(BaseCommand):
+    help = "Compare authenticated requests/sec and queries/request of the JWT backends on a GET"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True, help="Existing user to mint a token for")
+        parser.add_argument("--requests", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist")
+
+        token = str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+        factory = RequestFactory()
+        total = options["requests"]
+
+        self.stdout.write(f"{'backend':<30}{'req/s':>12}{'queries/req':>14}")
+        for backend_class in BACKENDS:
+            backend = backend_class()
+            # The role context lookup is part of what each backend costs per request
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(total):
+                    request = Request(factory.get("/api/classes/classes/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+                    authenticated, _ = backend.authenticate(request)
+                    get_role_context(authenticated)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{backend_class.__name__:<30}{total / elapsed:>12.0f}{len(queries) / total:>14.2f}"
+            )
+
@@ -0,0 +1,52 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from backend.renderers import CSVRenderer
+from accounts import services
+from accounts.passwords import available_cores
+
+
+def write_tokens(stdout, created, path):
+    """Write username,uid,token CSV rows of `created` accounts to `path`, or to `stdout`"""
+    rows = ((user["username"], user["uid"], user["token"]) for user in created)
+    chunks = CSVRenderer().stream(["username", "uid", "token"], rows)
+    if path:
+        with open(path, "wb") as output:
+            for chunk in chunks:
+                output.write(chunk)
+    else:
+        stdout.write(b"".join(chunks).decode(), ending="")
+
+
+class Command(BaseCommand):
+    help = (
+        "Create accounts from a CSV file (username, role, email, first_name, last_name, password), "
+        "hashing passwords on every core, or issue first-login setup tokens instead of hashing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="CSV file with a header row")
+        parser.add_argument("--first-login", action="store_true",
+                            help="Leave passwords unset and write a setup token per account to --tokens")
+        parser.add_argument("--tokens", help="Where to write username,uid,token rows (default: stdout)")
+        parser.add_argument("--workers", type=int, help=f"Hashing processes (default: {available_cores()})")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["file"], newline="", encoding="utf-8-sig") as lines:
+                rows = list(csv.DictReader(lines))
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        started = time.perf_counter()
+        created, errors = services.create_users(rows, first_login=options["first_login"], workers=options["workers"])
+        elapsed = time.perf_counter() - started
+
+        for error in errors:
+            # Header is line 1
+            self.stderr.write(f"line {error['index'] + 2}: {error['errors']}")
+        if options["first_login"]:
+            write_tokens(self.stdout, created, options["tokens"])
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        self.stderr.write(style(f"Created {len(created)} user(s) in {elapsed:.1f}s; {len(errors)} row(s) rejected"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts import services
+from accounts.management.commands.create_users import write_tokens
+
+
+class Command(BaseCommand):
+    help = "Issue fresh first-login setup tokens for accounts that have not set a password yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="+")
+        parser.add_argument("--tokens", help="Where to write username,uid,token rows (default: stdout)")
+
+    def handle(self, *args, **options):
+        issued, errors = services.issue_setup_tokens(options["usernames"])
+        for error in errors:
+            self.stderr.write(f"{error['username']}: {error['error']}")
+        if not issued:
+            raise CommandError("No setup tokens issued.")
+        write_tokens(self.stdout, issued, options["tokens"])
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        self.stderr.write(style(f"Issued {len(issued)} setup token(s); {len(errors)} username(s) skipped"))
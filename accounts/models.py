@@ -2,7 +2,11 @@ from django.db import models
 
 # Create your models here.
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Now
+
+# Changing any of these invalidates previously issued JWTs (see accounts.tokens)
+TOKEN_SENSITIVE_FIELDS = ("role", "is_staff", "is_active")
 
 class User(AbstractUser):
     class Roles(models.TextChoices):
@@ -12,7 +16,37 @@ class User(AbstractUser):
         ADMIN   = "admin",   "Admin"
 
     role = models.CharField(max_length=20, choices=Roles.choices, default=Roles.STUDENT)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+    # Feeds the conditional GET validators of views that embed user names (backend.conditional)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
 
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_token_state = instance._token_state()
+        return instance
+
+    def _token_state(self):
+        return tuple(self.__dict__.get(name) for name in TOKEN_SENSITIVE_FIELDS)
+
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self._revoke_tokens = True
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, "_loaded_token_state", None)
+        if getattr(self, "_revoke_tokens", False) or (loaded is not None and loaded != self._token_state()):
+            self.token_version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "token_version"}
+        super().save(*args, **kwargs)
+        self._revoke_tokens = False
+        self._loaded_token_state = self._token_state()
+
+        from .tokens import publish_token_version
+        pk, version = self.pk, self.token_version
+        transaction.on_commit(lambda: publish_token_version(pk, version))
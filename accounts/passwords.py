@@ -0,0 +1,116 @@
+"""
+Password hashing for bulk provisioning, and first-login setup tokens.
+
+A PBKDF2 hash costs a few hundred milliseconds of CPU by design, so hashing
+thousands of passwords one after another dominates any bulk user creation.
+hash_passwords() spreads the work over a process pool, one worker per core;
+each worker runs django.setup() so it hashes with the same PASSWORD_HASHERS.
+
+Accounts provisioned for "set password on first login" skip hashing
+altogether: they get an unusable password, and a setup token that lets the
+user choose one (see SetupPasswordSerializer). The token is derived from the
+password field, so it stops working once a password has been set. Tokens
+expire after ACCOUNT_SETUP_TOKEN_TIMEOUT seconds (30 days by default, not
+the much shorter PASSWORD_RESET_TIMEOUT); `manage.py issue_setup_tokens` or
+POST /users/setup-tokens/ issue fresh ones.
+"""
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, UNUSABLE_PASSWORD_SUFFIX_LENGTH, make_password
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes
+from django.utils.http import base36_to_int, urlsafe_base64_encode
+
+# Fewer passwords than this are hashed in-process; starting workers costs more
+PARALLEL_THRESHOLD = 8
+
+SETUP_TOKEN_TIMEOUT = 30 * 24 * 3600
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS/Windows
+        return os.cpu_count() or 1
+
+
+def _init_worker(settings_module, hashers):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+    settings.PASSWORD_HASHERS = hashers
+
+
+def unusable_password():
+    """Same shape as make_password(None), without drawing 40 characters one by one"""
+    return UNUSABLE_PASSWORD_PREFIX + secrets.token_hex(UNUSABLE_PASSWORD_SUFFIX_LENGTH // 2)
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Return make_password() of every item of `passwords`, in order.
+
+    Empty or None passwords become unusable ones without hashing. The rest
+    are hashed by up to `workers` processes (default: one per core).
+    """
+    passwords = list(passwords)
+    hashed = [unusable_password() if not password else None for password in passwords]
+    pending = [index for index, password in enumerate(passwords) if password]
+    workers = min(workers or available_cores(), len(pending))
+
+    if workers <= 1 or len(pending) < PARALLEL_THRESHOLD:
+        results = [make_password(passwords[index]) for index in pending]
+    else:
+        # spawn rather than fork: forked children would share the parent's database connections
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(settings.SETTINGS_MODULE, list(settings.PASSWORD_HASHERS)),
+        ) as pool:
+            chunksize = max(1, len(pending) // (workers * 4))
+            results = list(pool.map(make_password, (passwords[index] for index in pending), chunksize=chunksize))
+
+    for index, encoded in zip(pending, results):
+        hashed[index] = encoded
+    return hashed
+
+
+class SetupTokenGenerator(PasswordResetTokenGenerator):
+    """
+    Password reset tokens under their own salt and timeout, valid only while
+    no password is set
+    """
+    key_salt = "accounts.passwords.SetupTokenGenerator"
+
+    @property
+    def timeout(self):
+        return getattr(settings, "ACCOUNT_SETUP_TOKEN_TIMEOUT", SETUP_TOKEN_TIMEOUT)
+
+    def check_token(self, user, token):
+        # As PasswordResetTokenGenerator.check_token(), with self.timeout
+        if user is None or user.has_usable_password() or not token:
+            return False
+        try:
+            ts = base36_to_int(token.split("-")[0])
+        except ValueError:
+            return False
+        if self._num_seconds(self._now()) - ts > self.timeout:
+            return False
+        return any(
+            constant_time_compare(self._make_token_with_timestamp(user, ts, secret), token)
+            for secret in [self.secret, *self.secret_fallbacks]
+        )
+
+
+setup_token_generator = SetupTokenGenerator()
+
+
+def make_setup_token(user):
+    """Return (uid, token) for a user provisioned without a password"""
+    return urlsafe_base64_encode(force_bytes(user.pk)), setup_token_generator.make_token(user)
@@ -5,6 +5,8 @@ class IsSelfOrAdmin(BasePermission):
     Users can view/update themselves; admins can do anything.
     """
     def has_object_permission(self, request, view, obj):
-        if request.method in SAFE_METHODS and obj == request.user:
+        # Compare by pk: stateless authentication gives a token-backed user, not a model
+        is_self = obj.pk == request.user.pk
+        if request.method in SAFE_METHODS and is_self:
             return True
-        return request.user.is_staff or obj == request.user
+        return request.user.is_staff or is_self
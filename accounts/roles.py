@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import Optional
+
+PROFILE_RELATIONS = ("student_profile", "teacher_profile", "parent_profile")
+
+
+@dataclass(frozen=True)
+class RoleContext:
+    """
+    The caller's role and profile ids, resolved once per request.
+
+    Replaces `hasattr(user, "teacher_profile")`-style probes, each of which
+    costs a SELECT when the profile does not exist.
+    """
+    role: str = ""
+    is_staff: bool = False
+    student_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    parent_id: Optional[int] = None
+
+    @property
+    def is_student(self):
+        return self.student_id is not None
+
+    @property
+    def is_teacher(self):
+        return self.teacher_id is not None
+
+    @property
+    def is_parent(self):
+        return self.parent_id is not None
+
+
+ANONYMOUS = RoleContext()
+
+
+def _from_loaded_profiles(user):
+    """Build the context from profiles already fetched with select_related, if they all are"""
+    cache = user._state.fields_cache
+    if not all(name in cache for name in PROFILE_RELATIONS):
+        return None
+    ids = {name: getattr(cache[name], "pk", None) for name in PROFILE_RELATIONS}
+    return RoleContext(
+        role=user.role,
+        is_staff=user.is_staff,
+        student_id=ids["student_profile"],
+        teacher_id=ids["teacher_profile"],
+        parent_id=ids["parent_profile"],
+    )
+
+
+def get_role_context(user):
+    """Return the memoized RoleContext of `user`, resolving it in at most one query"""
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+    context = getattr(user, "_role_context", None)
+    if context is not None:
+        return context
+
+    context = _from_loaded_profiles(user) if hasattr(user, "_state") else None
+    if context is None:
+        from django.contrib.auth import get_user_model
+
+        row = get_user_model().objects.filter(pk=user.pk).values(
+            "role", "is_staff", "student_profile__id", "teacher_profile__id", "parent_profile__id"
+        ).first() or {}
+        context = RoleContext(
+            role=row.get("role", ""),
+            is_staff=row.get("is_staff", False),
+            student_id=row.get("student_profile__id"),
+            teacher_id=row.get("teacher_profile__id"),
+            parent_id=row.get("parent_profile__id"),
+        )
+    user._role_context = context
+    return context
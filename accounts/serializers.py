@@ -1,6 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+from .passwords import setup_token_generator
+from .roles import PROFILE_RELATIONS
+from .tokens import TOKEN_VERSION_CLAIM, add_role_claims
 
 User = get_user_model()
 
@@ -29,3 +40,91 @@ class UserSerializer(serializers.ModelSerializer):
             instance.set_password(password)
         instance.save()
         return instance
+
+
+def _validate_password(password, user):
+    try:
+        validate_password(password, user)
+    except DjangoValidationError as exc:
+        raise serializers.ValidationError({"password": list(exc.messages)})
+
+
+class UserRowSerializer(serializers.Serializer):
+    """One account of a bulk creation (no database access; uniqueness is checked per batch)"""
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    role = serializers.ChoiceField(choices=User.Roles.choices)
+    email = serializers.EmailField(required=False, allow_blank=True, default="")
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default="")
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default="")
+    # Blank leaves the account with an unusable password
+    password = serializers.CharField(required=False, allow_blank=True, default="", trim_whitespace=False)
+
+    def validate(self, attrs):
+        if attrs["password"]:
+            user = User(**{name: attrs[name] for name in ("username", "email", "first_name", "last_name")})
+            _validate_password(attrs["password"], user)
+        return attrs
+
+
+class BulkUserCreateSerializer(serializers.Serializer):
+    """Body of POST /users/bulk/; rows are validated one by one by accounts.services.create_users()"""
+    users = serializers.ListField(allow_empty=False)
+    first_login = serializers.BooleanField(required=False, default=False)
+
+
+class SetupTokensSerializer(serializers.Serializer):
+    """Body of POST /users/setup-tokens/"""
+    usernames = serializers.ListField(child=serializers.CharField(max_length=150), allow_empty=False)
+
+
+class SetupPasswordSerializer(serializers.Serializer):
+    """First login of an account provisioned without a password (see accounts.passwords)"""
+    uid = serializers.CharField()
+    token = serializers.CharField()
+    password = serializers.CharField(write_only=True, trim_whitespace=False)
+
+    def validate(self, attrs):
+        try:
+            user = User.objects.get(pk=force_str(urlsafe_base64_decode(attrs["uid"])))
+        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+            user = None
+        if not setup_token_generator.check_token(user, attrs["token"]):
+            raise serializers.ValidationError({"token": "Invalid or expired setup token."})
+        _validate_password(attrs["password"], user)
+        attrs["user"] = user
+        return attrs
+
+    def save(self):
+        user = self.validated_data["user"]
+        user.set_password(self.validated_data["password"])
+        user.last_login = timezone.now()
+        user.save(update_fields=["password", "last_login"])
+        return user
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issue tokens carrying role/profile claims for StatelessJWTAuthentication"""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_role_claims(super().get_token(user), user)
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh with claims re-read from the database, so new profiles or roles
+    show up; refresh tokens issued before a password or role change are refused.
+    """
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs["refresh"])
+        user = User.objects.select_related(*PROFILE_RELATIONS).filter(pk=refresh["user_id"]).first()
+        if user is None or not user.is_active:
+            raise InvalidToken("User not found or inactive")
+        if refresh.get(TOKEN_VERSION_CLAIM, 0) != user.token_version:
+            raise InvalidToken("Token has been revoked")
+
+        data = super().validate(attrs)
+        access = add_role_claims(refresh.access_token, user)
+        data["access"] = str(access)
+        return data
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import serializers
+from parents.models import Parent
+from students.models import Student
+from teachers.models import Teacher
+from .passwords import hash_passwords, make_setup_token
+from .serializers import UserRowSerializer
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+
+PROFILE_MODELS = {
+    User.Roles.STUDENT: Student,
+    User.Roles.TEACHER: Teacher,
+    User.Roles.PARENT: Parent,
+}
+
+
+def create_users(rows, first_login=False, workers=None):
+    """
+    Validate and create a batch of accounts, each with an empty profile for its role.
+
+    Passwords are hashed in a process pool (see accounts.passwords). With
+    `first_login` no password may be given and nothing is hashed; each
+    account gets a setup token instead. Returns (created, errors): created
+    is a list of {'id', 'username'} dicts (plus 'uid' and 'token' with
+    `first_login`) and errors a list of {'index': i, 'errors': {...}}
+    entries for rejected rows.
+    """
+    # One instance validates every row, so its fields are only built once
+    serializer = UserRowSerializer()
+    errors = []
+    valid = {}
+    for index, row in enumerate(rows):
+        try:
+            data = serializer.run_validation(row)
+        except serializers.ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.detail})
+            continue
+        if first_login and data['password']:
+            errors.append({'index': index, 'errors': {'password': ["Leave empty to set it on first login."]}})
+        elif not first_login and not data['password']:
+            errors.append({'index': index, 'errors': {'password': ["This field is required."]}})
+        elif data['username'] in valid:
+            errors.append({'index': index, 'errors': {'username': ["Duplicate username in this batch."]}})
+        else:
+            valid[data['username']] = (index, data)
+
+    taken = set(User.objects.filter(username__in=valid).values_list('username', flat=True))
+    for username in taken:
+        index, _ = valid.pop(username)
+        errors.append({'index': index, 'errors': {'username': ["A user with that username already exists."]}})
+    errors.sort(key=lambda error: error['index'])
+
+    rows = [data for _, data in valid.values()]
+    passwords = hash_passwords((data['password'] for data in rows), workers=workers)
+    users = [
+        User(
+            username=data['username'], email=data['email'],
+            first_name=data['first_name'], last_name=data['last_name'],
+            role=data['role'], is_staff=data['role'] == User.Roles.ADMIN,
+            password=password,
+        )
+        for data, password in zip(rows, passwords)
+    ]
+    with transaction.atomic():
+        users = User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        for role, model in PROFILE_MODELS.items():
+            model.objects.bulk_create(
+                (model(user=user) for user in users if user.role == role), batch_size=BATCH_SIZE
+            )
+
+    created = []
+    for user in users:
+        entry = {'id': user.pk, 'username': user.username}
+        if first_login:
+            entry['uid'], entry['token'] = make_setup_token(user)
+        created.append(entry)
+    return created, errors
+
+
+def issue_setup_tokens(usernames):
+    """
+    Issue fresh first-login setup tokens, e.g. for accounts whose token
+    expired. Only accounts that still have no password get one. Returns
+    (issued, errors): issued is a list of {'id', 'username', 'uid', 'token'}
+    dicts and errors a list of {'username', 'error'} entries.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+    issued = []
+    errors = []
+    for username in usernames:
+        user = users.get(username)
+        if user is None:
+            errors.append({'username': username, 'error': "Unknown user."})
+        elif user.has_usable_password():
+            errors.append({'username': username, 'error': "This account already has a password."})
+        else:
+            uid, token = make_setup_token(user)
+            issued.append({'id': user.pk, 'username': username, 'uid': uid, 'token': token})
+    return issued, errors
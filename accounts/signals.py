@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from parents.models import Parent
+from students.models import Student
+from teachers.models import Teacher
+from .tokens import revoke_tokens
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Parent)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Parent)
+def revoke_profile_claims(sender, instance, created=True, **kwargs):
+    """Tokens embed the user's profile ids; adding or removing a profile makes them stale"""
+    if not created:
+        return
+    revoke_tokens([instance.user_id])
+    # Keep a loaded user from writing its old version back on its next save()
+    user = instance._state.fields_cache.get("user")
+    if user is not None:
+        user.token_version += 1
@@ -1,3 +1,206 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password, is_password_usable
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from students.models import Student
+from teachers.models import Teacher
+from . import passwords as passwords_module
+from .authentication import RoleJWTAuthentication, StatelessJWTAuthentication
+from .models import User
+from .roles import get_role_context
+
+
+class RoleContextTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="teacher", role=User.Roles.TEACHER)
+        self.teacher = Teacher.objects.create(user=self.user)
+
+    def test_resolved_once_in_a_single_query(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            role = get_role_context(user)
+            get_role_context(user)
+        self.assertEqual(role.teacher_id, self.teacher.id)
+        self.assertFalse(role.is_student)
+
+    def test_jwt_authentication_primes_the_context(self):
+        Student.objects.create(user=self.user)
+        token = AccessToken.for_user(self.user)
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        with self.assertNumQueries(1):
+            user, _ = RoleJWTAuthentication().authenticate(request)
+            role = get_role_context(user)
+        self.assertTrue(role.is_teacher and role.is_student)
+        self.assertFalse(role.is_parent)
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="student", password="pass-Word-123")
+        self.student = Student.objects.create(user=self.user)
+        self.client = APIClient()
+        response = self.client.post(
+            "/api/accounts/token/", {"username": "student", "password": "pass-Word-123"}, format="json"
+        )
+        self.access = response.json()["access"]
+        self.refresh = response.json()["refresh"]
+
+    def authenticate(self, method="get"):
+        request = getattr(RequestFactory(), method)("/", HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        request.method = method.upper()
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_tokens_carry_role_claims(self):
+        token = AccessToken(self.access)
+        self.assertEqual(token["role"], User.Roles.STUDENT)
+        self.assertEqual(token["student_id"], self.student.id)
+        self.assertIsNone(token["teacher_id"])
+
+    def test_reads_do_not_touch_the_database(self):
+        self.authenticate()  # warms the token version cache
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+            self.assertEqual(get_role_context(user).student_id, self.student.id)
+
+    def test_writes_load_the_user(self):
+        user, _ = self.authenticate("post")
+        self.assertIsInstance(user, User)
+
+    def test_password_change_revokes_old_tokens(self):
+        url = "/api/accounts/users/%d/" % self.user.id
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.assertEqual(response.status_code, 200)
+
+        self.user.set_password("another-Pass-456")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post("/api/accounts/token/refresh/", {"refresh": self.refresh}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_tokens_without_a_version_are_checked_as_version_zero(self):
+        legacy = User.objects.create_user(username="legacy", password="pass-Word-123")
+        self.access = str(AccessToken.for_user(legacy))
+        user, _ = self.authenticate("post")
+        self.assertEqual(user, legacy)
+
+        legacy.set_password("another-Pass-456")
+        legacy.save()
+        for method in ("get", "post"):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(method)
+
+    def test_profile_changes_revoke_stale_profile_claims(self):
+        self.authenticate()  # warms the token version cache
+        with self.captureOnCommitCallbacks(execute=True):
+            teacher = Teacher.objects.create(user=self.user)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+        response = self.client.post(
+            "/api/accounts/token/", {"username": "student", "password": "pass-Word-123"}, format="json"
+        )
+        self.access = response.json()["access"]
+        user, _ = self.authenticate()
+        self.assertEqual(get_role_context(user).teacher_id, teacher.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class BulkUserCreationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="registrar", is_staff=True))
+
+    def test_creates_valid_rows_with_profiles(self):
+        response = self.client.post("/api/accounts/users/bulk/", {"users": [
+            {"username": "s.karimi", "role": "student", "password": "pass-Word-123"},
+            {"username": "s.karimi", "role": "student", "password": "pass-Word-123"},
+            {"username": "registrar", "role": "admin", "password": "pass-Word-123"},
+            {"username": "t.rahimi", "role": "teacher"},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 1)
+        self.assertEqual([error["index"] for error in response.json()["errors"]], [1, 2, 3])
+
+        user = User.objects.get(username="s.karimi")
+        self.assertTrue(user.check_password("pass-Word-123"))
+        self.assertTrue(Student.objects.filter(user=user).exists())
+
+    def test_first_login_issues_a_single_use_setup_token(self):
+        response = self.client.post("/api/accounts/users/bulk/", {"first_login": True, "users": [
+            {"username": "t.rahimi", "role": "teacher", "email": "neda@school.test"},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        created = response.json()["users"][0]
+        user = User.objects.get(username="t.rahimi")
+        self.assertFalse(user.has_usable_password())
+        self.assertTrue(Teacher.objects.filter(user=user).exists())
+
+        setup = {"uid": created["uid"], "token": created["token"], "password": "first-Pass-789"}
+        client = APIClient()
+        response = client.post("/api/accounts/users/setup-password/", {**setup, "token": "bogus"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = client.post("/api/accounts/users/setup-password/", setup, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.json()["access"])["teacher_id"], user.teacher_profile.id)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password("first-Pass-789"))
+        self.assertIsNotNone(user.last_login)
+
+        response = client.post("/api/accounts/users/setup-password/", setup, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(PASSWORD_RESET_TIMEOUT=60, ACCOUNT_SETUP_TOKEN_TIMEOUT=7 * 24 * 3600)
+    def test_setup_tokens_outlive_password_resets_and_can_be_reissued(self):
+        response = self.client.post("/api/accounts/users/bulk/", {"first_login": True, "users": [
+            {"username": "s.karimi", "role": "student"},
+        ]}, format="json")
+        created = response.json()["users"][0]
+        user = User.objects.get(username="s.karimi")
+        generator = passwords_module.setup_token_generator
+        issued_at = generator._now()
+        with mock.patch.object(type(generator), "_now", return_value=issued_at + timedelta(days=6)):
+            self.assertTrue(generator.check_token(user, created["token"]))
+        with mock.patch.object(type(generator), "_now", return_value=issued_at + timedelta(days=8)):
+            self.assertFalse(generator.check_token(user, created["token"]))
+
+        User.objects.create_user(username="has_password", password="pass-Word-123")
+        expired = issued_at + timedelta(days=8)
+        with mock.patch.object(type(generator), "_now", return_value=expired):
+            response = self.client.post("/api/accounts/users/setup-tokens/", {
+                "usernames": ["s.karimi", "has_password", "nobody"],
+            }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["username"] for row in response.json()["users"]], ["s.karimi"])
+        self.assertEqual([row["username"] for row in response.json()["errors"]], ["has_password", "nobody"])
+        token = response.json()["users"][0]["token"]
+        with mock.patch.object(type(generator), "_now", return_value=expired + timedelta(days=1)):
+            self.assertTrue(generator.check_token(user, token))
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(User.objects.create(username="nosy"))
+        response = self.client.post("/api/accounts/users/bulk/", {"users": []}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+    def test_hash_passwords_in_worker_processes(self):
+        passwords = [f"pass-{i}" for i in range(4)] + [""]
+        with mock.patch.object(passwords_module, "PARALLEL_THRESHOLD", 1):
+            hashed = passwords_module.hash_passwords(passwords, workers=2)
+        self.assertTrue(all(encoded.startswith("md5$") for encoded in hashed[:4]))
+        self.assertTrue(all(check_password(raw, encoded) for raw, encoded in zip(passwords, hashed[:4])))
+        self.assertFalse(is_password_usable(hashed[4]))
@@ -0,0 +1,68 @@
+"""
+JWT claims used by stateless authentication.
+
+Access tokens carry the caller's role, staff flag and profile ids, plus a
+`token_version` claim that must match User.token_version. The current
+version is cached so that validating it normally costs no query; with the
+default per-process LocMemCache other workers notice a bump within
+TOKEN_VERSION_CACHE_TIMEOUT seconds.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .roles import RoleContext, get_role_context
+
+TOKEN_VERSION_CLAIM = "token_version"
+ROLE_CLAIMS = ("role", "is_staff", "student_id", "teacher_id", "parent_id")
+
+
+def _cache_key(user_id):
+    return f"token_version:{user_id}"
+
+
+def _timeout():
+    return getattr(settings, "TOKEN_VERSION_CACHE_TIMEOUT", 60)
+
+
+def add_role_claims(token, user):
+    """Embed role, profile ids and the token version into `token`"""
+    role = get_role_context(user)
+    for claim in ROLE_CLAIMS:
+        token[claim] = getattr(role, claim)
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    return token
+
+
+def role_context_from_claims(token):
+    return RoleContext(**{claim: token.get(claim) for claim in ROLE_CLAIMS})
+
+
+def has_role_claims(token):
+    return TOKEN_VERSION_CLAIM in token and all(claim in token for claim in ROLE_CLAIMS)
+
+
+def publish_token_version(user_id, version):
+    cache.set(_cache_key(user_id), version, _timeout())
+
+
+def revoke_tokens(user_ids):
+    """Bump the token version of `user_ids`, e.g. after their profile ids changed"""
+    user_ids = list(user_ids)
+    if user_ids:
+        get_user_model().objects.filter(pk__in=user_ids).update(token_version=F("token_version") + 1)
+        transaction.on_commit(lambda: cache.delete_many([_cache_key(user_id) for user_id in user_ids]))
+
+
+def current_token_version(user_id):
+    """Return the user's token version, or None if the user is missing or inactive"""
+    key = _cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        row = get_user_model().objects.filter(pk=user_id).values_list("token_version", "is_active").first()
+        if row is None or not row[1]:
+            return None
+        version = row[0]
+        cache.set(key, version, _timeout())
+    return version
@@ -1,9 +1,14 @@
 from django.shortcuts import render
 
 # Create your views here.
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer
+from . import services
+from .serializers import (
+    BulkUserCreateSerializer, RoleTokenObtainPairSerializer, SetupPasswordSerializer, SetupTokensSerializer, UserSerializer
+)
 from .permissions import IsSelfOrAdmin
 
 User = get_user_model()
@@ -13,9 +18,42 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
 
     def get_permissions(self):
-        if self.action in ["create"]:
+        if self.action in ["create", "setup_password"]:
             return [permissions.AllowAny()]
-        elif self.action in ["list", "destroy"]:
+        elif self.action in ["list", "destroy", "bulk", "setup_tokens"]:
             return [permissions.IsAdminUser()]
         else:
             return [permissions.IsAuthenticated(), IsSelfOrAdmin()]
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Create many accounts at once. With "first_login": true no passwords
+        are hashed; each account gets a uid/token pair for setup-password.
+        """
+        params = BulkUserCreateSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        created, errors = services.create_users(
+            params.validated_data["users"], first_login=params.validated_data["first_login"]
+        )
+        if errors and not created:
+            return Response({"created": 0, "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"created": len(created), "users": created, "errors": errors}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="setup-tokens")
+    def setup_tokens(self, request):
+        """Issue fresh setup tokens for accounts that have not set a password yet (e.g. expired ones)"""
+        params = SetupTokensSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        issued, errors = services.issue_setup_tokens(params.validated_data["usernames"])
+        if errors and not issued:
+            return Response({"issued": 0, "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"issued": len(issued), "users": issued, "errors": errors})
+
+    @action(detail=False, methods=["post"], url_path="setup-password")
+    def setup_password(self, request):
+        """Set the first password of a pre-provisioned account and log it in"""
+        serializer = SetupPasswordSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        refresh = RoleTokenObtainPairSerializer.get_token(serializer.save())
+        return Response({"refresh": str(refresh), "access": str(refresh.access_token)})
@@ -0,0 +1,63 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    Answer list/retrieve GETs with 304 Not Modified when nothing changed.
+
+    The ETag is computed with a single aggregate (row count plus the latest
+    `updated_at`, to the microsecond) before any serialization happens. Set
+    `conditional_related` to relation paths whose `updated_at` also shows up
+    in the representation (e.g. nested serializers and embedded names).
+
+    No Last-Modified header is sent: a latest timestamp does not move when
+    a row is deleted or leaves the filtered set, and HTTP dates only have
+    whole seconds, so If-Modified-Since alone would answer 304 with stale
+    data. The count in the ETag catches both.
+    """
+    conditional_related = ()
+
+    def get_conditional_etag(self, queryset, related=None):
+        related = self.conditional_related if related is None else related
+        aggregates = {
+            'count': Count('pk', distinct=bool(related)),
+            'last': Max('updated_at'),
+        }
+        for path in related:
+            aggregates[f'{path}_count'] = Count(path, distinct=True)
+            aggregates[f'{path}_last'] = Max(f'{path}__updated_at')
+        values = queryset.order_by().aggregate(**aggregates)
+
+        fingerprint = "|".join(
+            [self.request.get_full_path(), str(self.request.user.pk)]
+            + [f"{key}={value.isoformat() if hasattr(value, 'isoformat') else value}"
+               for key, value in sorted(values.items())]
+        )
+        return 'W/"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    def conditional_response(self, queryset, respond, related=None):
+        """Return a 304 if the client's ETag still matches, otherwise `respond()`"""
+        etag = self.get_conditional_etag(queryset, related)
+        response = get_conditional_response(self.request._request, etag=etag)
+        if response is None:
+            response = respond()
+        response.headers['ETag'] = etag
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        def respond():
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data)
+
+        return self.conditional_response(self.get_queryset().filter(pk=instance.pk), respond)
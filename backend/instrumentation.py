@@ -0,0 +1,166 @@
+"""
+Per-request SQL and timing instrumentation.
+
+RequestMetricsMiddleware counts queries and DB time for every request,
+splits its duration into the view and rendering, fingerprints queries to
+spot N+1 patterns, and keeps a rolling window of samples per route for
+/api/_metrics/.
+
+Serializer time is not measured on its own: DRF serializes inside the view
+(`serializer.data`), so it is part of `view`, and `render` is only the
+renderer turning that data into bytes.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("backend.requests")
+
+_current = ContextVar("request_metrics", default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*(?:\?\s*,\s*)+\?\s*\)")
+
+
+def fingerprint(sql):
+    """Normalize literals so queries differing only in parameters compare equal"""
+    sql = _LITERALS.sub("?", sql.replace("%s", "?"))
+    return _IN_LISTS.sub("(?+)", sql)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_done = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+class RouteStats:
+    """Rolling window of request samples per route, shared by the worker's threads"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._totals = Counter()
+
+    def add(self, route, duration_ms, queries, db_ms):
+        with self._lock:
+            self._samples[route].append((duration_ms, queries, db_ms))
+            self._totals[route] += 1
+
+    def summary(self):
+        with self._lock:
+            samples = {route: list(values) for route, values in self._samples.items()}
+            totals = dict(self._totals)
+        return {
+            route: {
+                "requests": totals[route],
+                "window": len(values),
+                "p50_ms": _percentile([v[0] for v in values], 50),
+                "p95_ms": _percentile([v[0] for v in values], 95),
+                "p99_ms": _percentile([v[0] for v in values], 99),
+                "avg_queries": round(sum(v[1] for v in values) / len(values), 2),
+                "max_queries": max(v[1] for v in values),
+                "avg_db_ms": round(sum(v[2] for v in values) / len(values), 2),
+            }
+            for route, values in sorted(samples.items())
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+route_stats = RouteStats(getattr(settings, "REQUEST_METRICS_WINDOW", 1000))
+
+class RequestMetricsMiddleware:
+    """Record query count, DB, view and render time; emit Server-Timing headers and a log line"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.expose_headers = getattr(settings, "REQUEST_METRICS_HEADERS", settings.DEBUG)
+        self.duplicate_threshold = getattr(settings, "REQUEST_METRICS_DUPLICATE_THRESHOLD", 3)
+
+    def process_template_response(self, request, response):
+        # Called between the view and response.render(), which for DRF runs the renderer
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_done = time.perf_counter()
+        return response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        finished = time.perf_counter()
+        view_done = metrics.view_done or finished
+        duration_ms = (finished - metrics.started) * 1000
+        db_ms = metrics.db_time * 1000
+        view_ms = (view_done - metrics.started) * 1000
+        render_ms = (finished - view_done) * 1000
+        duplicates = metrics.duplicates(self.duplicate_threshold)
+        match = getattr(request, "resolver_match", None)
+        route = f"{request.method} {match.view_name if match else 'unresolved'}"
+
+        route_stats.add(route, duration_ms, metrics.queries, db_ms)
+        if self.expose_headers:
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={db_ms:.1f};desc="{metrics.queries} queries"',
+                f"view;dur={view_ms:.1f}",
+                f"render;dur={render_ms:.1f}",
+                f"total;dur={duration_ms:.1f}",
+            ])
+            response["X-Query-Count"] = str(metrics.queries)
+            if duplicates:
+                response["X-Duplicate-Queries"] = str(sum(count for _, count in duplicates))
+
+        log = logger.warning if duplicates else logger.info
+        log(json.dumps({
+            "route": route,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 2),
+            "queries": metrics.queries,
+            "db_ms": round(db_ms, 2),
+            "view_ms": round(view_ms, 2),
+            "render_ms": round(render_ms, 2),
+            "duplicate_queries": [{"sql": sql[:200], "count": count} for sql, count in duplicates[:5]],
+        }))
+        return response
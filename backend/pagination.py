@@ -0,0 +1,70 @@
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset, exact_below=1000):
+    """
+    Return the number of rows in `queryset` without counting large results.
+
+    Up to `exact_below` rows are counted exactly by a COUNT(*) over a LIMITed
+    subquery, so small tables (whose statistics may be missing or stale) and
+    selective filters get the real figure at a bounded cost. Beyond that the
+    planner's row estimate is returned; it comes from table statistics, so
+    it is cheap regardless of table size but can be off after large writes
+    until ANALYZE runs.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    queryset = queryset.order_by()
+    exact = queryset[:exact_below].count()
+    if exact < exact_below:
+        return exact
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return max(int(plan[0]['Plan']['Plan Rows']), exact_below)
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination over an indexed, stable ordering.
+
+    Pass `?total=estimate` to include an `estimated_total` taken from the
+    query planner rather than an exact COUNT(*); results smaller than
+    `exact_total_below` are counted exactly (see estimate_count).
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    total_query_param = 'total'
+    exact_total_below = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.estimated_total = None
+        if request.query_params.get(self.total_query_param) == 'estimate':
+            self.estimated_total = estimate_count(queryset, self.exact_total_below)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.estimated_total is not None:
+            payload['estimated_total'] = self.estimated_total
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['estimated_total'] = {'type': 'integer', 'example': 1200}
+        return response_schema
@@ -0,0 +1,139 @@
+"""
+orjson-backed JSON renderer and parser for DRF, plus streaming CSV and
+NDJSON renderers for exports.
+
+orjson encodes datetimes and UUIDs natively; everything else it does not
+know (decimals, lazy strings, querysets, ...) goes through DRF's own
+encoder, so output matches JSONRenderer. When orjson is not installed both
+classes behave exactly like DRF's JSONRenderer/JSONParser.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    orjson = None
+
+_drf_default = encoders.JSONEncoder().default
+
+# JSONRenderer escapes these so responses can be embedded in <script> tags
+_LINE_SEPARATOR = '\u2028'.encode()
+_PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """Drop-in JSONRenderer; any requested indent becomes orjson's two spaces"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=_drf_default, option=options)
+        if _LINE_SEPARATOR in ret or _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+def dumps(data):
+    """Compact JSON bytes, as ORJSONRenderer would render `data`"""
+    if orjson is None:
+        return json.dumps(data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    return orjson.dumps(data, default=_drf_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class StreamingRenderer(renderers.BaseRenderer):
+    """
+    Renderer for tabular exports. `stream(header, rows)` yields the encoded
+    output in chunks of about `chunk_bytes` for a StreamingHttpResponse;
+    `render()` handles ordinary (e.g. error) responses.
+    """
+    charset = 'utf-8'
+    chunk_bytes = 64 * 1024
+
+    def encode_rows(self, header, rows):
+        raise NotImplementedError
+
+    def stream(self, header, rows):
+        buffer = []
+        size = 0
+        for piece in self.encode_rows(header, rows):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= self.chunk_bytes:
+                yield b''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b''.join(buffer)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        header = list(records[0]) if records and isinstance(records[0], dict) else ['value']
+        rows = (
+            [record.get(name) for name in header] if isinstance(record, dict) else [record]
+            for record in records
+        )
+        return b''.join(self.encode_rows(header, rows))
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if hasattr(value, 'isoformat'):
+        return _drf_default(value)
+    return value
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def encode_rows(self, header, rows):
+        line = io.StringIO()
+        writer = csv.writer(line)
+        writer.writerow(header)
+        yield line.getvalue().encode()
+        for row in rows:
+            line.seek(0)
+            line.truncate()
+            writer.writerow([_csv_value(value) for value in row])
+            yield line.getvalue().encode()
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """One JSON object per line (application/x-ndjson)"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def encode_rows(self, header, rows):
+        for row in rows:
+            yield dumps(dict(zip(header, row))) + b'\n'
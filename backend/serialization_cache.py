@@ -0,0 +1,140 @@
+"""
+Per-object cache for serializer output, keyed by (serializer, model, pk, version).
+
+Each object has a version token stored in the cache: the time of its last
+invalidation. Saving or deleting the object issues a new token once the
+transaction commits (see classes.signals), so stale entries are never read
+again and simply age out of the LRU backend.
+
+Output is only stored when the instance was loaded after all of its tokens
+were issued (instances are stamped on load by stamp_loaded()). Otherwise a
+row read just before a write commits could be cached under the new token.
+
+Invalidations only reach processes that share the cache. With several
+workers, or when management commands write to the database, the
+`serializers` cache must be a shared backend (Redis, Memcached or the
+database cache; see SERIALIZER_CACHE_BACKEND in settings).
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'SERIALIZER_CACHE_ALIAS', 'serializers')]
+
+
+def _enabled():
+    return getattr(settings, 'SERIALIZER_CACHE_ENABLED', True)
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _version_key(label, pk):
+    return f"version:{label}:{pk}"
+
+
+def get_versions(refs):
+    """Return {(label, pk): token} for the given refs, issuing tokens for unseen objects"""
+    cache = _cache()
+    keys = {_version_key(label, pk): (label, pk) for label, pk in refs}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # Objects never invalidated get the oldest token, so already loaded
+        # rows are cacheable; add() so that concurrent first readers agree
+        cache.add(key, 0, None)
+        found[key] = cache.get(key, 0)
+    return {keys[key]: token for key, token in found.items()}
+
+
+def invalidate(model, pks):
+    """Issue new version tokens for `pks` once the current transaction commits"""
+    label = model._meta.label_lower
+    keys = [_version_key(label, pk) for pk in pks]
+    if not keys or not _enabled():
+        return
+
+    def bump():
+        token = time.time_ns()
+        _cache().set_many(dict.fromkeys(keys, token), None)
+        _count('invalidations', len(keys))
+
+    transaction.on_commit(bump)
+
+
+def stamp_loaded(sender, instance, **kwargs):
+    """post_init receiver recording when an instance was loaded (or built)"""
+    instance._serialization_loaded_at = time.time_ns()
+
+
+def stats():
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot['hits'] + snapshot['misses']
+    snapshot['hit_rate'] = round(snapshot['hits'] / lookups, 4) if lookups else None
+    return snapshot
+
+
+def _resolve_ref(instance, path):
+    """Follow a dotted relation path to a (model label, pk) pair without loading the last hop"""
+    parts = path.split('.')
+    obj = instance
+    for part in parts[:-1]:
+        obj = getattr(obj, part)
+    field = obj._meta.get_field(parts[-1])
+    return field.related_model._meta.label_lower, getattr(obj, field.attname)
+
+
+class CachedSerializerMixin:
+    """
+    Cache `to_representation()` per instance.
+
+    `cache_dependencies` lists dotted paths to related objects that also
+    appear in the output (e.g. 'teacher.user' for a teacher name); their
+    versions are folded into the key so editing them invalidates the entry.
+    """
+    cache_dependencies = ()
+
+    def get_cache_dependencies(self):
+        return self.cache_dependencies
+
+    def _cache_signature(self):
+        if not hasattr(self, '_signature'):
+            cls = type(self)
+            shape = ",".join(self.fields.keys())
+            self._signature = hashlib.sha1(f"{cls.__module__}.{cls.__qualname__}:{shape}".encode()).hexdigest()[:16]
+        return self._signature
+
+    def to_representation(self, instance):
+        if not _enabled() or instance.pk is None:
+            return super().to_representation(instance)
+
+        refs = [(instance._meta.label_lower, instance.pk)]
+        refs += [_resolve_ref(instance, path) for path in self.get_cache_dependencies()]
+        versions = get_versions(refs)
+        key = "serialized:%s:%s" % (
+            self._cache_signature(),
+            ":".join(f"{label}.{pk}.{versions[(label, pk)]}" for label, pk in refs),
+        )
+
+        cache = _cache()
+        data = cache.get(key)
+        if data is not None:
+            _count('hits')
+            return data
+        _count('misses')
+        data = super().to_representation(instance)
+        loaded_at = getattr(instance, '_serialization_loaded_at', None)
+        if loaded_at is not None and max(versions.values()) <= loaded_at:
+            cache.set(key, data)
+        return data
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     "rest_framework",
     "drf_spectacular",
@@ -68,6 +69,8 @@ AUTH_USER_MODEL = "accounts.User"
 MIDDLEWARE = [
     #هدرهای امنیتی (HSTS و …)
     "django.middleware.security.SecurityMiddleware",
+    # Query count, DB/view/render timing and N+1 detection (backend/instrumentation.py)
+    "backend.instrumentation.RequestMetricsMiddleware",
     #مدیریت سشن‌های سمت سرور.
     "django.contrib.sessions.middleware.SessionMiddleware",
     #بهینه‌سازی‌های عمومی (مثلاً APPEND_SLASH).
@@ -116,6 +119,7 @@ WSGI_APPLICATION = "backend.wsgi.application"
 
 
 import os
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -133,6 +137,54 @@ DATABASES = {
 
 
 
+# Caches
+# Serializer output is cached per object (see backend/serialization_cache.py).
+# LocMemCache evicts least-recently-used entries once MAX_ENTRIES is reached.
+# It is per process, so invalidations from other workers and from management
+# commands never reach it: in production, point SERIALIZER_CACHE_BACKEND (and
+# SERIALIZER_CACHE_LOCATION) at a shared backend such as Redis, Memcached or
+# the database cache.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "serializers": {
+        "BACKEND": os.getenv("SERIALIZER_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("SERIALIZER_CACHE_LOCATION", "serializers"),
+        "TIMEOUT": 3600,
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
+}
+
+SERIALIZER_CACHE_ALIAS = "serializers"
+SERIALIZER_CACHE_ENABLED = True
+
+
+# Request instrumentation
+# Server-Timing / X-Query-Count headers are only added when this is True.
+REQUEST_METRICS_HEADERS = DEBUG
+# A query fingerprint repeated this many times in one request is reported as an N+1 suspect.
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 3
+# Samples kept per route for the /api/_metrics/ percentiles.
+REQUEST_METRICS_WINDOW = 1000
+
+# One INFO line per request (WARNING for N+1 suspects); test runs only show the warnings.
+REQUEST_LOG_LEVEL = os.getenv("REQUEST_LOG_LEVEL", "WARNING" if sys.argv[1:2] == ["test"] else "INFO")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "backend.requests": {"handlers": ["console"], "level": REQUEST_LOG_LEVEL},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -195,18 +247,43 @@ from datetime import timedelta
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=2),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    # Embed role/profile claims so read-only requests skip the user query
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.serializers.RoleTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.RoleTokenRefreshSerializer",
 }
 
+# First-login setup tokens (accounts/passwords.py) stay valid this many seconds
+ACCOUNT_SETUP_TOKEN_TIMEOUT = int(os.getenv("ACCOUNT_SETUP_TOKEN_TIMEOUT", 30 * 24 * 3600))
+
+# Seconds a worker may keep trusting a cached User.token_version
+TOKEN_VERSION_CACHE_TIMEOUT = 60
+
 # DRF + drf-spectacular
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # Read-only requests authenticate from token claims; writes load the user
+        # with its profiles in one query (accounts.authentication.RoleJWTAuthentication)
+        "accounts.authentication.StatelessJWTAuthentication",
     ],
     # Optional: set a default permission
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
+    # orjson encoding/decoding; both fall back to DRF's stdlib json classes when
+    # orjson is not installed (backend/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "backend.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "backend.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    # Keyset pagination keeps deep pages as cheap as the first one
+    "DEFAULT_PAGINATION_CLASS": "backend.pagination.IdCursorPagination",
+    "PAGE_SIZE": 50,
 }
 
 SPECTACULAR_SETTINGS = {
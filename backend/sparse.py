@@ -0,0 +1,200 @@
+"""
+Sparse fieldsets (`?fields=`) and relation expansion (`?expand=`).
+
+Serializers using SparseFieldsMixin drop fields the client did not ask for
+and collapse nested relations it did not expand. Views using
+SparseFieldsViewMixin derive select_related/prefetch_related/only() from
+the resulting serializer, so the query fetches what will be rendered.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_names(value):
+    """Split a comma-separated query parameter; None when it is absent"""
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Shape a serializer from `fields` and `expand` in its context.
+
+    `fields` keeps only the named fields. Relations listed in
+    `expandable_fields` are nested only when named in `expand`; otherwise
+    to-one relations render as their primary key and to-many relations are
+    left out. Without the parameters the full shape is kept. Only the
+    top-level serializer is shaped; nested ones render as usual.
+
+    `source_fields` maps fields whose source is a property or method to the
+    model paths it reads, so querysets can be narrowed around them.
+    """
+    expandable_fields = ()
+    source_fields = {}
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_root():
+            return fields
+        requested = self.context.get('fields')
+        expand = self.context.get('expand')
+
+        if requested is not None:
+            readable = {name for name, field in fields.items() if not field.write_only}
+            unknown = requested - readable
+            if unknown:
+                raise serializers.ValidationError(
+                    {'fields': [f"Unknown field(s): {', '.join(sorted(unknown))}"]}
+                )
+            fields = {name: field for name, field in fields.items() if name in requested or field.write_only}
+
+        if expand is not None:
+            unknown = expand - set(self.expandable_fields)
+            if unknown:
+                raise serializers.ValidationError(
+                    {'expand': [f"Cannot expand: {', '.join(sorted(unknown))}"]}
+                )
+            for name in self.expandable_fields:
+                if name in expand or name not in fields:
+                    continue
+                field = fields.pop(name)
+                if not isinstance(field, serializers.ListSerializer):
+                    source = field.source if field.source != name else None
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, source=source)
+        return fields
+
+    def get_cache_dependencies(self):
+        # Skip relations nothing renders, so resolving them never hits the database
+        roots = set()
+        for name, field in self.fields.items():
+            roots.add(field.source.split('.')[0])
+            roots.update(path.split('__')[0] for path in self.source_fields.get(name, ()))
+        return tuple(path for path in super().get_cache_dependencies() if path.split('.')[0] in roots)
+
+
+def _join(prefix, name):
+    return f'{prefix}__{name}' if prefix else name
+
+
+def _add_all(model, prefix, only):
+    only.update(_join(prefix, field.name) for field in model._meta.concrete_fields)
+
+
+def _add_path(model, prefix, attrs, select, only, prefetch):
+    """Record what reading `attrs` (a field source) from `model` needs loaded"""
+    for position, attr in enumerate(attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # A property or method: it may read any column
+            _add_all(model, prefix, only)
+            return
+        path = _join(prefix, field.name)
+        if not field.is_relation:
+            only.add(path)
+            return
+        if field.many_to_many or field.one_to_many:
+            prefetch.append(path)
+            return
+        if position == len(attrs) - 1:
+            if field.concrete:
+                only.add(path)
+            else:
+                select.add(path)
+                _add_all(field.related_model, path, only)
+            return
+        select.add(path)
+        if field.concrete:
+            only.add(path)
+        model, prefix = field.related_model, path
+
+
+def plan_queryset(serializer, model, prefix=''):
+    """Return (select_related, only, prefetch_related) needed to render `serializer`"""
+    select, only, prefetch = set(), set(), []
+    _plan(serializer, model, prefix, select, only, prefetch)
+    return select, only, prefetch
+
+
+def _plan(serializer, model, prefix, select, only, prefetch):
+    # Foreign keys are cheap and read by permissions and cache keys
+    only.update(_join(prefix, field.name) for field in model._meta.concrete_fields if field.is_relation)
+    only.add(_join(prefix, model._meta.pk.name))
+    source_fields = getattr(serializer, 'source_fields', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in source_fields:
+            for path in source_fields[name]:
+                _add_path(model, prefix, path.split('__'), select, only, prefetch)
+            continue
+        if field.source == '*':
+            _add_all(model, prefix, only)
+            continue
+
+        many = isinstance(field, serializers.ListSerializer)
+        nested = field.child if many else field
+        if not isinstance(nested, serializers.BaseSerializer):
+            _add_path(model, prefix, field.source_attrs, select, only, prefetch)
+            continue
+
+        *hops, last = field.source_attrs
+        current, path = model, prefix
+        for attr in hops:
+            relation = current._meta.get_field(attr)
+            path = _join(path, relation.name)
+            select.add(path)
+            current = relation.related_model
+        relation = current._meta.get_field(last)
+        path = _join(path, relation.name)
+        if relation.one_to_many or relation.many_to_many:
+            related = relation.related_model
+            sub_select, sub_only, sub_prefetch = plan_queryset(nested, related)
+            if relation.one_to_many:
+                sub_only.add(relation.field.name)
+            queryset = related._default_manager.select_related(*sub_select).only(*sub_only)
+            prefetch.append(Prefetch(path, queryset=queryset.prefetch_related(*sub_prefetch)))
+        else:
+            select.add(path)
+            if relation.concrete:
+                only.add(path)
+            _plan(nested, relation.related_model, path, select, only, prefetch)
+
+
+class SparseFieldsViewMixin:
+    """
+    Pass `?fields=` and `?expand=` to the serializer and narrow the queryset
+    of `sparse_actions` to what it will render.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        request = getattr(self, 'request', None)
+        if request is not None and request.method in SAFE_METHODS and self.action in self.sparse_actions:
+            context['fields'] = parse_names(request.query_params.get('fields'))
+            context['expand'] = parse_names(request.query_params.get('expand'))
+        return context
+
+    def shape_queryset(self, queryset):
+        if getattr(self, 'request', None) is None or self.action not in self.sparse_actions:
+            return queryset
+        select, only, prefetch = plan_queryset(self.get_serializer(), queryset.model)
+        # Orderings are read back to build pagination cursors
+        ordering = getattr(self.paginator, 'ordering', None) or queryset.query.order_by or queryset.model._meta.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        only.update(name.lstrip('-') for name in ordering if isinstance(name, str))
+
+        queryset = queryset.select_related(None)
+        if select:
+            queryset = queryset.select_related(*select)
+        return queryset.prefetch_related(*prefetch).only(*only)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from .views import MetricsView, SerializationCacheStatsView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -10,6 +11,8 @@ urlpatterns = [
     path("api/teachers/", include("teachers.urls")),
     path("api/parents/", include("parents.urls")),
     path("api/classes/", include("classes.urls")),
+    path("api/_metrics/", MetricsView.as_view(), name="metrics"),
+    path("api/_metrics/serialization-cache/", SerializationCacheStatsView.as_view(), name="serialization-cache-stats"),
 
 
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -0,0 +1,28 @@
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import serialization_cache
+from .instrumentation import route_stats
+
+
+class SerializationCacheStatsView(APIView):
+    """Hit/miss counters of the serializer cache for this worker process"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(serialization_cache.stats())
+
+
+class MetricsView(APIView):
+    """Per-route latency percentiles and query counts for this worker process"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "routes": route_stats.summary(),
+            "serialization_cache": serialization_cache.stats(),
+        })
+
+    def delete(self, request):
+        route_stats.reset()
+        return Response(status=204)
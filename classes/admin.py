@@ -1,39 +1,191 @@
 from django.contrib import admin
 
 # Register your models here.
+from django import forms
 from django.contrib import admin
-from .models import Course, Class, Lesson, Enrollment, LessonAttendance
+from django.db.models import Q
+from .models import (
+    Assessment, AssessmentGrade, Course, Class, ClassMeeting, GradingScale, Holiday, Lesson, Enrollment,
+    LessonAttendance, WaitlistEntry
+)
+from . import analytics, gradebook, search, services
+
+class FullTextSearchMixin:
+    """
+    Search the changelist through the GIN-indexed `search_vector` column as
+    well as the usual ILIKE lookups over `search_fields`, which still find
+    rows by related names (teacher usernames, course codes) and by partial
+    words. Rows whose `search_vector_related` foreign keys point at a
+    matching row are included too.
+    """
+    search_vector_related = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        query = search.parse_query(search_term)
+        condition = Q(search_vector=query)
+        for field_name in self.search_vector_related:
+            # A subquery keeps each branch index-backed, unlike an OR across a join
+            related = self.model._meta.get_field(field_name).related_model
+            matches = related.objects.filter(search_vector=query).values("pk")
+            condition |= Q(**{f"{field_name}__in": matches})
+        matching, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        return queryset.filter(condition) | matching, may_have_duplicates
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ("id", "code", "name", "credits")
-    search_fields = ("code", "name")
+    search_fields = ("code","name")
     list_filter = ("credits",)
 
+class ClassMeetingFormSet(forms.BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        # The class form has already applied any new teacher or semester to self.instance
+        if any(self.errors) or self.instance.teacher_id is None:
+            return
+        meetings = [
+            form.cleaned_data for form in self.forms
+            if form.cleaned_data and not self._should_delete_form(form)
+        ]
+        services.check_schedule(self.instance, meetings)
+
+class ClassMeetingInline(admin.TabularInline):
+    model = ClassMeeting
+    formset = ClassMeetingFormSet
+    fields = ("weekday","start_time","end_time","room")
+    extra = 0
+
 @admin.register(Class)
-class ClassAdmin(admin.ModelAdmin):
+class ClassAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ("id","name","course","teacher","semester","max_students","enrolled_count","available_spots","is_active")
     list_filter  = ("semester","is_active")
     search_fields = ("name","course__name","course__code","teacher__user__username")
+    search_vector_related = ("course",)
+    list_select_related = ("course","teacher__user")
     raw_id_fields = ("course","teacher")
-    readonly_fields = ("created_at",)
+    readonly_fields = ("created_at","enrolled_count")
+    inlines = (ClassMeetingInline,)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Rewrite the slots through the scheduler: it re-checks them under the
+        # semester lock and copies the class's teacher and semester onto them
+        meetings = form.instance.meetings.values("weekday","start_time","end_time","room")
+        services.schedule_class(form.instance, list(meetings))
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ("date","name")
+    date_hierarchy = "date"
+    search_fields = ("name",)
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ("id","title","class_instance","lesson_type","date","duration_minutes","is_cancelled")
     list_filter  = ("lesson_type","is_cancelled")
     search_fields = ("title","class_instance__name")
+    search_vector_related = ("class_instance",)
     date_hierarchy = "date"
     raw_id_fields = ("class_instance",)
 
+class EnrollmentAdminForm(forms.ModelForm):
+    class Meta:
+        model = Enrollment
+        fields = "__all__"
+
+    def validate_unique(self):
+        # New enrollments reactivate a soft-deleted row instead of colliding with it
+        if self.instance.pk is None:
+            return
+        super().validate_unique()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        student = cleaned_data.get("student")
+        class_instance = cleaned_data.get("class_instance")
+        if not (student and class_instance and cleaned_data.get("is_active")):
+            return cleaned_data
+        takes_seat = (
+            self.instance.pk is None
+            or not self.initial.get("is_active")
+            or "class_instance" in self.changed_data
+        )
+        if takes_seat:
+            # Runs inside the admin's transaction, so the class stays locked until save
+            services.reserve_seat(student.pk, class_instance.pk)
+        return cleaned_data
+
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
-    list_display = ("id","student","class_instance","is_active","grade","enrolled_at")
+    form = EnrollmentAdminForm
+    list_display = ("id","student","class_instance","is_active","grade","score","grade_points","enrolled_at")
     list_filter  = ("is_active",)
     search_fields = ("student__user__username","class_instance__name","grade")
     raw_id_fields = ("student","class_instance")
+    readonly_fields = ("score","grade_points")
     date_hierarchy = "enrolled_at"
 
+    def save_model(self, request, obj, form, change):
+        if change or not obj.is_active:
+            return super().save_model(request, obj, form, change)
+        enrollment = services.enroll(obj.student_id, obj.class_instance_id, grade=obj.grade)
+        obj.pk = enrollment.pk
+        obj.enrolled_at = enrollment.enrolled_at
+        obj._state.adding = False
+
+@admin.register(GradingScale)
+class GradingScaleAdmin(admin.ModelAdmin):
+    list_display = ("letter","points","min_score")
+
+class AssessmentAdminForm(forms.ModelForm):
+    class Meta:
+        model = Assessment
+        fields = "__all__"
+
+    def clean_max_points(self):
+        return services.check_max_points(self.instance, self.cleaned_data["max_points"])
+
+class AssessmentGradeInline(admin.TabularInline):
+    model = AssessmentGrade
+    fields = ("student","points")
+    raw_id_fields = ("student",)
+    extra = 0
+
+@admin.register(Assessment)
+class AssessmentAdmin(admin.ModelAdmin):
+    form = AssessmentAdminForm
+    list_display = ("id","title","class_instance","weight","max_points","due_date")
+    search_fields = ("title","class_instance__name")
+    raw_id_fields = ("class_instance",)
+    list_select_related = ("class_instance",)
+    inlines = (AssessmentGradeInline,)
+
+    # Weights and inline grades both feed the class's scores
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        gradebook.rescore(form.instance.class_instance_id)
+        if change and "class_instance" in form.changed_data:
+            gradebook.rescore(form.initial["class_instance"])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        gradebook.rescore(obj.class_instance_id)
+
+    def delete_queryset(self, request, queryset):
+        class_ids = set(queryset.values_list("class_instance_id", flat=True))
+        super().delete_queryset(request, queryset)
+        for class_id in class_ids:
+            gradebook.rescore(class_id)
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ("id","class_instance","student","joined_at")
+    search_fields = ("student__user__username","class_instance__name")
+    raw_id_fields = ("student","class_instance")
+    list_select_related = ("class_instance","student__user")
+
 @admin.register(LessonAttendance)
 class LessonAttendanceAdmin(admin.ModelAdmin):
     list_display = ("id","lesson","student","status","recorded_at")
@@ -41,3 +193,20 @@ class LessonAttendanceAdmin(admin.ModelAdmin):
     search_fields = ("lesson__title","student__user__username")
     raw_id_fields = ("lesson","student")
     date_hierarchy = "recorded_at"
+
+    # Hand edits are rare; recomputing the class keeps its summaries exact
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        class_ids = {obj.lesson.class_instance_id}
+        if change and "lesson" in form.changed_data:
+            class_ids.add(Lesson.objects.values_list("class_instance_id", flat=True).get(pk=form.initial["lesson"]))
+        analytics.rebuild(class_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        analytics.rebuild({obj.lesson.class_instance_id})
+
+    def delete_queryset(self, request, queryset):
+        class_ids = set(queryset.values_list("lesson__class_instance_id", flat=True))
+        super().delete_queryset(request, queryset)
+        analytics.rebuild(class_ids)
@@ -0,0 +1,164 @@
+"""
+Attendance analytics from incrementally maintained summary tables.
+
+AttendanceSummary holds the number of lessons per status for each
+(student, class) and WeeklyAttendance the same per (class, week), so
+attendance rates never scan LessonAttendance. Writers that change
+attendance report each change to apply_changes(), which folds them into
+both tables with INSERT ... ON CONFLICT increments (see
+services.record_attendance). Deleting or moving a lesson rebuilds its
+class's rows when the transaction commits (classes.signals). Anything
+written another way (seed data, raw SQL) is picked up by `manage.py
+rebuild_attendance_summaries`, which recomputes the tables from scratch.
+"""
+import operator
+from collections import Counter
+from datetime import timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, Count, ExpressionWrapper, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, NullIf
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+from .models import AttendanceSummary, Lesson, LessonAttendance, WeeklyAttendance
+
+STATUSES = [status for status, _ in LessonAttendance._meta.get_field('status').choices]
+
+# A student is chronically absent from a class when they missed at least this
+# share of its lessons (excused or not), once the class has had MIN_LESSONS.
+CHRONIC_ABSENCE_RATE = 0.1
+MIN_LESSONS = 5
+
+
+def week_of(moment):
+    """Monday of the (local) week of a lesson start, as stored in WeeklyAttendance.week"""
+    day = timezone.localtime(moment).date()
+    return day - timedelta(days=day.weekday())
+
+
+def apply_changes(changes):
+    """
+    Fold attendance changes into the summary tables. `changes` yields
+    (student_id, class_id, lesson_date, old_status, new_status) tuples;
+    old_status is None for new rows and new_status None for deleted ones.
+    Must run in the transaction that wrote the attendance.
+    """
+    students = Counter()
+    weeks = Counter()
+    for student_id, class_id, lesson_date, old, new in changes:
+        week = week_of(lesson_date)
+        for status, delta in ((old, -1), (new, 1)):
+            if status is not None and old != new:
+                students[student_id, class_id, status] += delta
+                weeks[class_id, week, status] += delta
+    _increment(AttendanceSummary, ('student_id', 'class_instance_id'), students)
+    _increment(WeeklyAttendance, ('class_instance_id', 'week'), weeks)
+
+
+def _increment(model, key, deltas):
+    rows = {}
+    for (*row_key, status), delta in deltas.items():
+        if delta:
+            rows.setdefault(tuple(row_key), dict.fromkeys(STATUSES, 0))[status] += delta
+    if not rows:
+        return
+    table = model._meta.db_table
+    key_types = ['int' if name.endswith('_id') else 'date' for name in key]
+    columns = [*key, *STATUSES]
+    values = [list(column) for column in zip(*(
+        (*row_key, *(counts[status] for status in STATUSES)) for row_key, counts in rows.items()
+    ))]
+    unnest = ', '.join(f'%s::{kind}[]' for kind in key_types + ['int'] * len(STATUSES))
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {table} ({', '.join(columns)}, updated_at)
+            SELECT *, now() FROM unnest({unnest})
+            ON CONFLICT ({', '.join(key)}) DO UPDATE SET
+                {', '.join(f'{status} = {table}.{status} + EXCLUDED.{status}' for status in STATUSES)},
+                updated_at = EXCLUDED.updated_at
+        """, values)
+
+
+def rebuild(class_ids=None):
+    """
+    Recompute both summary tables (or the rows of `class_ids`) from
+    LessonAttendance. Returns (student rows, week rows) written; an empty
+    `class_ids` writes nothing.
+    """
+    if class_ids is not None:
+        class_ids = [class_id for class_id in set(class_ids) if class_id is not None]
+        if not class_ids:
+            return 0, 0
+    attendance, lesson = LessonAttendance._meta.db_table, Lesson._meta.db_table
+    counts = ', '.join(f"count(*) FILTER (WHERE a.status = '{status}')" for status in STATUSES)
+    where, params = ('WHERE l.class_instance_id = ANY(%s)', [class_ids]) if class_ids is not None else ('', [])
+    written = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Holds off attendance writes, whose increments would be lost or counted twice
+        cursor.execute(f"LOCK TABLE {attendance} IN SHARE MODE")
+        for model, key, group, group_params in (
+            (AttendanceSummary, 'student_id, class_instance_id', 'a.student_id, l.class_instance_id', []),
+            (WeeklyAttendance, 'class_instance_id, week',
+             "l.class_instance_id, date_trunc('week', l.date AT TIME ZONE %s)::date", [settings.TIME_ZONE]),
+        ):
+            table = model._meta.db_table
+            cursor.execute(f"DELETE FROM {table}" + (' WHERE class_instance_id = ANY(%s)' if class_ids is not None else ''), params)
+            cursor.execute(f"""
+                INSERT INTO {table} ({key}, {', '.join(STATUSES)}, updated_at)
+                SELECT {group}, {counts}, now()
+                FROM {attendance} a JOIN {lesson} l ON l.id = a.lesson_id
+                {where}
+                GROUP BY 1, 2
+            """, group_params + params)
+            written.append(cursor.rowcount)
+    return tuple(written)
+
+
+def rates(prefix=''):
+    """
+    ({'total', 'rate', 'absence_rate', 'chronic_absence'} expressions, chronic
+    absence condition) over the status count columns named `prefix` + status.
+    """
+    count = {status: F(prefix + status) for status in STATUSES}
+    total = reduce(operator.add, count.values())
+    missed = count['absent'] + count['excused']
+    chronic = Q(GreaterThanOrEqual(total, MIN_LESSONS)) & Q(GreaterThanOrEqual(
+        ExpressionWrapper(missed, output_field=FloatField()),
+        ExpressionWrapper(total * Value(CHRONIC_ABSENCE_RATE), output_field=FloatField()),
+    ))
+    share = lambda part: ExpressionWrapper(Cast(part, FloatField()) / NullIf(total, 0), output_field=FloatField())
+    return {
+        'total': total,
+        'rate': share(count['present'] + count['late']),
+        'absence_rate': share(missed),
+        'chronic_absence': Case(When(chronic, then=Value(True)), default=Value(False), output_field=BooleanField()),
+    }, chronic
+
+
+def student_rates(summaries):
+    """AttendanceSummary rows annotated with their rates and chronic absence flag"""
+    annotations, _ = rates()
+    return summaries.annotate(**annotations)
+
+
+def class_rates(summaries):
+    """Per-class sums of AttendanceSummary rows, with rates and the number of chronically absent students"""
+    annotations, _ = rates('sum_')
+    annotations.pop('chronic_absence')
+    _, chronic_student = rates()
+    return (
+        summaries.order_by()
+        .values('class_instance_id', 'class_instance__name')
+        .annotate(**{f'sum_{status}': Sum(status) for status in STATUSES},
+                  chronic_students=Count('pk', filter=chronic_student))
+        .annotate(**annotations)
+    )
+
+
+def week_rates(weeks):
+    """WeeklyAttendance rows annotated with their rates"""
+    annotations, _ = rates()
+    annotations.pop('chronic_absence')
+    return weeks.annotate(**annotations)
@@ -0,0 +1,101 @@
+"""
+Flat, streamable exports of semester data.
+
+Each export is a values_list() query read through a server-side cursor
+(`iterator(chunk_size=...)`), so memory stays flat regardless of how many
+rows are exported. Rows come out in primary-key order, which Postgres can
+stream from the index without sorting first.
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+from .models import Enrollment, LessonAttendance
+
+CHUNK_SIZE = 2000
+
+
+@dataclass(frozen=True)
+class Export:
+    model: type
+    # (column header, values_list() path)
+    columns: Tuple[Tuple[str, str], ...]
+    # Path from the exported model to its Class, used by the filters
+    class_path: str
+    ordering: Tuple[str, ...] = ('id',)
+    active_only: bool = False
+
+    @property
+    def header(self):
+        return [name for name, _ in self.columns]
+
+    def queryset(self, semester=None, class_id=None):
+        queryset = self.model.objects.all()
+        if self.active_only:
+            queryset = queryset.filter(is_active=True)
+        if semester:
+            queryset = queryset.filter(**{f'{self.class_path}__semester': semester})
+        if class_id:
+            queryset = queryset.filter(**{f'{self.class_path}_id': class_id})
+        return queryset.order_by(*self.ordering).values_list(*(path for _, path in self.columns))
+
+    def rows(self, semester=None, class_id=None, chunk_size=CHUNK_SIZE):
+        return self.queryset(semester, class_id).iterator(chunk_size=chunk_size)
+
+
+STUDENT_COLUMNS = (
+    ('student_id', 'student_id'),
+    ('username', 'student__user__username'),
+    ('first_name', 'student__user__first_name'),
+    ('last_name', 'student__user__last_name'),
+)
+
+EXPORTS = {
+    'enrollments': Export(
+        model=Enrollment,
+        columns=(
+            ('enrollment_id', 'id'),
+            *STUDENT_COLUMNS,
+            ('class_id', 'class_instance_id'),
+            ('class_name', 'class_instance__name'),
+            ('course_code', 'class_instance__course__code'),
+            ('semester', 'class_instance__semester'),
+            ('enrolled_at', 'enrolled_at'),
+            ('is_active', 'is_active'),
+            ('grade', 'grade'),
+        ),
+        class_path='class_instance',
+    ),
+    'attendance': Export(
+        model=LessonAttendance,
+        columns=(
+            ('attendance_id', 'id'),
+            ('lesson_id', 'lesson_id'),
+            ('lesson_title', 'lesson__title'),
+            ('lesson_date', 'lesson__date'),
+            ('class_id', 'lesson__class_instance_id'),
+            ('semester', 'lesson__class_instance__semester'),
+            *STUDENT_COLUMNS,
+            ('status', 'status'),
+            ('notes', 'notes'),
+            ('recorded_at', 'recorded_at'),
+        ),
+        class_path='lesson__class_instance',
+    ),
+    # Active enrollments grouped by class, for printing class lists
+    'rosters': Export(
+        model=Enrollment,
+        columns=(
+            ('class_id', 'class_instance_id'),
+            ('class_name', 'class_instance__name'),
+            ('course_code', 'class_instance__course__code'),
+            ('semester', 'class_instance__semester'),
+            ('teacher_username', 'class_instance__teacher__user__username'),
+            *STUDENT_COLUMNS,
+            ('student_grade', 'student__grade'),
+            ('enrolled_at', 'enrolled_at'),
+        ),
+        class_path='class_instance',
+        ordering=('class_instance_id', 'student__user__last_name', 'student__user__first_name', 'id'),
+        active_only=True,
+    ),
+}
@@ -0,0 +1,99 @@
+"""
+values()-based read paths for the hot list endpoints.
+
+These build the same dicts as ClassListSerializer and EnrollmentSerializer
+from flat rows, without model instances or per-field serializer work. The
+output must stay identical to the serializers (FastPathTests compares the
+rendered bytes), so change both together.
+"""
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from rest_framework import serializers
+from rest_framework.response import Response
+
+_datetime = serializers.DateTimeField()
+
+CLASS_COLUMNS = (
+    'id', 'name', 'semester', 'course__name', 'course__code', 'enrolled_count', 'is_active',
+)
+
+
+def _class_values(prefix=''):
+    columns = [prefix + column for column in CLASS_COLUMNS]
+    computed = {
+        f'{prefix}fast_teacher_name': Concat(
+            F(f'{prefix}teacher__user__first_name'), Value(' '), F(f'{prefix}teacher__user__last_name')
+        ),
+        f'{prefix}fast_available_spots': F(f'{prefix}max_students') - F(f'{prefix}enrolled_count'),
+    }
+    return columns, computed
+
+
+def class_list_values(queryset):
+    columns, computed = _class_values()
+    return queryset.values(*columns, **computed)
+
+
+def class_list_row(row, prefix=''):
+    """ClassListSerializer representation of a class_list_values() row"""
+    return {
+        'id': row[prefix + 'id'],
+        'name': row[prefix + 'name'],
+        'semester': row[prefix + 'semester'],
+        # Same as User.get_full_name()
+        'teacher_name': row[prefix + 'fast_teacher_name'].strip(),
+        'course_name': row[prefix + 'course__name'],
+        'course_code': row[prefix + 'course__code'],
+        'enrolled_count': row[prefix + 'enrolled_count'],
+        'available_spots': row[prefix + 'fast_available_spots'],
+        'is_active': row[prefix + 'is_active'],
+    }
+
+
+def enrollment_values(queryset):
+    columns, computed = _class_values('class_instance__')
+    return queryset.values(
+        'id', 'enrolled_at', 'is_active', 'grade',
+        'student__id', 'student__user', 'student__grade', 'student__major',
+        *columns, **computed,
+    )
+
+
+def enrollment_row(row):
+    """EnrollmentSerializer representation of an enrollment_values() row"""
+    return {
+        'id': row['id'],
+        'enrolled_at': _datetime.to_representation(row['enrolled_at']),
+        'is_active': row['is_active'],
+        'grade': row['grade'],
+        'student': {
+            'id': row['student__id'],
+            'user': row['student__user'],
+            'grade': row['student__grade'],
+            'major': row['student__major'],
+        },
+        'class_instance': class_list_row(row, 'class_instance__'),
+    }
+
+
+class FastListMixin:
+    """
+    Serve `list` from values() rows when the client asked for the default
+    shape. `fast_list` is a (values(queryset), row -> dict) pair; sparse or
+    expanded requests fall back to the serializer.
+    """
+    fast_list = None
+
+    def use_fast_list(self):
+        params = self.request.query_params
+        return self.fast_list is not None and 'fields' not in params and 'expand' not in params
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list():
+            return super().list(request, *args, **kwargs)
+        to_values, to_row = self.fast_list
+        queryset = to_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response([to_row(row) for row in page])
+        return Response([to_row(row) for row in queryset])
@@ -0,0 +1,120 @@
+from django.db import connections
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from rest_framework.filters import BaseFilterBackend
+from .serializers import CatalogParamsSerializer
+
+# Filter parameter -> field it matches exactly
+FILTERS = {
+    'semester': 'semester',
+    'course': 'course_id',
+    'department': 'teacher__department',
+    'teacher': 'teacher_id',
+}
+FACETS = ('semester', 'course', 'department')
+
+
+def catalog_conditions(params):
+    """Map validated catalog parameters to one Q per filter"""
+    conditions = {}
+    for name, lookup in FILTERS.items():
+        if params.get(name) is not None:
+            conditions[name] = Q(**{lookup: params[name]})
+    if params.get('has_seats') is not None:
+        open_seats = Q(enrolled_count__lt=F('max_students'))
+        conditions['has_seats'] = open_seats if params['has_seats'] else ~open_seats
+    return conditions
+
+
+def facet_counts(queryset, conditions):
+    """
+    Count `queryset` rows per semester, course and department in one query.
+
+    Each facet is counted with every filter applied except its own, so
+    clients can show how many classes picking another value would return.
+    The rows are grouped with GROUPING SETS; each filter becomes a boolean
+    column and every facet's count uses FILTER over the other columns.
+    """
+    matches = {
+        f'match_{name}': ExpressionWrapper(condition, output_field=BooleanField())
+        for name, condition in conditions.items()
+    }
+    rows = queryset.order_by().values(
+        facet_semester=F('semester'),
+        facet_course=F('course_id'),
+        facet_course_code=F('course__code'),
+        facet_course_name=F('course__name'),
+        facet_department=F('teacher__department'),
+        **matches,
+    )
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+
+    def count_for(facet):
+        others = [quote(column) for column in matches if column != f'match_{facet}']
+        condition = " AND ".join(others) or "TRUE"
+        return f"COUNT(*) FILTER (WHERE {condition})"
+
+    inner_sql, params = rows.query.sql_with_params()
+    sql = f"""
+        SELECT
+            GROUPING({quote('facet_semester')}) = 0,
+            GROUPING({quote('facet_course')}) = 0,
+            {quote('facet_semester')}, {quote('facet_course')}, {quote('facet_course_code')},
+            {quote('facet_course_name')}, {quote('facet_department')},
+            {count_for('semester')}, {count_for('course')}, {count_for('department')}
+        FROM ({inner_sql}) AS catalog
+        GROUP BY GROUPING SETS (
+            ({quote('facet_semester')}),
+            ({quote('facet_course')}, {quote('facet_course_code')}, {quote('facet_course_name')}),
+            ({quote('facet_department')})
+        )
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        result = cursor.fetchall()
+
+    facets = {name: [] for name in FACETS}
+    for by_semester, by_course, semester, course, code, name, department, *counts in result:
+        semester_count, course_count, department_count = counts
+        if by_semester:
+            facets['semester'].append({'value': semester, 'count': semester_count})
+        elif by_course:
+            facets['course'].append({'value': course, 'code': code, 'name': name, 'count': course_count})
+        else:
+            facets['department'].append({'value': department, 'count': department_count})
+    for values in facets.values():
+        values[:] = [value for value in values if value['count']]
+        values.sort(key=lambda value: (-value['count'], value['value']))
+    return facets
+
+
+class CatalogFilterBackend(BaseFilterBackend):
+    """Server-side filters for the class catalog (list action only)"""
+
+    def get_params(self, request):
+        params = CatalogParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+    def get_conditions(self, request, view):
+        if getattr(view, 'action', None) != 'list':
+            return {}
+        return catalog_conditions(self.get_params(request))
+
+    def filter_queryset(self, request, queryset, view):
+        conditions = self.get_conditions(request, view)
+        return queryset.filter(*conditions.values()) if conditions else queryset
+
+    def get_schema_operation_parameters(self, view):
+        fields = CatalogParamsSerializer().fields
+        types = {'course': 'integer', 'teacher': 'integer', 'has_seats': 'boolean', 'facets': 'boolean'}
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': str(field.help_text or ''),
+                'schema': {'type': types.get(name, 'string')},
+            }
+            for name, field in fields.items()
+        ]
@@ -0,0 +1,175 @@
+"""
+Gradebook: weighted assessment scores, letter grades and GPA transcripts.
+
+Teachers grade Assessments in points (see services.record_grades). An
+enrollment's `score` is its weighted percentage over the class's graded
+assessments, recomputed in SQL for the students whose grades changed.
+finalize() turns scores into letter grades through the GradingScale, and
+every letter grade carries its scale points in `grade_points` (see
+Enrollment.save()), so a GPA is one SUM(grade_points * credits) /
+SUM(credits) aggregate.
+
+Transcripts are cached per student in the default cache, under a key
+that fingerprints the rows they are built from: the number of the
+student's enrollments and the sums of the `updated_at` of those
+enrollments, their classes and courses. Any write to them moves the key,
+so no process has to be told about it (the cache is per process, and
+writes also come from import_school and other workers). Bulk updates
+must therefore set `updated_at` too; entries that are no longer looked
+up expire after TRANSCRIPT_TIMEOUT.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Extract, Least, Now
+from backend import serialization_cache
+from students.models import Student
+from .models import AssessmentGrade, Enrollment, GradingScale
+
+TRANSCRIPT_TIMEOUT = 24 * 3600
+GPA_PLACES = Decimal('0.01')
+
+
+def _changed(field):
+    # EXTRACT(EPOCH ...) is an exact numeric, so any moved timestamp moves the sum
+    return Sum(Extract(field, 'epoch', output_field=DecimalField()))
+
+
+def _key(student_id):
+    """The cache key of a student's transcript, or None if there is no such student"""
+    version = (
+        Student.objects.filter(pk=student_id).order_by()
+        .annotate(
+            enrollment_count=Count('enrollments'),
+            enrollments_changed=_changed('enrollments__updated_at'),
+            classes_changed=_changed('enrollments__class_instance__updated_at'),
+            courses_changed=_changed('enrollments__class_instance__course__updated_at'),
+        )
+        .values_list('enrollment_count', 'enrollments_changed', 'classes_changed', 'courses_changed')
+        .first()
+    )
+    if version is None:
+        return None
+    return f"transcript:{student_id}:{':'.join(map(str, version))}"
+
+
+def update_scores(class_id, student_ids=None):
+    """
+    Recompute the weighted score of the enrollments of a class (or of its
+    `student_ids`) from their assessment grades, in one UPDATE. Enrollments
+    without any grade get no score. Scores are capped at 100 (points above
+    max_points can still come in through the admin). Returns the number of
+    enrollments updated.
+    """
+    weighted = ExpressionWrapper(
+        F('assessment__weight') * F('points') * 100 / F('assessment__max_points'), output_field=DecimalField()
+    )
+    score = (
+        AssessmentGrade.objects.filter(assessment__class_instance_id=class_id, student_id=OuterRef('student_id'))
+        .order_by()
+        .values('student_id')
+        .annotate(score=Least(
+            ExpressionWrapper(Sum(weighted) / Sum('assessment__weight'), output_field=DecimalField()),
+            Value(Decimal(100)),
+        ))
+        .values('score')
+    )
+    enrollments = Enrollment.objects.filter(class_instance_id=class_id)
+    if student_ids is not None:
+        enrollments = enrollments.filter(student_id__in=student_ids)
+    return enrollments.update(score=Subquery(score), updated_at=Now())
+
+
+def rescore(class_id):
+    """Recompute every score of a class after its assessments changed"""
+    update_scores(class_id)
+
+
+def finalize(class_id):
+    """
+    Give every active, scored enrollment of a class the letter grade (and
+    grade points) of the highest GradingScale step its score reaches.
+    Returns the number of enrollments graded.
+    """
+    step = GradingScale.objects.filter(min_score__lte=OuterRef('score')).order_by('-min_score')
+    with transaction.atomic():
+        graded = Enrollment.objects.filter(class_instance_id=class_id, is_active=True, score__isnull=False)
+        pks = list(graded.values_list('pk', flat=True))
+        count = graded.update(
+            # No step at all (a scale without a 0 floor) leaves the grade blank
+            grade=Coalesce(Subquery(step.values('letter')[:1]), Value('')),
+            grade_points=Subquery(step.values('points')[:1]),
+            updated_at=Now(),
+        )
+        serialization_cache.invalidate(Enrollment, pks)
+    return count
+
+
+def sync_grade_points():
+    """Re-derive the grade points of every graded enrollment from the scale, after the scale changed"""
+    points = GradingScale.objects.filter(letter__iexact=OuterRef('grade')).values('points')[:1]
+    Enrollment.objects.exclude(grade='').update(grade_points=Subquery(points), updated_at=Now())
+
+
+def _gpa(quality, credits):
+    return (quality / credits).quantize(GPA_PLACES) if credits else None
+
+
+def transcript(student_id):
+    """
+    {'student_id', 'gpa', 'credits', 'semesters'} for a student, where each
+    semester has its own credit-weighted GPA, credits and graded classes.
+    Only active enrollments whose grade is on the scale count, so withdrawn
+    or ungraded classes do not pull the GPA down. None if there is no such
+    student.
+    """
+    key = _key(student_id)
+    if key is None:
+        return None
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    graded = Enrollment.objects.filter(student_id=student_id, is_active=True, grade_points__isnull=False)
+    quality = ExpressionWrapper(F('grade_points') * F('class_instance__course__credits'), output_field=DecimalField())
+    semesters = {
+        row['class_instance__semester']: row
+        for row in graded.order_by('class_instance__semester').values('class_instance__semester')
+        .annotate(quality=Sum(quality), credits=Sum('class_instance__course__credits'))
+    }
+    classes = graded.order_by('class_instance__semester', 'class_instance__course__code', 'class_instance_id').values(
+        'class_instance_id', 'class_instance__name', 'class_instance__semester', 'class_instance__course__code',
+        'class_instance__course__credits', 'grade', 'grade_points', 'score',
+    )
+    by_semester = {semester: [] for semester in semesters}
+    for row in classes:
+        by_semester[row['class_instance__semester']].append({
+            'class_id': row['class_instance_id'],
+            'class_name': row['class_instance__name'],
+            'course_code': row['class_instance__course__code'],
+            'credits': row['class_instance__course__credits'],
+            'grade': row['grade'],
+            'grade_points': row['grade_points'],
+            'score': row['score'],
+        })
+
+    quality_total = sum((row['quality'] for row in semesters.values()), Decimal(0))
+    credits_total = sum(row['credits'] for row in semesters.values())
+    result = {
+        'student_id': student_id,
+        'gpa': _gpa(quality_total, credits_total),
+        'credits': credits_total,
+        'semesters': [
+            {
+                'semester': semester,
+                'gpa': _gpa(row['quality'], row['credits']),
+                'credits': row['credits'],
+                'classes': by_semester[semester],
+            }
+            for semester, row in semesters.items()
+        ],
+    }
+    cache.set(key, result, TRANSCRIPT_TIMEOUT)
+    return result
@@ -0,0 +1,525 @@
+"""
+Bulk loading of a school from CSV files (see `manage.py import_school`).
+
+Each file is read row by row and validated in batches by a plain
+serializer. Every row is then COPYed into a temporary staging table: valid
+rows with their values, rejected rows with just their error. Checks that
+need the database or other rows (unknown references, duplicates, seat
+limits, schedule clashes) run as set-based UPDATEs over the staging tables,
+and the rows that survive are merged into the real tables with INSERT ...
+ON CONFLICT. Classes that gained seats then promote their waitlists.
+
+Nothing commits on its own: the caller runs load() and merge() inside one
+transaction, and the staging tables are dropped when it ends.
+"""
+import csv
+from dataclasses import dataclass
+from itertools import islice
+from typing import Tuple
+
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+from accounts.passwords import hash_passwords
+from accounts.tokens import revoke_tokens
+from backend import serialization_cache
+from parents.models import Parent
+from students.models import Student
+from teachers.models import Teacher
+from . import services
+from .models import Class, ClassMeeting, Course, Enrollment, GradingScale, WaitlistEntry
+from .serializers import ClassImportRowSerializer, EnrollmentImportRowSerializer, UserImportRowSerializer
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+
+
+class ImportFileError(ValueError):
+    """Raised when an import file cannot be read at all (e.g. missing columns)"""
+
+
+@dataclass(frozen=True)
+class Staging:
+    name: str
+    serializer: type
+    # (column, SQL type) loaded from the file
+    columns: Tuple[Tuple[str, str], ...]
+    # (column, SQL type) filled in by the set-based checks
+    resolved: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def table(self):
+        return f'import_{self.name}'
+
+    @property
+    def copy_columns(self):
+        return ['line', *(name for name, _ in self.columns), 'error_field', 'error']
+
+    @property
+    def required(self):
+        return [name for name, field in self.serializer().fields.items() if field.required]
+
+    def create(self, cursor):
+        columns = ', '.join(f'{name} {kind}' for name, kind in (*self.columns, *self.resolved))
+        cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+        cursor.execute(
+            f"CREATE TEMP TABLE {self.table} (line integer, {columns}, error_field text, error text) ON COMMIT DROP"
+        )
+
+    def records(self, batch):
+        """
+        Validate a batch of (line, CSV row) pairs into the tuples COPYed into
+        the staging table. One serializer instance validates the whole batch,
+        as a ListSerializer would, so its fields are only built once.
+        """
+        serializer = self.serializer()
+        records, validated = [], []
+        for line, row in batch:
+            try:
+                validated.append((line, serializer.run_validation(row)))
+            except serializers.ValidationError as exc:
+                field, messages = next(iter(exc.detail.items()))
+                records.append((line, *(None for _ in self.columns), field, str(messages[0])))
+        for line, data in validated:
+            records.append((line, *(data[name] for name, _ in self.columns), None, None))
+        return records
+
+
+STAGING = {
+    'users': Staging(
+        name='users',
+        serializer=UserImportRowSerializer,
+        columns=(
+            ('username', 'text'), ('role', 'text'), ('email', 'text'),
+            ('first_name', 'text'), ('last_name', 'text'), ('password', 'text'),
+            ('grade', 'text'), ('major', 'text'), ('department', 'text'), ('bio', 'text'),
+            ('phone', 'text'), ('address', 'text'),
+        ),
+        resolved=(('user_id', 'bigint'),),
+    ),
+    'classes': Staging(
+        name='classes',
+        serializer=ClassImportRowSerializer,
+        columns=(
+            ('course_code', 'text'), ('semester', 'text'), ('name', 'text'), ('teacher', 'text'),
+            ('max_students', 'integer'), ('schedule', 'text'), ('room', 'text'), ('is_active', 'boolean'),
+        ),
+        resolved=(('course_id', 'bigint'), ('teacher_id', 'bigint'), ('class_id', 'bigint')),
+    ),
+    'enrollments': Staging(
+        name='enrollments',
+        serializer=EnrollmentImportRowSerializer,
+        columns=(
+            ('student', 'text'), ('course_code', 'text'), ('semester', 'text'), ('class_name', 'text'),
+            ('grade', 'text'),
+        ),
+        resolved=(
+            ('student_id', 'bigint'), ('class_id', 'bigint'),
+            ('enrollment_id', 'bigint'), ('was_active', 'boolean'),
+        ),
+    ),
+}
+
+# Profile model and the users-file columns copied onto it, per role
+PROFILES = {
+    User.Roles.STUDENT: (Student, ('grade', 'major')),
+    User.Roles.TEACHER: (Teacher, ('department', 'bio')),
+    User.Roles.PARENT: (Parent, ('phone', 'address')),
+}
+
+
+def create_staging(cursor):
+    for staging in STAGING.values():
+        staging.create(cursor)
+
+
+def load(cursor, name, lines, batch_size=BATCH_SIZE):
+    """
+    Validate the CSV rows in `lines` and COPY them into the `name` staging
+    table, one batch at a time. Returns the number of rows read.
+    """
+    staging = STAGING[name]
+    reader = csv.DictReader(lines, restval='')
+    missing = [column for column in staging.required if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ImportFileError(f"{name}: missing column(s) {', '.join(missing)}")
+
+    copy_sql = f"COPY {staging.table} ({', '.join(staging.copy_columns)}) FROM STDIN"
+    total = 0
+    # line_num is the physical line a row ended on; the header is line 1
+    numbered = ((reader.line_num, row) for row in reader)
+    while batch := list(islice(numbered, batch_size)):
+        records = staging.records(batch)
+        with cursor.copy(copy_sql) as copy:
+            for record in records:
+                copy.write_row(record)
+        total += len(records)
+    # Autovacuum never analyzes temporary tables; the checks join on them
+    cursor.execute(f"ANALYZE {staging.table}")
+    return total
+
+
+def _reject(cursor, table, field, message, condition):
+    """Mark the not yet rejected rows of `table` matching `condition` with an error"""
+    cursor.execute(
+        f"UPDATE {table} SET error_field = %s, error = %s WHERE error IS NULL AND ({condition})",
+        [field, message],
+    )
+
+
+def _duplicates(table, *key):
+    """Condition matching every row but the first of each `key` group"""
+    key = ', '.join(key)
+    return f"""line IN (
+        SELECT line FROM (
+            SELECT line, row_number() OVER (PARTITION BY {key} ORDER BY line) AS position
+            FROM {table} WHERE error IS NULL
+        ) ranked WHERE position > 1
+    )"""
+
+
+def _returned_ids(cursor):
+    return [pk for pk, in cursor.fetchall()]
+
+
+def _counts(cursor, table):
+    cursor.execute(f"SELECT count(*), count(*) FILTER (WHERE error IS NOT NULL) FROM {table}")
+    rows, rejected = cursor.fetchone()
+    return {'rows': rows, 'rejected': rejected}
+
+
+def _match_classes(cursor, table, name_column):
+    """
+    Resolve class_id from (course_code, semester, class name); classes have
+    no unique key, so the oldest one wins when several share them. Joined
+    once per distinct key rather than looked up per staged row.
+    """
+    cursor.execute(f"""
+        UPDATE {table} s SET class_id = k.id
+        FROM (
+            SELECT c.code, k.semester, k.name, min(k.id) AS id
+            FROM {Class._meta.db_table} k JOIN {Course._meta.db_table} c ON c.id = k.course_id
+            WHERE (c.code, k.semester, k.name) IN (SELECT course_code, semester, {name_column} FROM {table})
+            GROUP BY c.code, k.semester, k.name
+        ) k
+        WHERE k.code = s.course_code AND k.semester = s.semester AND k.name = s.{name_column} AND s.error IS NULL
+    """)
+
+
+# Room a meeting of staged class `s` (currently `k`) will be in: the class's, if it followed it
+_PLANNED_ROOM = "CASE WHEN {meeting}.room = k.room THEN s.room ELSE {meeting}.room END"
+
+
+def _reject_schedule_clashes(cursor, classes):
+    """
+    Reject class rows whose new teacher or room would double-book one of the
+    class's meetings, as services.check_schedule() would. Meetings of other
+    classes are compared as they will be after the merge: classes updated by
+    an earlier line of the file with their new teacher and room, the rest
+    as they are. Rejecting a row puts its class back in the comparison as it
+    is, so the checks repeat until no more rows are rejected.
+    """
+    meeting_table, class_table = ClassMeeting._meta.db_table, Class._meta.db_table
+    clashes = f"""
+        SELECT s.line, s.teacher_id, {_PLANNED_ROOM.format(meeting='m')} AS room,
+               CASE WHEN o.line IS NULL THEN other.teacher_id ELSE o.teacher_id END AS other_teacher_id,
+               CASE WHEN o.line IS NOT NULL AND other.room = ok.room THEN o.room ELSE other.room END AS other_room
+        FROM {classes} s
+        JOIN {class_table} k ON k.id = s.class_id
+        JOIN {meeting_table} m ON m.class_instance_id = s.class_id
+        JOIN {meeting_table} other ON other.semester = m.semester AND other.period && m.period
+            AND other.class_instance_id <> m.class_instance_id
+        JOIN {class_table} ok ON ok.id = other.class_instance_id
+        LEFT JOIN {classes} o ON o.class_id = other.class_instance_id AND o.error IS NULL
+        WHERE s.error IS NULL AND (o.line IS NULL OR o.line < s.line)
+    """
+    checks = [
+        ('teacher', "The teacher already teaches another class at one of its meeting times.",
+         "teacher_id = other_teacher_id"),
+        ('room', "The room is taken by another class at one of its meeting times.",
+         "room <> '' AND room = other_room"),
+    ]
+    rejected = True
+    while rejected:
+        rejected = 0
+        for field, message, condition in checks:
+            _reject(cursor, classes, field, message, f"line IN (SELECT line FROM ({clashes}) c WHERE {condition})")
+            rejected += cursor.rowcount
+
+
+def merge_users(cursor):
+    users = STAGING['users'].table
+    user_table = User._meta.db_table
+
+    _reject(cursor, users, 'username', "Duplicate username in this file.", _duplicates(users, 'username'))
+    cursor.execute(f"""
+        UPDATE {users} s SET user_id = u.id FROM {user_table} u
+        WHERE u.username = s.username AND s.error IS NULL
+    """)
+    _reject(cursor, users, 'role', "A user with this username exists with a different role.", f"""
+        user_id IS NOT NULL AND role <> (SELECT u.role FROM {user_table} u WHERE u.id = user_id)
+    """)
+    summary = _counts(cursor, users)
+
+    # Passwords are staged in plain text (temporary tables are never WAL-logged
+    # and this one is dropped at commit) and only the accounts about to be
+    # created are hashed, in one process pool for the whole file
+    cursor.execute(f"SELECT line, password FROM {users} WHERE error IS NULL AND user_id IS NULL ORDER BY line")
+    pending = cursor.fetchall()
+    if pending:
+        lines, plain = zip(*pending)
+        cursor.execute(f"""
+            UPDATE {users} s SET password = h.password
+            FROM unnest(%s::integer[], %s::text[]) h(line, password)
+            WHERE s.line = h.line
+        """, [list(lines), hash_passwords(plain)])
+
+    # Existing users keep their password, flags and token version
+    cursor.execute(f"""
+        UPDATE {user_table} u SET
+            email = COALESCE(NULLIF(s.email, ''), u.email),
+            first_name = COALESCE(NULLIF(s.first_name, ''), u.first_name),
+            last_name = COALESCE(NULLIF(s.last_name, ''), u.last_name),
+            updated_at = now()
+        FROM {users} s
+        WHERE s.user_id = u.id AND s.error IS NULL
+        RETURNING u.id
+    """)
+    updated = _returned_ids(cursor)
+    existing = set(updated)
+    cursor.execute(f"""
+        INSERT INTO {user_table} (
+            password, is_superuser, username, first_name, last_name, email,
+            is_staff, is_active, date_joined, role, token_version
+        )
+        SELECT password, false, username, first_name, last_name, email,
+               role = %s, true, now(), role, 0
+        FROM {users} WHERE error IS NULL AND user_id IS NULL
+    """, [User.Roles.ADMIN])
+    summary.update(created=cursor.rowcount, updated=len(updated))
+    serialization_cache.invalidate(User, updated)
+    cursor.execute(f"""
+        UPDATE {users} s SET user_id = u.id FROM {user_table} u
+        WHERE u.username = s.username AND s.user_id IS NULL AND s.error IS NULL
+    """)
+
+    for role, (model, columns) in PROFILES.items():
+        profile_table = model._meta.db_table
+        assignments = ', '.join(
+            f"{column} = COALESCE(NULLIF(EXCLUDED.{column}, ''), {profile_table}.{column})" for column in columns
+        )
+        cursor.execute(f"""
+            INSERT INTO {profile_table} (user_id, {', '.join(columns)})
+            SELECT user_id, {', '.join(columns)} FROM {users} WHERE error IS NULL AND role = %s
+            ON CONFLICT (user_id) DO UPDATE SET {assignments}, updated_at = now()
+            RETURNING id, user_id, xmax = 0
+        """, [role])
+        rows = cursor.fetchall()
+        serialization_cache.invalidate(model, [pk for pk, _, _ in rows])
+        # Existing users' tokens do not carry the new profile's id
+        revoke_tokens(user_id for _, user_id, inserted in rows if inserted and user_id in existing)
+    return summary
+
+
+def merge_classes(cursor):
+    classes = STAGING['classes'].table
+    class_table = Class._meta.db_table
+    meeting_table = ClassMeeting._meta.db_table
+    cursor.execute(f"""
+        UPDATE {classes} s SET course_id = c.id FROM {Course._meta.db_table} c
+        WHERE c.code = s.course_code AND s.error IS NULL
+    """)
+    _reject(cursor, classes, 'course_code', "Unknown course code.", "course_id IS NULL")
+    cursor.execute(f"""
+        UPDATE {classes} s SET teacher_id = t.id
+        FROM {Teacher._meta.db_table} t JOIN {User._meta.db_table} u ON u.id = t.user_id
+        WHERE u.username = s.teacher AND s.error IS NULL
+    """)
+    _reject(cursor, classes, 'teacher', "Unknown teacher.", "teacher_id IS NULL")
+    _reject(cursor, classes, 'name', "Duplicate class in this file.",
+            _duplicates(classes, 'course_id', 'semester', 'name'))
+    _match_classes(cursor, classes, 'name')
+    _reject(cursor, classes, 'max_students', "Fewer seats than students already enrolled.", f"""
+        class_id IS NOT NULL AND max_students < (SELECT k.enrolled_count FROM {class_table} k WHERE k.id = class_id)
+    """)
+    # Same lock as services.schedule_class(), for every semester the file touches
+    cursor.execute(f"""
+        SELECT pg_advisory_xact_lock(hashtext('classes.schedule:' || semester))
+        FROM (SELECT DISTINCT semester FROM {classes} WHERE error IS NULL AND class_id IS NOT NULL ORDER BY semester) s
+    """)
+    _reject_schedule_clashes(cursor, classes)
+    summary = _counts(cursor, classes)
+
+    # Meetings held in the class room follow it; before the classes, which still have the old room
+    cursor.execute(f"""
+        UPDATE {meeting_table} m SET teacher_id = s.teacher_id, room = {_PLANNED_ROOM.format(meeting='m')}
+        FROM {classes} s JOIN {class_table} k ON k.id = s.class_id
+        WHERE m.class_instance_id = s.class_id AND s.error IS NULL
+          AND (m.teacher_id <> s.teacher_id OR m.room IS DISTINCT FROM {_PLANNED_ROOM.format(meeting='m')})
+    """)
+    cursor.execute(f"""
+        UPDATE {class_table} k SET
+            teacher_id = s.teacher_id, max_students = s.max_students, schedule = s.schedule,
+            room = s.room, is_active = s.is_active, updated_at = now()
+        FROM {classes} s
+        WHERE s.class_id = k.id AND s.error IS NULL
+        RETURNING k.id
+    """)
+    updated = _returned_ids(cursor)
+    cursor.execute(f"""
+        INSERT INTO {class_table} (
+            course_id, teacher_id, name, semester, max_students, schedule, room,
+            is_active, created_at, updated_at, enrolled_count
+        )
+        SELECT course_id, teacher_id, name, semester, max_students, schedule, room, is_active, now(), now(), 0
+        FROM {classes} WHERE error IS NULL AND class_id IS NULL
+    """)
+    summary.update(created=cursor.rowcount, updated=len(updated))
+    serialization_cache.invalidate(Class, updated)
+    return summary
+
+
+def merge_enrollments(cursor):
+    enrollments = STAGING['enrollments'].table
+    class_table = Class._meta.db_table
+    enrollment_table = Enrollment._meta.db_table
+    meeting_table = ClassMeeting._meta.db_table
+
+    cursor.execute(f"""
+        UPDATE {enrollments} s SET student_id = st.id
+        FROM {Student._meta.db_table} st JOIN {User._meta.db_table} u ON u.id = st.user_id
+        WHERE u.username = s.student AND s.error IS NULL
+    """)
+    _reject(cursor, enrollments, 'student', "Unknown student.", "student_id IS NULL")
+    _match_classes(cursor, enrollments, 'class_name')
+    _reject(cursor, enrollments, 'class_name', "Unknown class.", "class_id IS NULL")
+    _reject(cursor, enrollments, 'student', "Duplicate enrollment in this file.",
+            _duplicates(enrollments, 'student_id', 'class_id'))
+    # Same lock order as services.reserve_seat(): class rows first, then enrollments
+    cursor.execute(f"""
+        SELECT id FROM {class_table} WHERE id IN (SELECT class_id FROM {enrollments} WHERE error IS NULL)
+        ORDER BY id FOR UPDATE
+    """)
+    cursor.execute(f"""
+        SELECT e.id FROM {enrollment_table} e JOIN {enrollments} s
+            ON e.student_id = s.student_id AND e.class_instance_id = s.class_id AND s.error IS NULL
+        ORDER BY e.id FOR UPDATE OF e
+    """)
+    # Then the students, whose schedules are checked below
+    cursor.execute(f"""
+        SELECT id FROM {Student._meta.db_table} WHERE id IN (SELECT student_id FROM {enrollments} WHERE error IS NULL)
+        ORDER BY id FOR UPDATE
+    """)
+    cursor.execute(f"""
+        UPDATE {enrollments} s SET enrollment_id = e.id, was_active = e.is_active FROM {enrollment_table} e
+        WHERE e.student_id = s.student_id AND e.class_instance_id = s.class_id AND s.error IS NULL
+    """)
+    # As services.reserve_seat(): against the student's classes and earlier lines of the file
+    cursor.execute(f"""
+        UPDATE {enrollments} s SET error_field = 'class_name',
+            error = 'This class clashes with ' || clash.name || ' in the student''s schedule.'
+        FROM (
+            SELECT DISTINCT ON (s.line) s.line, k.name
+            FROM {enrollments} s
+            JOIN {meeting_table} t ON t.class_instance_id = s.class_id
+            JOIN {meeting_table} m ON m.semester = t.semester AND m.period && t.period
+                AND m.class_instance_id <> s.class_id
+            JOIN {class_table} k ON k.id = m.class_instance_id
+            WHERE s.error IS NULL AND s.was_active IS NOT TRUE AND (
+                EXISTS (
+                    SELECT 1 FROM {enrollment_table} e
+                    WHERE e.student_id = s.student_id AND e.class_instance_id = m.class_instance_id AND e.is_active
+                ) OR EXISTS (
+                    SELECT 1 FROM {enrollments} o
+                    WHERE o.student_id = s.student_id AND o.class_id = m.class_instance_id
+                      AND o.error IS NULL AND o.line < s.line
+                )
+            )
+            ORDER BY s.line, k.name
+        ) clash
+        WHERE s.line = clash.line
+    """)
+    # Rows taking a seat are admitted in file order until the class is full
+    _reject(cursor, enrollments, 'class_name', "This class is full.", f"""
+        line IN (
+            SELECT line FROM (
+                SELECT s.line, k.max_students - k.enrolled_count AS free,
+                       row_number() OVER (PARTITION BY s.class_id ORDER BY s.line) AS seat
+                FROM {enrollments} s JOIN {class_table} k ON k.id = s.class_id
+                WHERE s.error IS NULL AND s.was_active IS NOT TRUE
+            ) seats WHERE seat > free
+        )
+    """)
+    summary = _counts(cursor, enrollments)
+
+    # Grade points come from the scale, as in Enrollment.save()
+    cursor.execute(f"""
+        INSERT INTO {enrollment_table} (student_id, class_instance_id, enrolled_at, is_active, grade, grade_points, updated_at)
+        SELECT s.student_id, s.class_id, now(), true, s.grade, g.points, now()
+        FROM {enrollments} s LEFT JOIN {GradingScale._meta.db_table} g ON lower(g.letter) = lower(s.grade)
+        WHERE s.error IS NULL
+        ON CONFLICT (student_id, class_instance_id) DO UPDATE SET
+            is_active = true,
+            grade = COALESCE(NULLIF(EXCLUDED.grade, ''), {enrollment_table}.grade),
+            grade_points = CASE WHEN EXCLUDED.grade = '' THEN {enrollment_table}.grade_points
+                                ELSE EXCLUDED.grade_points END,
+            updated_at = now()
+    """)
+    cursor.execute(f"""
+        SELECT count(*) FILTER (WHERE enrollment_id IS NULL), count(*) FILTER (WHERE enrollment_id IS NOT NULL)
+        FROM {enrollments} WHERE error IS NULL
+    """)
+    created, updated = cursor.fetchone()
+    summary.update(created=created, updated=updated)
+    cursor.execute(f"SELECT enrollment_id FROM {enrollments} WHERE error IS NULL AND enrollment_id IS NOT NULL")
+    serialization_cache.invalidate(Enrollment, _returned_ids(cursor))
+    cursor.execute(f"""
+        DELETE FROM {WaitlistEntry._meta.db_table} w USING {enrollments} s
+        WHERE w.student_id = s.student_id AND w.class_instance_id = s.class_id AND s.error IS NULL
+    """)
+
+    cursor.execute(f"""
+        UPDATE {class_table} k SET enrolled_count = k.enrolled_count + seats.taken, updated_at = now()
+        FROM (
+            SELECT class_id, count(*) AS taken FROM {enrollments}
+            WHERE error IS NULL AND was_active IS NOT TRUE GROUP BY class_id
+        ) seats
+        WHERE k.id = seats.class_id
+        RETURNING k.id
+    """)
+    serialization_cache.invalidate(Class, _returned_ids(cursor))
+    return summary
+
+
+def promote_waitlists(cursor):
+    """
+    Hand the seats of merged classes that have room now (more seats, or
+    reactivated) to their waitlists, once the file's own enrollments are in.
+    """
+    cursor.execute(f"""
+        SELECT DISTINCT k.id FROM {Class._meta.db_table} k
+        JOIN {STAGING['classes'].table} s ON s.class_id = k.id AND s.error IS NULL
+        JOIN {WaitlistEntry._meta.db_table} w ON w.class_instance_id = k.id
+        WHERE k.is_active AND k.enrolled_count < k.max_students
+        ORDER BY k.id
+    """)
+    return sum(len(services.promote_waitlist(class_id)) for class_id in _returned_ids(cursor))
+
+
+def merge(cursor):
+    """Check and merge the staged users, classes and enrollments, in dependency order"""
+    summary = {
+        'users': merge_users(cursor),
+        'classes': merge_classes(cursor),
+        'enrollments': merge_enrollments(cursor),
+    }
+    summary['classes']['promoted'] = promote_waitlists(cursor)
+    return summary
+
+
+def errors(cursor):
+    """Yield (file, line, field, error) for every rejected row"""
+    for name, staging in STAGING.items():
+        cursor.execute(f"SELECT line, error_field, error FROM {staging.table} WHERE error IS NOT NULL ORDER BY line")
+        for line, field, message in cursor.fetchall():
+            yield name, line, field, message
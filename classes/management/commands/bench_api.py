@@ -0,0 +1,131 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+def discover_get_endpoints(patterns=None, prefix=""):
+    """Yield URL templates (with a '{pk}' placeholder) for every router route that answers GET"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for entry in patterns:
+        route = str(entry.pattern).lstrip("^").rstrip("$")
+        if isinstance(entry, URLResolver):
+            yield from discover_get_endpoints(entry.url_patterns, prefix + route)
+            continue
+        actions = getattr(entry.callback, "actions", None)
+        if not isinstance(entry, URLPattern) or not actions or "get" not in actions:
+            continue
+        if "(?P<format>" in route:
+            continue
+        yield "/" + prefix + route.replace("(?P<pk>[^/.]+)", "{pk}")
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+class Command(BaseCommand):
+    help = "Drive every GET router endpoint of a running server with concurrent clients and report JSON stats"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+        parser.add_argument("--match", default="", help="Only benchmark endpoints containing this substring")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        self.base_url = options["base_url"].rstrip("/")
+        self.token = self.obtain_token(options["username"], options["password"])
+
+        report = {
+            "base_url": self.base_url,
+            "concurrency": options["concurrency"],
+            "requests_per_endpoint": options["requests"],
+            "endpoints": {},
+        }
+        for template in sorted(set(discover_get_endpoints())):
+            if options["match"] not in template:
+                continue
+            path = self.resolve_template(template)
+            if path is None:
+                self.stderr.write(f"skipping {template}: no object to address")
+                continue
+            report["endpoints"][template] = self.run(path, options["requests"], options["concurrency"])
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(output)
+        else:
+            self.stdout.write(output)
+
+    def request(self, path, data=None):
+        headers = {"Accept": "application/json"}
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+            data = json.dumps(data).encode()
+        elif self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read()
+
+    def obtain_token(self, username, password):
+        try:
+            _, body = self.request("/api/accounts/token/", {"username": username, "password": password})
+        except urllib.error.URLError as exc:
+            raise CommandError(f"Could not obtain a token from {self.base_url}: {exc}")
+        return json.loads(body)["access"]
+
+    def resolve_template(self, template):
+        if "{pk}" not in template:
+            return template
+        list_path = template.split("{pk}")[0]
+        try:
+            _, body = self.request(list_path)
+        except urllib.error.HTTPError:
+            return None
+        payload = json.loads(body)
+        rows = payload.get("results", []) if isinstance(payload, dict) else payload
+        if not rows:
+            return None
+        return template.replace("{pk}", str(rows[0]["id"]))
+
+    def run(self, path, total, concurrency):
+        def timed(_):
+            started = time.perf_counter()
+            try:
+                status, _ = self.request(path)
+            except urllib.error.HTTPError as exc:
+                status = exc.code
+            except urllib.error.URLError:
+                status = None
+            return (time.perf_counter() - started) * 1000, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [ms for ms, _ in results]
+        return {
+            "path": path,
+            "requests": total,
+            "errors": sum(1 for _, status in results if status is None or status >= 400),
+            "throughput_rps": round(total / elapsed, 1),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+        }
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from classes import fastpath
+from classes.models import Class, Enrollment
+from classes.serializers import ClassListSerializer, EnrollmentSerializer
+
+PATHS = {
+    "classes": (
+        Class.objects.select_related("teacher__user", "course").order_by("id"),
+        ClassListSerializer,
+        fastpath.class_list_values,
+        fastpath.class_list_row,
+    ),
+    "enrollments": (
+        Enrollment.objects.select_related(
+            "student", "class_instance__course", "class_instance__teacher__user"
+        ).order_by("enrolled_at", "id"),
+        EnrollmentSerializer,
+        fastpath.enrollment_values,
+        fastpath.enrollment_row,
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = "Time a page of the class and enrollment lists through the serializers and the values() fast path"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Rows per page")
+        parser.add_argument("--iterations", type=int, default=50)
+
+    def handle(self, *args, **options):
+        rows, iterations = options["rows"], options["iterations"]
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'endpoint':<14}{'path':<22}{'ms/page':>10}{'rows/s':>12}")
+        for name, (queryset, serializer_class, to_values, to_row) in PATHS.items():
+            page = queryset[:rows]
+            if not page.exists():
+                raise CommandError(f"No {name} to benchmark; run seed_school first")
+
+            def serialized():
+                return serializer_class(list(page), many=True).data
+
+            def fast():
+                return [to_row(row) for row in to_values(page)]
+
+            if renderer.render(serialized()) != renderer.render(fast()):
+                raise CommandError(f"Fast path output for {name} differs from {serializer_class.__name__}")
+
+            count = page.count()
+            with override_settings(SERIALIZER_CACHE_ENABLED=False):
+                self.report(name, "serializer", serialized, iterations, count)
+            # Cached representations are warm after the first iteration
+            self.report(name, "serializer (cached)", serialized, iterations, count)
+            self.report(name, "values()", fast, iterations, count)
+
+    def report(self, name, label, build, iterations, count):
+        build()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            build()
+        elapsed = (time.perf_counter() - started) / iterations
+        self.stdout.write(f"{name:<14}{label:<22}{elapsed * 1000:>10.2f}{count / elapsed:>12.0f}")
@@ -0,0 +1,78 @@
+import io
+import json
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from backend.renderers import ORJSONParser, ORJSONRenderer, orjson
+from classes import fastpath
+from classes.models import Class, Enrollment, LessonAttendance
+from classes.serializers import ClassSerializer, LessonAttendanceSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare JSONRenderer/JSONParser with the orjson pair on class and attendance payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Rows in list payloads")
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson is not installed; ORJSONRenderer would only benchmark the stdlib fallback")
+        rows, iterations = options["rows"], options["iterations"]
+        payloads = self.build_payloads(rows)
+        stdlib, fast = JSONRenderer(), ORJSONRenderer()
+
+        self.stdout.write(f"{'payload':<22}{'KiB':>8}{'json ms':>10}{'orjson ms':>11}{'speedup':>9}")
+        for name, data in payloads.items():
+            expected = stdlib.render(data)
+            if fast.render(data) != expected:
+                raise CommandError(f"ORJSONRenderer output differs from JSONRenderer for {name}")
+            slow_ms = self.time(lambda: stdlib.render(data), iterations)
+            fast_ms = self.time(lambda: fast.render(data), iterations)
+            self.stdout.write(
+                f"{name:<22}{len(expected) / 1024:>8.1f}{slow_ms:>10.3f}{fast_ms:>11.3f}{slow_ms / fast_ms:>8.1f}x"
+            )
+
+        # Parsing: a bulk attendance upload as sent to POST /api/classes/lessons/attendance/
+        body = json.dumps({"attendance": [
+            {"lesson": 1, "student": i, "status": "present", "notes": ""} for i in range(rows)
+        ]}).encode()
+        context = {"encoding": "utf-8"}
+        slow_ms = self.time(lambda: JSONParser().parse(io.BytesIO(body), parser_context=context), iterations)
+        fast_ms = self.time(lambda: ORJSONParser().parse(io.BytesIO(body), parser_context=context), iterations)
+        self.stdout.write(
+            f"{'parse attendance':<22}{len(body) / 1024:>8.1f}{slow_ms:>10.3f}{fast_ms:>11.3f}{slow_ms / fast_ms:>8.1f}x"
+        )
+
+    def build_payloads(self, rows):
+        classes = Class.objects.select_related("teacher__user", "course").order_by("id")
+        enrollments = Enrollment.objects.order_by("enrolled_at", "id")
+        busiest_class = Class.objects.annotate(rows=Count("lessons")).order_by("-rows").first()
+        if busiest_class is None:
+            raise CommandError("No classes to benchmark; run seed_school first")
+        attendance = LessonAttendance.objects.select_related("student__user", "lesson").order_by("id")[:rows]
+        now = timezone.now()
+        return {
+            "class list": [fastpath.class_list_row(row) for row in fastpath.class_list_values(classes[:rows])],
+            "enrollment list": [fastpath.enrollment_row(row) for row in fastpath.enrollment_values(enrollments[:rows])],
+            "class detail": ClassSerializer(classes.prefetch_related("lessons").get(pk=busiest_class.pk)).data,
+            "attendance": LessonAttendanceSerializer(attendance, many=True).data,
+            # Raw values the serializers normally stringify, rendered by the encoders themselves
+            "raw rows": [
+                {"id": uuid4(), "at": now, "day": now.date(), "score": Decimal("3.75")} for _ in range(rows)
+            ],
+        }
+
+    def time(self, run, iterations):
+        run()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        return (time.perf_counter() - started) / iterations * 1000
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from backend.renderers import CSVRenderer
+from classes import services
+from students.models import Student
+
+
+class Command(BaseCommand):
+    help = "Enroll a cohort of students (a grade, or explicit ids) in a set of classes in one transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("classes", nargs="+", type=int, help="Class ids")
+        cohort = parser.add_mutually_exclusive_group(required=True)
+        cohort.add_argument("--grade", help="Enroll every student of this grade")
+        cohort.add_argument("--students", nargs="+", type=int, help="Student ids, in seat order")
+        parser.add_argument("--report", help="CSV file for students who did not fit (default: stderr)")
+
+    def handle(self, *args, **options):
+        if options["grade"] is not None:
+            student_ids = list(Student.objects.filter(grade=options["grade"]).order_by("pk").values_list("pk", flat=True))
+        else:
+            student_ids = options["students"]
+
+        started = time.perf_counter()
+        try:
+            enrolled, rejected = services.enroll_cohort(student_ids, options["classes"])
+        except services.EnrollmentError as exc:
+            raise CommandError(exc.messages[0])
+        elapsed = time.perf_counter() - started
+
+        if rejected:
+            rows = ((row["student_id"], row["class_id"], row["error"]) for row in rejected)
+            chunks = CSVRenderer().stream(["student_id", "class_id", "error"], rows)
+            if options["report"]:
+                with open(options["report"], "wb") as output:
+                    output.writelines(chunks)
+            else:
+                self.stderr.write(b"".join(chunks).decode(), ending="")
+        style = self.style.WARNING if rejected else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Enrolled {enrolled} of {len(student_ids)} student(s) x {len(options['classes'])} class(es) "
+            f"in {elapsed:.1f}s; {len(rejected)} rejected"
+        ))
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from backend.renderers import CSVRenderer, NDJSONRenderer
+from classes.exports import CHUNK_SIZE, EXPORTS
+
+RENDERERS = {renderer.format: renderer for renderer in (CSVRenderer, NDJSONRenderer)}
+
+
+class Command(BaseCommand):
+    help = "Stream an export (enrollments, attendance, rosters) as CSV or NDJSON with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=sorted(RENDERERS), default="csv")
+        parser.add_argument("--semester")
+        parser.add_argument("--class-id", type=int)
+        parser.add_argument("--output", help="File to write instead of stdout")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows fetched per cursor round trip")
+
+    def handle(self, *args, **options):
+        export = EXPORTS[options["dataset"]]
+        rows = export.rows(options["semester"], options["class_id"], chunk_size=options["chunk_size"])
+        chunks = RENDERERS[options["format"]]().stream(export.header, rows)
+
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                written = self.write(chunks, output)
+            self.stderr.write(f"Wrote {written} bytes to {options['output']}")
+        else:
+            self.write(chunks, sys.stdout.buffer)
+
+    def write(self, chunks, output):
+        written = 0
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+        output.flush()
+        return written
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from backend.renderers import CSVRenderer
+from classes import imports
+
+REPORT_HEADER = ["file", "line", "field", "error"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load users (with their student/teacher/parent profiles), classes and enrollments from CSV files "
+        "through COPY, in one transaction, and report every rejected row"
+    )
+
+    def add_arguments(self, parser):
+        for name in imports.STAGING:
+            parser.add_argument(f"--{name}", metavar="CSV", help=f"{name.capitalize()} file")
+        parser.add_argument("--errors", metavar="CSV", help="Write the rejected rows here instead of stderr")
+        parser.add_argument("--batch-size", type=int, default=imports.BATCH_SIZE,
+                            help="Rows validated and COPYed per batch")
+        parser.add_argument("--dry-run", action="store_true", help="Validate and report, then roll everything back")
+
+    def handle(self, *args, **options):
+        sources = {name: options[name] for name in imports.STAGING if options[name]}
+        if not sources:
+            raise CommandError("Nothing to import; pass at least one of --users, --classes or --enrollments")
+        if connection.vendor != "postgresql":
+            raise CommandError("import_school loads through COPY and needs PostgreSQL")
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+        if not is_psycopg3:
+            raise CommandError("import_school loads through COPY and needs psycopg 3 (cursor.copy)")
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            imports.create_staging(cursor)
+            for name, path in sources.items():
+                try:
+                    with open(path, newline="", encoding="utf-8-sig") as lines:
+                        imports.load(cursor, name, lines, options["batch_size"])
+                except (OSError, imports.ImportFileError) as exc:
+                    raise CommandError(str(exc))
+            summary = imports.merge(cursor)
+            rejected = list(imports.errors(cursor))
+            self.report(rejected, options["errors"])
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+
+        self.stdout.write(f"{'file':<14}{'rows':>8}{'created':>9}{'updated':>9}{'rejected':>10}")
+        for name in sources:
+            counts = summary[name]
+            self.stdout.write(
+                f"{name:<14}{counts['rows']:>8}{counts['created']:>9}{counts['updated']:>9}{counts['rejected']:>10}"
+            )
+        if summary["classes"]["promoted"]:
+            self.stdout.write(f"{summary['classes']['promoted']} student(s) promoted from waitlists")
+        verb = "Validated (dry run, rolled back)" if options["dry_run"] else "Imported"
+        style = self.style.WARNING if rejected else self.style.SUCCESS
+        self.stdout.write(style(f"{verb}; {len(rejected)} row(s) rejected"))
+
+    def report(self, rejected, path):
+        chunks = CSVRenderer().stream(REPORT_HEADER, rejected)
+        if path:
+            with open(path, "wb") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        elif rejected:
+            self.stderr.write(b"".join(chunks).decode(), ending="")
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+from classes import analytics
+
+
+class Command(BaseCommand):
+    help = "Recompute the attendance summary tables from LessonAttendance (after seeding, raw SQL or drift)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--class-id", type=int, nargs="+", dest="class_ids", help="Only these classes")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        students, weeks = analytics.rebuild(options["class_ids"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {students} student summaries and {weeks} weekly rows in {time.perf_counter() - started:.1f}s"
+        ))
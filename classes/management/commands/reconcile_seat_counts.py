@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Now
+from classes.models import Class, Enrollment
+
+
+class Command(BaseCommand):
+    help = "Recompute Class.enrolled_count from active enrollments and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report classes whose counter is off")
+
+    def handle(self, *args, **options):
+        active = (
+            Enrollment.objects.filter(class_instance=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('class_instance')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        actual = Coalesce(Subquery(active, output_field=IntegerField()), 0)
+
+        with transaction.atomic():
+            drifted = list(
+                Class.objects.select_for_update()
+                .annotate(actual=actual)
+                .filter(~Q(enrolled_count=F('actual')))
+                .values_list('pk', 'enrolled_count', 'actual')
+            )
+            for pk, stored, real in drifted:
+                self.stdout.write(f"Class {pk}: stored={stored} actual={real}")
+            if drifted and not options['dry_run']:
+                Class.objects.filter(pk__in=[pk for pk, _, _ in drifted]).update(enrolled_count=actual, updated_at=Now())
+
+        verb = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} class(es) with drifted seat counts"))
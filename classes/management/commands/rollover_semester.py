@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from classes.rollover import CHUNK_SIZE, RolloverError, check_dates, clone_classes, generate_lessons
+
+
+class Command(BaseCommand):
+    help = "Clone a semester's classes into a new semester and generate their lessons; safe to re-run"
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Semester to clone, e.g. 'Fall 2024'")
+        parser.add_argument("target", help="New semester, e.g. 'Fall 2025'")
+        parser.add_argument("--starts", type=date.fromisoformat, required=True, help="First day of lessons (YYYY-MM-DD)")
+        parser.add_argument("--ends", type=date.fromisoformat, required=True, help="Last day of lessons (YYYY-MM-DD)")
+        parser.add_argument("--no-teachers", action="store_true", help="Assign every copy to --teacher instead")
+        parser.add_argument("--teacher", type=int, help="Teacher id of every copy with --no-teachers")
+        parser.add_argument("--no-rooms", action="store_true", help="Leave rooms empty")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Classes per lesson transaction")
+
+    def handle(self, *args, **options):
+        try:
+            check_dates(options["source"], options["target"], options["starts"], options["ends"])
+            copies, cloned = clone_classes(
+                options["source"], options["target"],
+                keep_teachers=not options["no_teachers"], keep_rooms=not options["no_rooms"],
+                teacher_id=options["teacher"],
+            )
+        except RolloverError as exc:
+            raise CommandError(exc.messages[0])
+        self.stdout.write(f"Classes: {len(copies)} ({cloned} cloned now)")
+
+        total = 0
+        chunks = generate_lessons(copies.values(), options["starts"], options["ends"], chunk_size=options["chunk_size"])
+        for done, created in enumerate(chunks, 1):
+            total += created
+            self.stdout.write(f"  chunk {done}: {created} lessons")
+        self.stdout.write(self.style.SUCCESS(f"Created {total} lessons for {options['target']}"))
@@ -0,0 +1,198 @@
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.models import User
+from classes.models import Class, Course, Enrollment, Lesson, LessonAttendance
+from parents.models import Parent
+from students.models import Student
+from teachers.models import Teacher
+
+FIRST_NAMES = ["Ali", "Sara", "Reza", "Maryam", "Omid", "Neda", "Amir", "Leila", "Hamid", "Zahra", "Kian", "Parisa"]
+LAST_NAMES = ["Ahmadi", "Karimi", "Hosseini", "Rahimi", "Moradi", "Jafari", "Rezaei", "Sadeghi", "Mousavi", "Kazemi"]
+SUBJECTS = ["Mathematics", "Physics", "Chemistry", "Biology", "History", "Literature", "Geography", "Art",
+            "Computer Science", "Economics", "Music", "Philosophy"]
+DEPARTMENTS = ["Science", "Humanities", "Arts", "Technology"]
+LESSON_TYPES = ["lecture", "lecture", "lecture", "lab", "seminar", "review"]
+ATTENDANCE = ["present"] * 85 + ["late"] * 6 + ["absent"] * 6 + ["excused"] * 3
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic school (users, courses, classes, a semester of lessons, enrollments, attendance)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=1000)
+        parser.add_argument("--teachers", type=int, default=50)
+        parser.add_argument("--parents", type=int, default=500)
+        parser.add_argument("--admins", type=int, default=2)
+        parser.add_argument("--courses", type=int, default=40)
+        parser.add_argument("--classes", type=int, default=120)
+        parser.add_argument("--semester", default="Fall 2024")
+        parser.add_argument("--start", type=date.fromisoformat, default=date(2024, 9, 2),
+                            help="First Monday of the semester (YYYY-MM-DD)")
+        parser.add_argument("--weeks", type=int, default=16)
+        parser.add_argument("--classes-per-student", type=int, default=5)
+        parser.add_argument("--attendance-weeks", type=int, default=8,
+                            help="Record attendance for the first N weeks of lessons")
+        parser.add_argument("--password", default="school-pass-123", help="Password shared by every generated user")
+        parser.add_argument("--prefix", default="seed", help="Username/course code prefix, to seed more than once")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=f"{prefix}_").exists():
+            raise CommandError(f"Users with prefix {prefix!r} already exist; pass a different --prefix")
+
+        with transaction.atomic():
+            # Hash once: PBKDF2 per user would dominate the runtime
+            password = make_password(options["password"])
+            students = self.create_people(Student, User.Roles.STUDENT, options["students"], prefix, password)
+            teachers = self.create_people(Teacher, User.Roles.TEACHER, options["teachers"], prefix, password)
+            self.create_people(Parent, User.Roles.PARENT, options["parents"], prefix, password)
+            self.create_admins(options["admins"], prefix, password)
+
+            courses = self.create_courses(options["courses"], prefix)
+            classes = self.create_classes(options["classes"], courses, teachers, options["semester"])
+            meetings = self.create_lessons(classes, options["start"], options["weeks"])
+            rosters = self.create_enrollments(students, classes, options["classes_per_student"])
+            self.create_attendance(meetings, rosters, options["attendance_weeks"])
+
+        self.stdout.write(self.style.SUCCESS("Seeded school '%s'" % prefix))
+
+    def report(self, label, count):
+        self.stdout.write(f"  {label:<12}{count:>10}")
+
+    def bulk(self, model, objects):
+        created = []
+        for chunk in batched(objects, self.batch_size):
+            created.extend(model.objects.bulk_create(chunk))
+        return created
+
+    def make_users(self, role, count, prefix, password, **extra):
+        return self.bulk(User, (
+            User(
+                username=f"{prefix}_{role}_{i}",
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                email=f"{prefix}_{role}_{i}@school.test",
+                role=role,
+                password=password,
+                **extra,
+            )
+            for i in range(count)
+        ))
+
+    def create_people(self, profile_model, role, count, prefix, password):
+        users = self.make_users(role, count, prefix, password)
+        if profile_model is Student:
+            profiles = (Student(user=user, grade=str(self.rng.randint(7, 12))) for user in users)
+        elif profile_model is Teacher:
+            profiles = (Teacher(user=user, department=self.rng.choice(DEPARTMENTS)) for user in users)
+        else:
+            profiles = (Parent(user=user, phone=f"+98 912 {self.rng.randint(1000000, 9999999)}") for user in users)
+        created = self.bulk(profile_model, profiles)
+        self.report(role + "s", len(created))
+        return created
+
+    def create_admins(self, count, prefix, password):
+        admins = self.make_users(User.Roles.ADMIN, count, prefix, password, is_staff=True)
+        self.report("admins", len(admins))
+
+    def create_courses(self, count, prefix):
+        courses = self.bulk(Course, (
+            Course(
+                name=f"{SUBJECTS[i % len(SUBJECTS)]} {i // len(SUBJECTS) + 1}",
+                code=f"{prefix.upper()}{i:04d}",
+                description=f"Synthetic course {i}",
+                credits=self.rng.choice([1, 2, 3, 3, 4]),
+            )
+            for i in range(count)
+        ))
+        self.report("courses", len(courses))
+        return courses
+
+    def create_classes(self, count, courses, teachers, semester):
+        if not (courses and teachers):
+            return []
+        classes = self.bulk(Class, (
+            Class(
+                course=courses[i % len(courses)],
+                teacher=self.rng.choice(teachers),
+                name=f"{courses[i % len(courses)].name} - Section {chr(65 + i // len(courses) % 26)}",
+                semester=semester,
+                max_students=self.rng.randint(20, 40),
+                schedule="Weekly",
+                room=f"R{self.rng.randint(100, 399)}",
+            )
+            for i in range(count)
+        ))
+        self.report("classes", len(classes))
+        return classes
+
+    def create_lessons(self, classes, start, weeks):
+        """Create weekly lessons; returns {week: [(lesson_id, class_id), ...]}"""
+        pending = []
+        for class_instance in classes:
+            weekdays = sorted(self.rng.sample(range(5), self.rng.choice([1, 2, 3])))
+            hour = self.rng.randint(8, 15)
+            for week in range(weeks):
+                for weekday in weekdays:
+                    day = start + timedelta(weeks=week, days=weekday)
+                    pending.append((week, class_instance.id, Lesson(
+                        class_instance_id=class_instance.id,
+                        title=f"Week {week + 1} - {class_instance.name}",
+                        date=datetime.combine(day, time(hour), tzinfo=timezone.utc),
+                        lesson_type=self.rng.choice(LESSON_TYPES),
+                    )))
+        lessons = self.bulk(Lesson, (lesson for _, _, lesson in pending))
+        meetings = {}
+        for (week, class_id, _), lesson in zip(pending, lessons):
+            meetings.setdefault(week, []).append((lesson.id, class_id))
+        self.report("lessons", len(lessons))
+        return meetings
+
+    def create_enrollments(self, students, classes, per_student):
+        """Enroll students within capacity; returns {class_id: [student_id, ...]}"""
+        seats = {c.id: c.max_students for c in classes}
+        rosters = {c.id: [] for c in classes}
+        for student in students:
+            open_classes = [class_id for class_id, free in seats.items() if free > 0]
+            for class_id in self.rng.sample(open_classes, min(per_student, len(open_classes))):
+                seats[class_id] -= 1
+                rosters[class_id].append(student.id)
+
+        enrollments = self.bulk(Enrollment, (
+            Enrollment(student_id=student_id, class_instance_id=class_id)
+            for class_id, roster in rosters.items()
+            for student_id in roster
+        ))
+        for class_instance in classes:
+            class_instance.enrolled_count = len(rosters[class_instance.id])
+        Class.objects.bulk_update(classes, ["enrolled_count"], batch_size=self.batch_size)
+        self.report("enrollments", len(enrollments))
+        return rosters
+
+    def create_attendance(self, meetings, rosters, weeks):
+        rows = (
+            LessonAttendance(lesson_id=lesson_id, student_id=student_id, status=self.rng.choice(ATTENDANCE))
+            for week in range(weeks)
+            for lesson_id, class_id in meetings.get(week, [])
+            for student_id in rosters[class_id]
+        )
+        total = 0
+        for chunk in batched(rows, self.batch_size):
+            LessonAttendance.objects.bulk_create(chunk)
+            total += len(chunk)
+        self.report("attendance", total)
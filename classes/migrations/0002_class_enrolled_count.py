@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:59
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_enrolled_count(apps, schema_editor):
+    Class = apps.get_model('classes', 'Class')
+    Enrollment = apps.get_model('classes', 'Enrollment')
+    active = (
+        Enrollment.objects.filter(class_instance=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('class_instance')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Class.objects.update(enrolled_count=Coalesce(Subquery(active, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_enrolled_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.7 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0005_search_vectors'),
+        ('teachers', '0002_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['semester', 'is_active'], name='class_semester_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['course', 'semester'], name='class_course_semester_idx'),
+        ),
+    ]
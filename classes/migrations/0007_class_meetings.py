@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:17
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0006_catalog_indexes'),
+        ('teachers', '0002_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassMeeting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('room', models.CharField(blank=True, max_length=50)),
+                ('semester', models.CharField(editable=False, max_length=50)),
+                ('period', models.GeneratedField(db_persist=True, expression=models.Func(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('weekday'), '*', models.Value(1440)), '+', django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.functions.datetime.ExtractHour('start_time'), models.IntegerField()), '*', models.Value(60))), '+', django.db.models.functions.comparison.Cast(django.db.models.functions.datetime.ExtractMinute('start_time'), models.IntegerField())), django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('weekday'), '*', models.Value(1440)), '+', django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.functions.datetime.ExtractHour('end_time'), models.IntegerField()), '*', models.Value(60))), '+', django.db.models.functions.comparison.Cast(django.db.models.functions.datetime.ExtractMinute('end_time'), models.IntegerField())), function='int4range', output_field=django.contrib.postgres.fields.ranges.IntegerRangeField()), output_field=django.contrib.postgres.fields.ranges.IntegerRangeField())),
+                ('class_instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meetings', to='classes.class')),
+                ('teacher', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='teachers.teacher')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+                'indexes': [django.contrib.postgres.indexes.GistIndex(fields=['period'], name='meeting_period_idx'), models.Index(fields=['semester', 'teacher'], name='meeting_semester_teacher_idx'), models.Index(fields=['semester', 'room'], name='meeting_semester_room_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='classmeeting',
+            constraint=models.CheckConstraint(check=models.Q(('end_time__gt', models.F('start_time'))), name='meeting_ends_after_start'),
+        ),
+    ]
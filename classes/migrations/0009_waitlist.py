@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0008_semester_rollover'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('class_instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='classes.class')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='students.student')),
+            ],
+            options={
+                'verbose_name_plural': 'Waitlist entries',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['class_instance', 'id'], name='waitlist_class_id_idx')],
+                'unique_together': {('student', 'class_instance')},
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.0.7 on 2026-10-18 20:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# The common 4.0 scale; schools edit it in the admin
+DEFAULT_SCALE = [
+    ('A', '4.00', '93'), ('A-', '3.70', '90'),
+    ('B+', '3.30', '87'), ('B', '3.00', '83'), ('B-', '2.70', '80'),
+    ('C+', '2.30', '77'), ('C', '2.00', '73'), ('C-', '1.70', '70'),
+    ('D+', '1.30', '67'), ('D', '1.00', '63'), ('D-', '0.70', '60'),
+    ('F', '0.00', '0'),
+]
+
+
+def populate_grade_points(apps, schema_editor):
+    GradingScale = apps.get_model('classes', 'GradingScale')
+    Enrollment = apps.get_model('classes', 'Enrollment')
+    GradingScale.objects.bulk_create(
+        GradingScale(letter=letter, points=points, min_score=min_score) for letter, points, min_score in DEFAULT_SCALE
+    )
+    points = GradingScale.objects.filter(letter__iexact=OuterRef('grade')).values('points')[:1]
+    Enrollment.objects.exclude(grade='').update(grade_points=Subquery(points))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0010_attendance_summaries'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingScale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('letter', models.CharField(max_length=5, unique=True)),
+                ('points', models.DecimalField(decimal_places=2, max_digits=3)),
+                ('min_score', models.DecimalField(decimal_places=2, help_text='Lowest assessment percentage earning this letter', max_digits=5, unique=True)),
+            ],
+            options={
+                'ordering': ['-min_score'],
+            },
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='grade_points',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='score',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=5, null=True),
+        ),
+        migrations.CreateModel(
+            name='Assessment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('weight', models.DecimalField(decimal_places=2, default=1, max_digits=5)),
+                ('max_points', models.DecimalField(decimal_places=2, default=100, max_digits=6)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('class_instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assessments', to='classes.class')),
+            ],
+            options={
+                'ordering': ['due_date', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AssessmentGrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assessment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grades', to='classes.assessment')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assessment_grades', to='students.student')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='assessment',
+            constraint=models.CheckConstraint(check=models.Q(('weight__gt', 0)), name='assessment_weight_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='assessment',
+            constraint=models.CheckConstraint(check=models.Q(('max_points__gt', 0)), name='assessment_max_points_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='assessmentgrade',
+            constraint=models.CheckConstraint(check=models.Q(('points__gte', 0)), name='assessment_grade_points_nonnegative'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='assessmentgrade',
+            unique_together={('assessment', 'student')},
+        ),
+        migrations.RunPython(populate_grade_points, migrations.RunPython.noop),
+    ]
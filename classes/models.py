@@ -1,7 +1,24 @@
 # classes/models.py
-from django.db import models
+from django.contrib.postgres.fields import IntegerRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, transaction
+from django.db.models import F, Func, Q
+from django.db.models.functions import Cast, ExtractHour, ExtractMinute, Greatest, Now
 from django.conf import settings
-from django.core.exceptions import ValidationError
+from backend import serialization_cache
+
+# Text search configuration used by the generated search_vector columns and
+# by classes.search; queries must use the same one to hit the GIN indexes.
+SEARCH_CONFIG = 'english'
+
+def search_vector_field(*weighted_fields):
+    """Stored tsvector column generated from (field, weight) pairs"""
+    vectors = [SearchVector(field, weight=weight, config=SEARCH_CONFIG) for field, weight in weighted_fields]
+    expression = vectors[0]
+    for vector in vectors[1:]:
+        expression = expression + vector
+    return models.GeneratedField(expression=expression, output_field=SearchVectorField(), db_persist=True)
 
 class Course(models.Model):
     """Represents a course/subject like 'Mathematics', 'Physics', etc."""
@@ -9,6 +26,13 @@ class Course(models.Model):
     code = models.CharField(max_length=20, unique=True)  # e.g., 'MATH101'
     description = models.TextField(blank=True)
     credits = models.PositiveIntegerField(default=3)
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = search_vector_field(('code', 'A'), ('name', 'A'), ('description', 'B'))
+    
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='course_search_idx'),
+        ]
     
     def __str__(self):
         return f"{self.code} - {self.name}"
@@ -24,20 +48,121 @@ class Class(models.Model):
     room = models.CharField(max_length=50, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized count of active enrollments, maintained by Enrollment.save()
+    # and the post_delete signal. Run `manage.py reconcile_seat_counts` to repair drift.
+    enrolled_count = models.PositiveIntegerField(default=0, editable=False)
+    # The class this one was cloned from by a semester rollover (classes.rollover)
+    source_class = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='rollovers', editable=False
+    )
+    search_vector = search_vector_field(('name', 'A'), ('semester', 'B'), ('room', 'C'))
     
     class Meta:
         verbose_name_plural = "Classes"
+        constraints = [
+            # A class is rolled over into a given semester at most once
+            models.UniqueConstraint(fields=['source_class', 'semester'], name='class_source_semester_uniq'),
+        ]
+        indexes = [
+            GinIndex(fields=['search_vector'], name='class_search_idx'),
+            # Catalog filters (classes.filters)
+            models.Index(fields=['semester', 'is_active'], name='class_semester_active_idx'),
+            models.Index(fields=['course', 'semester'], name='class_course_semester_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.teacher.user.get_full_name()}"
     
-    @property
-    def enrolled_count(self):
-        return self.enrollments.filter(is_active=True).count()
-    
     @property
     def available_spots(self):
         return self.max_students - self.enrolled_count
+    
+    @classmethod
+    def adjust_enrolled_count(cls, class_id, delta):
+        """Atomically shift the seat counter of a class by `delta`"""
+        if delta:
+            cls.objects.filter(pk=class_id).update(
+                enrolled_count=Greatest(F('enrolled_count') + delta, 0),
+                updated_at=Now(),
+            )
+            serialization_cache.invalidate(cls, [class_id])
+
+MINUTES_PER_DAY = 24 * 60
+
+def minute_of_week(weekday, time):
+    """Minutes since Monday 00:00, as stored in ClassMeeting.period"""
+    return weekday * MINUTES_PER_DAY + time.hour * 60 + time.minute
+
+def _minute_of_week_sql(time_field):
+    return (
+        F('weekday') * MINUTES_PER_DAY
+        + Cast(ExtractHour(time_field), models.IntegerField()) * 60
+        + Cast(ExtractMinute(time_field), models.IntegerField())
+    )
+
+class ClassMeeting(models.Model):
+    """
+    A weekly meeting slot of a class. `period` is the slot as a range of
+    minutes since Monday 00:00, GiST-indexed so overlapping slots are found
+    with one index lookup (see classes.services.schedule_class).
+    """
+    class Weekday(models.IntegerChoices):
+        MONDAY = 0, 'Monday'
+        TUESDAY = 1, 'Tuesday'
+        WEDNESDAY = 2, 'Wednesday'
+        THURSDAY = 3, 'Thursday'
+        FRIDAY = 4, 'Friday'
+        SATURDAY = 5, 'Saturday'
+        SUNDAY = 6, 'Sunday'
+
+    class_instance = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='meetings')
+    weekday = models.PositiveSmallIntegerField(choices=Weekday.choices)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    room = models.CharField(max_length=50, blank=True)
+    # Copied from the class so conflict checks need no join; see save()
+    semester = models.CharField(max_length=50, editable=False)
+    teacher = models.ForeignKey('teachers.Teacher', on_delete=models.CASCADE, related_name='+', editable=False)
+    period = models.GeneratedField(
+        expression=Func(
+            _minute_of_week_sql('start_time'), _minute_of_week_sql('end_time'),
+            function='int4range', output_field=IntegerRangeField(),
+        ),
+        output_field=IntegerRangeField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        constraints = [
+            models.CheckConstraint(check=Q(end_time__gt=F('start_time')), name='meeting_ends_after_start'),
+        ]
+        indexes = [
+            GistIndex(fields=['period'], name='meeting_period_idx'),
+            models.Index(fields=['semester', 'teacher'], name='meeting_semester_teacher_idx'),
+            models.Index(fields=['semester', 'room'], name='meeting_semester_room_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M} ({self.room or 'no room'})"
+
+    def save(self, *args, **kwargs):
+        self.semester = self.class_instance.semester
+        self.teacher_id = self.class_instance.teacher_id
+        self.room = self.room or self.class_instance.room
+        super().save(*args, **kwargs)
+
+class Holiday(models.Model):
+    """A day without lessons; semester rollovers skip it when generating the calendar"""
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+    
+    class Meta:
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.date} - {self.name}"
 
 class Lesson(models.Model):
     """Individual lesson within a class"""
@@ -59,13 +184,50 @@ class Lesson(models.Model):
     )
     materials = models.TextField(blank=True, help_text="Links to materials, readings, etc.")
     is_cancelled = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = search_vector_field(('title', 'A'), ('description', 'B'), ('materials', 'C'))
     
     class Meta:
         ordering = ['date']
+        indexes = [
+            models.Index(fields=['date', 'id'], name='lesson_date_id_idx'),
+            GinIndex(fields=['search_vector'], name='lesson_search_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Where the lesson's attendance is counted (see classes.signals.move_attendance)
+        instance._loaded_placement = instance._placement()
+        return instance
+    
+    def _placement(self):
+        return tuple(self.__dict__.get(name) for name in ('class_instance_id', 'date'))
     
     def __str__(self):
         return f"{self.title} - {self.class_instance.name}"
 
+class GradingScale(models.Model):
+    """One step of the grading scale: a letter grade, its grade points and the lowest score earning it"""
+    letter = models.CharField(max_length=5, unique=True)
+    points = models.DecimalField(max_digits=3, decimal_places=2)
+    min_score = models.DecimalField(max_digits=5, decimal_places=2, unique=True,
+                                    help_text="Lowest assessment percentage earning this letter")
+    
+    class Meta:
+        ordering = ['-min_score']
+    
+    def __str__(self):
+        return f"{self.letter} ({self.points})"
+    
+    @classmethod
+    def points_for(cls, letter):
+        """Grade points of a letter grade, or None for blank or unknown letters (e.g. 'W')"""
+        letter = (letter or '').strip()
+        if not letter:
+            return None
+        return cls.objects.filter(letter__iexact=letter).values_list('points', flat=True).first()
+
 class Enrollment(models.Model):
     """Student enrollment in a class"""
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='enrollments')
@@ -73,21 +235,110 @@ class Enrollment(models.Model):
     enrolled_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     grade = models.CharField(max_length=5, blank=True)  # Final grade
+    # Numeric forms of the grade, maintained by classes.gradebook: the weighted
+    # assessment percentage, and the GradingScale points of `grade`
+    score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, editable=False)
+    grade_points = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['student', 'class_instance']
+        indexes = [
+            models.Index(fields=['enrolled_at', 'id'], name='enrollment_enrolled_at_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} enrolled in {self.class_instance.name}"
     
-    def clean(self):
-        # Check if class is full
-        if self.class_instance.available_spots <= 0 and not self.pk:
-            raise ValidationError("This class is full.")
-    
     def save(self, *args, **kwargs):
-        self.clean()
-        super().save(*args, **kwargs)
+        # Capacity and duplicate checks live in classes.services.enroll()
+        self.grade_points = GradingScale.points_for(self.grade)
+        if 'update_fields' in kwargs and 'grade' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'grade_points'}
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # Lock our own row so concurrent edits see a consistent previous state
+                previous = Enrollment.objects.select_for_update().filter(pk=self.pk).values(
+                    'class_instance_id', 'is_active'
+                ).first()
+            super().save(*args, **kwargs)
+            freed = self._update_seat_counts(previous)
+            if freed:
+                # Same transaction: the seat goes to the head of the waitlist, if any
+                from .services import promote_waitlist
+                promote_waitlist(freed)
+    
+    def _update_seat_counts(self, previous):
+        """Move the seat counters; returns the id of a class that lost a seat, if any"""
+        freed = None
+        if previous and previous['is_active']:
+            if self.is_active and previous['class_instance_id'] == self.class_instance_id:
+                return None
+            freed = previous['class_instance_id']
+            Class.adjust_enrolled_count(freed, -1)
+        if self.is_active:
+            Class.adjust_enrolled_count(self.class_instance_id, 1)
+        if Enrollment.class_instance.is_cached(self):
+            self.class_instance.refresh_from_db(fields=['enrolled_count'])
+        return freed
+
+class WaitlistEntry(models.Model):
+    """
+    A student waiting for a seat in a full class. Entries are served first in,
+    first out by id; see classes.services.promote_waitlist().
+    """
+    class_instance = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='waitlist')
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='waitlist_entries')
+    joined_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        unique_together = ['student', 'class_instance']
+        verbose_name_plural = "Waitlist entries"
+        indexes = [
+            # Queue head and position counts
+            models.Index(fields=['class_instance', 'id'], name='waitlist_class_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.user.get_full_name()} waiting for {self.class_instance.name}"
+
+class Assessment(models.Model):
+    """A graded piece of work in a class; its weight is relative to the class's other assessments"""
+    class_instance = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='assessments')
+    title = models.CharField(max_length=200)
+    weight = models.DecimalField(max_digits=5, decimal_places=2, default=1)
+    max_points = models.DecimalField(max_digits=6, decimal_places=2, default=100)
+    due_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['due_date', 'id']
+        constraints = [
+            models.CheckConstraint(check=Q(weight__gt=0), name='assessment_weight_positive'),
+            models.CheckConstraint(check=Q(max_points__gt=0), name='assessment_max_points_positive'),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} - {self.class_instance.name}"
+
+class AssessmentGrade(models.Model):
+    """Points a student earned on an assessment"""
+    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='grades')
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='assessment_grades')
+    points = models.DecimalField(max_digits=6, decimal_places=2)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['assessment', 'student']
+        constraints = [
+            models.CheckConstraint(check=Q(points__gte=0), name='assessment_grade_points_nonnegative'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} on {self.assessment_id}: {self.points}"
 
 class LessonAttendance(models.Model):
     """Track student attendance for individual lessons"""
@@ -105,9 +356,46 @@ class LessonAttendance(models.Model):
     )
     notes = models.TextField(blank=True)
     recorded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['lesson', 'student']
     
     def __str__(self):
-        return f"{self.student.user.get_full_name()} - {self.lesson.title} ({self.status})"
\ No newline at end of file
+        return f"{self.student.user.get_full_name()} - {self.lesson.title} ({self.status})"
+
+class AttendanceCounts(models.Model):
+    """Lessons per attendance status; maintained by classes.analytics, never edited by hand"""
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    excused = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+
+class AttendanceSummary(AttendanceCounts):
+    """Attendance of one student in one class"""
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='attendance_summaries')
+    class_instance = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='attendance_summaries')
+    
+    class Meta:
+        unique_together = ['student', 'class_instance']
+        verbose_name_plural = "Attendance summaries"
+    
+    def __str__(self):
+        return f"{self.student_id} in {self.class_instance_id}: {self.present}/{self.absent}/{self.late}/{self.excused}"
+
+class WeeklyAttendance(AttendanceCounts):
+    """Attendance of a whole class over one week (starting Monday)"""
+    class_instance = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='weekly_attendance')
+    week = models.DateField()
+    
+    class Meta:
+        ordering = ['week']
+        unique_together = ['class_instance', 'week']
+        verbose_name_plural = "Weekly attendance"
+    
+    def __str__(self):
+        return f"{self.class_instance_id} week of {self.week}"
@@ -0,0 +1,9 @@
+from backend.pagination import IdCursorPagination
+
+
+class LessonCursorPagination(IdCursorPagination):
+    ordering = ('date', 'id')
+
+
+class EnrollmentCursorPagination(IdCursorPagination):
+    ordering = ('enrolled_at', 'id')
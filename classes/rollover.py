@@ -0,0 +1,222 @@
+"""
+Semester rollover: clone a semester's classes into a new one and generate
+their lesson calendar (see `manage.py rollover_semester` and the
+`classes/rollover/` endpoint).
+
+Every active class of the source semester gets a copy in the target
+semester, linked back through Class.source_class, together with its
+weekly meetings. Each meeting then becomes one dated Lesson per matching
+weekday between the start and end dates, skipping Holiday dates.
+
+Running a rollover again is safe and picks up where an interrupted run
+stopped: classes that already have a copy are not cloned again, and
+lessons are only created for (class, start time) pairs that do not exist
+yet. Lessons are written class chunk by class chunk, each in its own
+transaction, so a failure only loses the chunk in progress.
+"""
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from teachers.models import Teacher
+from .models import Class, ClassMeeting, Holiday, Lesson, minute_of_week
+
+# Classes whose lessons are generated per transaction
+CHUNK_SIZE = 100
+BATCH_SIZE = 2000
+
+
+class RolloverError(ValidationError):
+    """Raised when a rollover is asked for with inconsistent options"""
+
+
+def _lock(semester):
+    # Serializes rollovers into the same semester (released with the transaction)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"classes.rollover:{semester}"])
+
+
+def _slot(weekday, start_time, end_time):
+    return f"{ClassMeeting.Weekday(weekday).label} {start_time:%H:%M}-{end_time:%H:%M}"
+
+
+def _reject_conflicts(class_ids, target, keep_teachers, keep_rooms, teacher_id, shown=5):
+    """
+    Raise RolloverError if the meetings of classes `class_ids`, copied into
+    semester `target` with their new teacher and room, would overlap each
+    other or a meeting already in `target` with the same teacher or room.
+    One query, using the same `period` overlap as services.check_schedule().
+    """
+    meetings, classes = ClassMeeting._meta.db_table, Class._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH planned AS (
+                SELECT m.id, m.class_instance_id, c.name, m.weekday, m.start_time, m.end_time, m.period,
+                       CASE WHEN %(keep_teachers)s THEN c.teacher_id ELSE %(teacher_id)s END AS teacher_id,
+                       CASE WHEN %(keep_rooms)s THEN m.room ELSE '' END AS room
+                FROM {meetings} m JOIN {classes} c ON c.id = m.class_instance_id
+                WHERE m.class_instance_id = ANY(%(class_ids)s)
+            ), booked AS (
+                SELECT m.id, m.class_instance_id, c.name, m.weekday, m.start_time, m.end_time, m.period,
+                       m.teacher_id, m.room, false AS planned
+                FROM {meetings} m JOIN {classes} c ON c.id = m.class_instance_id
+                WHERE m.semester = %(target)s
+                UNION ALL
+                SELECT *, true FROM planned
+            )
+            SELECT p.name, p.weekday, p.start_time, p.end_time, o.name, o.weekday, o.start_time, o.end_time,
+                   p.teacher_id = o.teacher_id, p.room, count(*) OVER ()
+            FROM planned p JOIN booked o
+              ON o.period && p.period AND o.class_instance_id <> p.class_instance_id
+             AND (o.teacher_id = p.teacher_id OR (p.room <> '' AND o.room = p.room))
+            -- Each pair of copies once
+            WHERE NOT o.planned OR o.id > p.id
+            ORDER BY p.name, p.weekday, p.start_time
+            LIMIT %(shown)s
+        """, {
+            'class_ids': list(class_ids), 'target': target, 'keep_teachers': keep_teachers,
+            'keep_rooms': keep_rooms, 'teacher_id': teacher_id, 'shown': shown,
+        })
+        rows = cursor.fetchall()
+    if not rows:
+        return
+    clashes = [
+        f"{name} on {_slot(weekday, start, end)} and {other} on {_slot(other_weekday, other_start, other_end)}"
+        f" share {'a teacher' if same_teacher else f'room {room}'}"
+        for name, weekday, start, end, other, other_weekday, other_start, other_end, same_teacher, room, _ in rows
+    ]
+    total = rows[0][-1]
+    more = f"; and {total - len(rows)} more" if total > len(rows) else ""
+    raise RolloverError(f"{target} would double-book {total} meeting(s): {'; '.join(clashes)}{more}.")
+
+
+def check_dates(source, target, starts, ends):
+    if source == target:
+        raise RolloverError("The target semester must differ from the source semester.")
+    if ends < starts:
+        raise RolloverError("The semester must end on or after its start date.")
+
+
+def clone_classes(source, target, keep_teachers=True, keep_rooms=True, teacher_id=None):
+    """
+    Copy the active classes of semester `source`, and their meetings, into
+    semester `target`. Classes copied by an earlier run are left alone.
+
+    Without `keep_teachers` every copy is assigned to `teacher_id`; without
+    `keep_rooms` copies and their meetings have no room. Nothing is copied
+    if the copies would double-book a teacher or room in `target`. Returns
+    ({source class id: copy id} for every copy, number created now).
+    """
+    if not keep_teachers and not Teacher.objects.filter(pk=teacher_id).exists():
+        raise RolloverError("A valid teacher_id is required when teachers are not kept.")
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # The rollover lock, and the one of services.schedule_class() so no
+            # slot of the target semester is booked while the copies are checked
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s)), pg_advisory_xact_lock(hashtext(%s))",
+                [f"classes.rollover:{target}", f"classes.schedule:{target}"],
+            )
+        sources = list(Class.objects.filter(semester=source, is_active=True).order_by('pk'))
+        copies = dict(
+            Class.objects.filter(semester=target, source_class__in=sources).values_list('source_class_id', 'pk')
+        )
+        _reject_conflicts(
+            [original.pk for original in sources if original.pk not in copies],
+            target, keep_teachers, keep_rooms, teacher_id,
+        )
+        new = [
+            Class(
+                course_id=original.course_id,
+                teacher_id=original.teacher_id if keep_teachers else teacher_id,
+                name=original.name,
+                semester=target,
+                max_students=original.max_students,
+                schedule=original.schedule,
+                room=original.room if keep_rooms else '',
+                source_class_id=original.pk,
+            )
+            for original in sources if original.pk not in copies
+        ]
+        new = Class.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        by_source = {copy.source_class_id: copy for copy in new}
+        ClassMeeting.objects.bulk_create(
+            (
+                ClassMeeting(
+                    class_instance_id=by_source[meeting.class_instance_id].pk,
+                    semester=target,
+                    teacher_id=by_source[meeting.class_instance_id].teacher_id,
+                    weekday=meeting.weekday,
+                    start_time=meeting.start_time,
+                    end_time=meeting.end_time,
+                    room=meeting.room if keep_rooms else '',
+                )
+                for meeting in ClassMeeting.objects.filter(class_instance_id__in=by_source)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    copies.update((source_id, copy.pk) for source_id, copy in by_source.items())
+    return copies, len(new)
+
+
+def calendar(starts, ends):
+    """{weekday: [date, ...]} of the days from `starts` to `ends` (inclusive) that are not holidays"""
+    holidays = set(Holiday.objects.filter(date__range=(starts, ends)).values_list('date', flat=True))
+    days = {weekday: [] for weekday in range(7)}
+    day = starts
+    while day <= ends:
+        if day not in holidays:
+            days[day.weekday()].append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def generate_lessons(class_ids, starts, ends, chunk_size=CHUNK_SIZE):
+    """
+    Create one Lesson per meeting of each class on every non-holiday date
+    from `starts` to `ends`, skipping lessons that already exist at the same
+    start time. Yields the number of lessons created per chunk of classes.
+    """
+    days = calendar(starts, ends)
+    tz = timezone.get_current_timezone()
+    class_ids = iter(sorted(class_ids))
+    while chunk := list(islice(class_ids, chunk_size)):
+        with transaction.atomic():
+            classes = {pk: (name, semester) for pk, name, semester in
+                       Class.objects.filter(pk__in=chunk).values_list('pk', 'name', 'semester')}
+            # Same lock as clone_classes(), so concurrent runs cannot both create a lesson
+            for semester in sorted({semester for _, semester in classes.values()}):
+                _lock(semester)
+            existing = set(Lesson.objects.filter(class_instance_id__in=chunk).values_list('class_instance_id', 'date'))
+            lessons = []
+            for meeting in ClassMeeting.objects.filter(class_instance_id__in=chunk).order_by():
+                name = classes[meeting.class_instance_id][0]
+                duration = minute_of_week(0, meeting.end_time) - minute_of_week(0, meeting.start_time)
+                for day in days[meeting.weekday]:
+                    start = datetime.combine(day, meeting.start_time, tzinfo=tz)
+                    if (meeting.class_instance_id, start) in existing:
+                        continue
+                    lessons.append(Lesson(
+                        class_instance_id=meeting.class_instance_id,
+                        title=f"Week {(day - starts).days // 7 + 1} - {name}",
+                        date=start,
+                        duration_minutes=duration,
+                    ))
+            Lesson.objects.bulk_create(lessons, batch_size=BATCH_SIZE)
+        yield len(lessons)
+
+
+def rollover(source, target, starts, ends, keep_teachers=True, keep_rooms=True, teacher_id=None,
+             chunk_size=CHUNK_SIZE):
+    """
+    Clone semester `source` into `target` and generate lessons from
+    `starts` to `ends`. Returns {'classes', 'cloned', 'lessons'}: the number
+    of classes in the rollover, how many of them were copied now, and how
+    many lessons were created now.
+    """
+    check_dates(source, target, starts, ends)
+    copies, cloned = clone_classes(source, target, keep_teachers, keep_rooms, teacher_id)
+    lessons = sum(generate_lessons(copies.values(), starts, ends, chunk_size=chunk_size))
+    return {'classes': len(copies), 'cloned': cloned, 'lessons': lessons}
@@ -0,0 +1,78 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, Q
+from django.utils.html import escape
+from .models import SEARCH_CONFIG, Course
+
+# Matches are delimited with private-use characters, which teacher-entered
+# text cannot smuggle in as markup; render_headline() escapes the snippet and
+# only then turns them into <mark> tags.
+MARK_START, MARK_STOP = '\ue000', '\ue001'
+
+HEADLINE_OPTIONS = {
+    'start_sel': MARK_START,
+    'stop_sel': MARK_STOP,
+    'max_words': 35,
+    'min_words': 15,
+    'max_fragments': 2,
+}
+
+
+def parse_query(text):
+    """Build a tsquery from user input using web search syntax ("quoted", or, -not)"""
+    return SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+
+
+def headline(field, query, **options):
+    return SearchHeadline(field, query, config=SEARCH_CONFIG, **{**HEADLINE_OPTIONS, **options})
+
+
+def render_headline(snippet):
+    """HTML of a headline snippet: the text escaped, the matched terms in <mark> tags"""
+    return escape(snippet).replace(MARK_START, '<mark>').replace(MARK_STOP, '</mark>')
+
+
+def rank(queryset, query, headline_field, limit, also_match=None, extra_rank=None, **headline_options):
+    """
+    Return the `limit` best matches for `query` in `queryset`, best first.
+
+    Matching goes through the GIN index on `search_vector`; `also_match` is
+    OR-ed in (it should be index-backed too). Each row is annotated with
+    `rank` and a `headline` snippet of `headline_field` with the matched
+    terms between MARK_START and MARK_STOP (see render_headline()).
+    """
+    condition = Q(search_vector=query)
+    if also_match is not None:
+        condition |= also_match
+    score = SearchRank(F('search_vector'), query)
+    if extra_rank is not None:
+        score = score + extra_rank
+    return queryset.filter(condition).annotate(
+        rank=score,
+        headline=headline(headline_field, query, **headline_options),
+    ).order_by('-rank', 'id')[:limit]
+
+
+def search_courses(query, courses, limit):
+    courses = courses.only('id', 'code', 'name', 'credits')
+    return rank(courses, query, 'description', limit)
+
+
+def search_classes(query, classes, limit):
+    """Classes matching on their own text or on their course's"""
+    matching_courses = Course.objects.filter(search_vector=query).values('pk')
+    classes = classes.select_related('course').only(
+        'id', 'name', 'semester', 'room', 'is_active', 'course__code', 'course__name'
+    )
+    return rank(
+        classes, query, 'name', limit,
+        also_match=Q(course_id__in=matching_courses),
+        extra_rank=SearchRank(F('course__search_vector'), query),
+        highlight_all=True,
+    )
+
+
+def search_lessons(query, lessons, limit):
+    lessons = lessons.select_related('class_instance').only(
+        'id', 'title', 'date', 'lesson_type', 'is_cancelled', 'class_instance__name'
+    )
+    return rank(lessons, query, 'description', limit)
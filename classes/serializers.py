@@ -1,26 +1,55 @@
 # classes/serializers.py
+from decimal import Decimal
+
+from django.db import transaction
 from rest_framework import serializers
-from .models import Course, Class, Lesson, Enrollment, LessonAttendance
+from accounts.serializers import UserRowSerializer
+from backend.serialization_cache import CachedSerializerMixin
+from backend.sparse import SparseFieldsMixin
+from .models import (
+    Assessment, AssessmentGrade, AttendanceSummary, Course, Class, ClassMeeting, Lesson, Enrollment, LessonAttendance,
+    WeeklyAttendance
+)
+from . import search, services
 from students.serializers import StudentSerializer
 from teachers.serializers import TeacherSerializer
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(CachedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = ['id', 'name', 'code', 'description', 'credits']
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsMixin, CachedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Lesson
         fields = ['id', 'title', 'description', 'date', 'duration_minutes', 
                  'lesson_type', 'materials', 'is_cancelled']
 
-class ClassSerializer(serializers.ModelSerializer):
+class ClassMeetingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ClassMeeting
+        fields = ['id', 'weekday', 'start_time', 'end_time', 'room']
+
+    def validate(self, attrs):
+        # Meetings replace the whole timetable, so a PATCH of the class (which
+        # makes every nested serializer partial) still needs complete slots
+        missing = [name for name in ('weekday', 'start_time', 'end_time') if attrs.get(name) is None]
+        if missing:
+            raise serializers.ValidationError({name: self.fields[name].error_messages['required'] for name in missing})
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError({'end_time': "Must be after start_time."})
+        return attrs
+
+class ClassSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ('teacher', 'course', 'lessons')
+    source_fields = {'available_spots': ('max_students', 'enrolled_count')}
     teacher = TeacherSerializer(read_only=True)
     course = CourseSerializer(read_only=True)
     enrolled_count = serializers.ReadOnlyField()
     available_spots = serializers.ReadOnlyField()
     lessons = LessonSerializer(many=True, read_only=True)
+    # Replaced as a whole on write; conflicts are checked by services.schedule_class()
+    meetings = ClassMeetingSerializer(many=True, required=False)
     
     # Write fields for creation/updates
     teacher_id = serializers.IntegerField(write_only=True)
@@ -30,11 +59,44 @@ class ClassSerializer(serializers.ModelSerializer):
         model = Class
         fields = ['id', 'name', 'semester', 'max_students', 'schedule', 'room', 
                  'is_active', 'created_at', 'teacher', 'course', 'enrolled_count', 
-                 'available_spots', 'lessons', 'teacher_id', 'course_id']
+                 'available_spots', 'lessons', 'meetings', 'teacher_id', 'course_id']
         read_only_fields = ['id', 'created_at']
 
-class ClassListSerializer(serializers.ModelSerializer):
+    def create(self, validated_data):
+        meetings = validated_data.pop('meetings', [])
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            self._schedule(instance, meetings)
+        return instance
+
+    def update(self, instance, validated_data):
+        meetings = validated_data.pop('meetings', None)
+        moved = any(
+            name in validated_data and validated_data[name] != getattr(instance, name)
+            for name in ('teacher_id', 'semester')
+        )
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if meetings is None and moved:
+                # Keep the slots, but check them against the new teacher or semester
+                meetings = list(instance.meetings.values('weekday', 'start_time', 'end_time', 'room'))
+            if meetings is not None:
+                self._schedule(instance, meetings)
+        return instance
+
+    def _schedule(self, instance, meetings):
+        try:
+            services.schedule_class(instance, meetings)
+        except services.ScheduleConflict as exc:
+            raise serializers.ValidationError({'meetings': exc.messages})
+
+class ClassListSerializer(SparseFieldsMixin, CachedSerializerMixin, serializers.ModelSerializer):
     """Simplified serializer for list views"""
+    cache_dependencies = ('course', 'teacher.user')
+    source_fields = {
+        'teacher_name': ('teacher__user__first_name', 'teacher__user__last_name'),
+        'available_spots': ('max_students', 'enrolled_count'),
+    }
     teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True)
     course_name = serializers.CharField(source='course.name', read_only=True)
     course_code = serializers.CharField(source='course.code', read_only=True)
@@ -46,7 +108,8 @@ class ClassListSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'semester', 'teacher_name', 'course_name', 
                  'course_code', 'enrolled_count', 'available_spots', 'is_active']
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ('student', 'class_instance')
     student = StudentSerializer(read_only=True)
     class_instance = ClassListSerializer(read_only=True)
     
@@ -60,23 +123,29 @@ class EnrollmentSerializer(serializers.ModelSerializer):
                  'class_instance', 'student_id', 'class_id']
         read_only_fields = ['id', 'enrolled_at']
     
-    def validate(self, data):
-        class_instance = Class.objects.get(id=data['class_id'])
-        
-        # Check if class is full
-        if class_instance.available_spots <= 0:
-            raise serializers.ValidationError("This class is full.")
-        
-        # Check if already enrolled
-        student_id = data.get('student_id') or self.context['request'].user.student_profile.id
-        if Enrollment.objects.filter(
-            student_id=student_id, 
-            class_instance=class_instance, 
-            is_active=True
-        ).exists():
-            raise serializers.ValidationError("Student is already enrolled in this class.")
-        
-        return data
+    def create(self, validated_data):
+        # Capacity and duplicate checks happen under a row lock in the service
+        student = validated_data.pop('student', None)
+        student_id = validated_data.pop('student_id', None) or getattr(student, 'id', None)
+        if student_id is None:
+            raise serializers.ValidationError({'student_id': "This field is required."})
+        class_id = validated_data.pop('class_id')
+        validated_data.pop('class_instance', None)
+        try:
+            return services.enroll(student_id, class_id, **validated_data)
+        except services.EnrollmentError as exc:
+            raise serializers.ValidationError(exc.messages)
+
+class CohortEnrollmentSerializer(serializers.Serializer):
+    """Body of POST /enrollments/bulk/: the classes, and a cohort given by student ids or by grade"""
+    class_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=100)
+    student_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    grade = serializers.CharField(required=False, max_length=50)
+
+    def validate(self, attrs):
+        if ('student_ids' in attrs) == ('grade' in attrs):
+            raise serializers.ValidationError("Give either student_ids or grade.")
+        return attrs
 
 class LessonAttendanceSerializer(serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
@@ -86,4 +155,214 @@ class LessonAttendanceSerializer(serializers.ModelSerializer):
         model = LessonAttendance
         fields = ['id', 'status', 'notes', 'recorded_at', 'student_name', 
                  'lesson_title', 'lesson', 'student']
-        read_only_fields = ['id', 'recorded_at']
\ No newline at end of file
+        read_only_fields = ['id', 'recorded_at']
+
+class AttendanceRowSerializer(serializers.Serializer):
+    """Validates one row of a bulk attendance upload (no database access)"""
+    lesson = serializers.IntegerField()
+    student = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=LessonAttendance._meta.get_field('status').choices)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+class UserImportRowSerializer(UserRowSerializer):
+    """One row of an import_school users file; profile columns apply to the matching role"""
+    grade = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+    major = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    department = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    bio = serializers.CharField(required=False, allow_blank=True, default='')
+    phone = serializers.CharField(max_length=30, required=False, allow_blank=True, default='')
+    address = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+class ClassImportRowSerializer(serializers.Serializer):
+    """One row of an import_school classes file; a class is identified by course, semester and name"""
+    course_code = serializers.CharField(max_length=20)
+    semester = serializers.CharField(max_length=50)
+    name = serializers.CharField(max_length=100)
+    teacher = serializers.CharField(max_length=150)
+    max_students = serializers.IntegerField(min_value=0, required=False, default=30)
+    schedule = serializers.CharField()
+    room = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+    is_active = serializers.BooleanField(required=False, default=True)
+
+class EnrollmentImportRowSerializer(serializers.Serializer):
+    """One row of an import_school enrollments file"""
+    student = serializers.CharField(max_length=150)
+    course_code = serializers.CharField(max_length=20)
+    semester = serializers.CharField(max_length=50)
+    class_name = serializers.CharField(max_length=100)
+    grade = serializers.CharField(max_length=5, required=False, allow_blank=True, default='')
+
+class SearchParamsSerializer(serializers.Serializer):
+    """Query string of the full-text search endpoint"""
+    q = serializers.CharField(max_length=200)
+    semester = serializers.CharField(required=False, max_length=50)
+    is_active = serializers.BooleanField(required=False, allow_null=True, default=None)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=50, default=10)
+
+class HeadlineField(serializers.CharField):
+    """A search headline as safe HTML (see classes.search.render_headline)"""
+    def __init__(self, **kwargs):
+        super().__init__(read_only=True, **kwargs)
+
+    def to_representation(self, value):
+        return search.render_headline(value)
+
+class CourseSearchSerializer(serializers.ModelSerializer):
+    rank = serializers.FloatField(read_only=True)
+    headline = HeadlineField()
+    
+    class Meta:
+        model = Course
+        fields = ['id', 'code', 'name', 'credits', 'rank', 'headline']
+
+class ClassSearchSerializer(serializers.ModelSerializer):
+    course_name = serializers.CharField(source='course.name', read_only=True)
+    course_code = serializers.CharField(source='course.code', read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    headline = HeadlineField()
+    
+    class Meta:
+        model = Class
+        fields = ['id', 'name', 'semester', 'room', 'is_active', 'course_name',
+                 'course_code', 'rank', 'headline']
+
+class LessonSearchSerializer(serializers.ModelSerializer):
+    class_id = serializers.IntegerField(source='class_instance_id', read_only=True)
+    class_name = serializers.CharField(source='class_instance.name', read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    headline = HeadlineField()
+    
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'date', 'lesson_type', 'is_cancelled', 'class_id',
+                 'class_name', 'rank', 'headline']
+
+class CatalogParamsSerializer(serializers.Serializer):
+    """Query string filters of the class catalog"""
+    semester = serializers.CharField(required=False, max_length=50, help_text="Exact semester, e.g. 'Fall 2024'")
+    course = serializers.IntegerField(required=False, help_text="Course id")
+    department = serializers.CharField(required=False, allow_blank=True, max_length=100,
+                                       help_text="Teacher department")
+    teacher = serializers.IntegerField(required=False, help_text="Teacher id")
+    has_seats = serializers.BooleanField(required=False, allow_null=True, default=None,
+                                         help_text="Only classes with (true) or without (false) open seats")
+    facets = serializers.BooleanField(required=False, default=False,
+                                      help_text="Include counts per semester, course and department")
+
+class RolloverSerializer(serializers.Serializer):
+    """Options of a semester rollover (see classes.rollover)"""
+    source_semester = serializers.CharField(max_length=50)
+    semester = serializers.CharField(max_length=50, help_text="Semester the classes are cloned into")
+    starts = serializers.DateField(help_text="First day of lessons")
+    ends = serializers.DateField(help_text="Last day of lessons")
+    keep_teachers = serializers.BooleanField(required=False, default=True)
+    keep_rooms = serializers.BooleanField(required=False, default=True)
+    teacher_id = serializers.IntegerField(required=False, allow_null=True, default=None,
+                                          help_text="Teacher of every copy when teachers are not kept")
+
+class AttendanceAnalyticsParamsSerializer(serializers.Serializer):
+    """Query string of the attendance analytics endpoint"""
+    class_id = serializers.IntegerField(required=False, help_text="Only this class; also returns its weekly series")
+    student_id = serializers.IntegerField(required=False)
+    semester = serializers.CharField(required=False, max_length=50)
+    chronic = serializers.BooleanField(required=False, allow_null=True, default=None,
+                                       help_text="Only students flagged (true) or not flagged (false) as chronically absent")
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000, default=100,
+                                     help_text="Student rows returned, lowest attendance first")
+
+class ClassAttendanceSerializer(serializers.Serializer):
+    """Row of analytics.class_rates()"""
+    class_id = serializers.IntegerField(source='class_instance_id')
+    class_name = serializers.CharField(source='class_instance__name')
+    present = serializers.IntegerField(source='sum_present')
+    absent = serializers.IntegerField(source='sum_absent')
+    late = serializers.IntegerField(source='sum_late')
+    excused = serializers.IntegerField(source='sum_excused')
+    total = serializers.IntegerField()
+    rate = serializers.FloatField()
+    absence_rate = serializers.FloatField()
+    chronic_students = serializers.IntegerField()
+
+class StudentAttendanceSerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
+    class_id = serializers.IntegerField(source='class_instance_id', read_only=True)
+    total = serializers.IntegerField(read_only=True)
+    rate = serializers.FloatField(read_only=True)
+    absence_rate = serializers.FloatField(read_only=True)
+    chronic_absence = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = AttendanceSummary
+        fields = ['student_id', 'student_name', 'class_id', 'present', 'absent', 'late', 'excused',
+                 'total', 'rate', 'absence_rate', 'chronic_absence']
+
+class WeeklyAttendanceSerializer(serializers.ModelSerializer):
+    total = serializers.IntegerField(read_only=True)
+    rate = serializers.FloatField(read_only=True)
+    absence_rate = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = WeeklyAttendance
+        fields = ['week', 'present', 'absent', 'late', 'excused', 'total', 'rate', 'absence_rate']
+
+class AssessmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Assessment
+        fields = ['id', 'class_instance', 'title', 'weight', 'max_points', 'due_date', 'updated_at']
+        read_only_fields = ['id', 'updated_at']
+
+    def validate_class_instance(self, value):
+        if self.instance is not None and value != self.instance.class_instance:
+            raise serializers.ValidationError("Assessments cannot move to another class.")
+        return value
+
+    def validate_weight(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Must be greater than 0.")
+        return value
+
+    def validate_max_points(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Must be greater than 0.")
+        return services.check_max_points(self.instance, value)
+
+class AssessmentGradeSerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
+    
+    class Meta:
+        model = AssessmentGrade
+        fields = ['student', 'student_name', 'points', 'recorded_at', 'updated_at']
+
+class AssessmentGradeRowSerializer(serializers.Serializer):
+    """Validates one row of a bulk grade upload (no database access)"""
+    student = serializers.IntegerField()
+    points = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=Decimal(0))
+
+class TranscriptParamsSerializer(serializers.Serializer):
+    student_id = serializers.IntegerField(required=False, help_text="Defaults to the requesting student")
+
+class TranscriptClassSerializer(serializers.Serializer):
+    class_id = serializers.IntegerField()
+    class_name = serializers.CharField()
+    course_code = serializers.CharField()
+    credits = serializers.IntegerField()
+    grade = serializers.CharField()
+    grade_points = serializers.DecimalField(max_digits=3, decimal_places=2)
+    score = serializers.DecimalField(max_digits=5, decimal_places=2, allow_null=True)
+
+class TranscriptSemesterSerializer(serializers.Serializer):
+    semester = serializers.CharField()
+    gpa = serializers.DecimalField(max_digits=3, decimal_places=2)
+    credits = serializers.IntegerField()
+    classes = TranscriptClassSerializer(many=True)
+
+class TranscriptSerializer(serializers.Serializer):
+    """Output of gradebook.transcript()"""
+    student_id = serializers.IntegerField()
+    gpa = serializers.DecimalField(max_digits=3, decimal_places=2, allow_null=True)
+    credits = serializers.IntegerField()
+    semesters = TranscriptSemesterSerializer(many=True)
+
+class ExportParamsSerializer(serializers.Serializer):
+    semester = serializers.CharField(required=False, max_length=50)
+    class_id = serializers.IntegerField(required=False)
@@ -0,0 +1,506 @@
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.backends.postgresql.psycopg_any import NumericRange
+from django.db.models import Count, Exists, Max, OuterRef, Q, Subquery
+from accounts.roles import get_role_context
+from backend import serialization_cache
+from students.models import Student
+from . import analytics, gradebook
+from .models import (
+    AssessmentGrade, Class, ClassMeeting, Enrollment, Lesson, LessonAttendance, WaitlistEntry, minute_of_week
+)
+
+
+class EnrollmentError(ValidationError):
+    """Raised when a student cannot be enrolled in (or removed from) a class"""
+
+
+class ScheduleConflict(ValidationError):
+    """Raised when class meetings would double-book a teacher or a room"""
+
+
+def reserve_seat(student_id, class_id):
+    """
+    Lock the class row and check that `student_id` may take a seat in it.
+
+    Must be called inside a transaction; the lock is held until it ends, so
+    concurrent enrollments into the same class are serialized. Returns the
+    locked class and the student's existing (inactive) enrollment, if any.
+    """
+    try:
+        class_instance = Class.objects.select_for_update().get(pk=class_id)
+    except Class.DoesNotExist:
+        raise EnrollmentError("Class not found.")
+
+    existing = Enrollment.objects.select_for_update().filter(
+        student_id=student_id, class_instance_id=class_id
+    ).first()
+    if existing and existing.is_active:
+        raise EnrollmentError("Student is already enrolled in this class.")
+    if class_instance.available_spots <= 0:
+        raise EnrollmentError("This class is full.")
+
+    # Serializes this student's enrollments, so two overlapping classes cannot both pass the check
+    Student.objects.select_for_update().filter(pk=student_id).exists()
+    clash = (
+        ClassMeeting.objects.filter(
+            class_instance__enrollments__student_id=student_id,
+            class_instance__enrollments__is_active=True,
+        )
+        .exclude(class_instance_id=class_id)
+        .filter(Exists(ClassMeeting.objects.filter(
+            class_instance_id=class_id, semester=OuterRef('semester'), period__overlap=OuterRef('period'),
+        )))
+        .values_list('class_instance__name', flat=True)
+        .first()
+    )
+    if clash is not None:
+        raise EnrollmentError(f"This class clashes with {clash} in your schedule.")
+    return class_instance, existing
+
+
+def enroll(student_id, class_id, **fields):
+    """
+    Enroll a student in a class, reactivating a previous enrollment instead of
+    colliding with it on the (student, class_instance) unique key.
+    """
+    with transaction.atomic():
+        class_instance, enrollment = reserve_seat(student_id, class_id)
+        if enrollment is None:
+            enrollment = Enrollment(student_id=student_id, class_instance=class_instance)
+        else:
+            enrollment.class_instance = class_instance
+        for name, value in fields.items():
+            setattr(enrollment, name, value)
+        enrollment.is_active = True
+        enrollment.save()
+        WaitlistEntry.objects.filter(student_id=student_id, class_instance_id=class_id).delete()
+    return enrollment
+
+
+def unenroll(student_id, class_id):
+    """Deactivate a student's enrollment, handing the seat to the waitlist (see Enrollment.save())"""
+    with transaction.atomic():
+        # Same lock order as reserve_seat(): class row first, then the enrollment
+        Class.objects.select_for_update().filter(pk=class_id).exists()
+        enrollment = Enrollment.objects.select_for_update().filter(
+            student_id=student_id, class_instance_id=class_id, is_active=True
+        ).first()
+        if enrollment is None:
+            raise EnrollmentError("You are not enrolled in this class")
+        enrollment.is_active = False
+        enrollment.save()
+    return enrollment
+
+
+def _waitlist_count(**filters):
+    return Subquery(
+        WaitlistEntry.objects.filter(class_instance_id=OuterRef('class_instance_id'), **filters)
+        .order_by()
+        .values('class_instance_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+
+
+def waitlist_position(student_id, class_id):
+    """
+    {'class_id', 'position', 'waiting', 'joined_at'} of a student's waitlist
+    entry (position 1 is next in line), or None. One query, counted on the
+    (class_instance, id) index.
+    """
+    return (
+        WaitlistEntry.objects.filter(student_id=student_id, class_instance_id=class_id)
+        .annotate(position=_waitlist_count(pk__lte=OuterRef('pk')), waiting=_waitlist_count())
+        .values('class_instance_id', 'position', 'waiting', 'joined_at')
+        .first()
+    )
+
+
+def join_waitlist(student_id, class_id):
+    """Queue a student for a seat in a full class; returns their waitlist_position()"""
+    with transaction.atomic():
+        # Same lock as reserve_seat(), so a seat cannot free up between the check and the insert
+        class_instance = Class.objects.select_for_update().filter(pk=class_id, is_active=True).first()
+        if class_instance is None:
+            raise EnrollmentError("Class not found.")
+        if Enrollment.objects.filter(student_id=student_id, class_instance_id=class_id, is_active=True).exists():
+            raise EnrollmentError("Student is already enrolled in this class.")
+        if class_instance.available_spots > 0:
+            raise EnrollmentError("This class has open seats; enroll instead.")
+        _, created = WaitlistEntry.objects.get_or_create(student_id=student_id, class_instance_id=class_id)
+        if not created:
+            raise EnrollmentError("Student is already on the waitlist for this class.")
+    return waitlist_position(student_id, class_id)
+
+
+def leave_waitlist(student_id, class_id):
+    deleted, _ = WaitlistEntry.objects.filter(student_id=student_id, class_instance_id=class_id).delete()
+    if not deleted:
+        raise EnrollmentError("You are not on the waitlist for this class")
+
+
+def promote_waitlist(class_id):
+    """
+    Enroll students from the head of the waitlist while the class has free
+    seats, and return their enrollments.
+
+    Called whenever a seat may have freed up (see classes.signals), inside
+    the transaction that freed it. Students who can no longer take the seat
+    (e.g. the class now clashes with their schedule) lose their place.
+    """
+    if not WaitlistEntry.objects.filter(class_instance_id=class_id).exists():
+        return []
+    promoted = []
+    with transaction.atomic():
+        class_instance = Class.objects.select_for_update().filter(pk=class_id, is_active=True).first()
+        free = class_instance.available_spots if class_instance else 0
+        while free > 0:
+            entry = WaitlistEntry.objects.filter(class_instance_id=class_id).order_by('pk').first()
+            if entry is None:
+                break
+            entry.delete()
+            try:
+                promoted.append(enroll(entry.student_id, class_id))
+            except EnrollmentError:
+                continue
+            free -= 1
+    return promoted
+
+
+BATCH_SIZE = 2000
+
+
+def _cohort_clashes(student_ids, class_ids):
+    """
+    ({(student_id, class_id): name of the student's clashing class},
+     {class_id: {class_ids of the other target classes it overlaps}})
+    """
+    meeting, enrollment, klass = (model._meta.db_table for model in (ClassMeeting, Enrollment, Class))
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT DISTINCT ON (e.student_id, t.class_instance_id) e.student_id, t.class_instance_id, c.name
+            FROM {enrollment} e
+            JOIN {meeting} m ON m.class_instance_id = e.class_instance_id
+            JOIN {meeting} t ON t.semester = m.semester AND t.period && m.period
+            JOIN {klass} c ON c.id = e.class_instance_id
+            WHERE e.is_active AND e.student_id = ANY(%s)
+              AND t.class_instance_id = ANY(%s) AND t.class_instance_id <> e.class_instance_id
+        """, [student_ids, class_ids])
+        existing = {(student_id, class_id): name for student_id, class_id, name in cursor.fetchall()}
+        cursor.execute(f"""
+            SELECT DISTINCT a.class_instance_id, b.class_instance_id
+            FROM {meeting} a JOIN {meeting} b
+              ON b.semester = a.semester AND b.period && a.period AND b.class_instance_id <> a.class_instance_id
+            WHERE a.class_instance_id = ANY(%s) AND b.class_instance_id = ANY(%s)
+        """, [class_ids, class_ids])
+        overlapping = {}
+        for class_id, other_id in cursor.fetchall():
+            overlapping.setdefault(class_id, set()).add(other_id)
+    return existing, overlapping
+
+
+def enroll_cohort(student_ids, class_ids):
+    """
+    Enroll every student of `student_ids` in every class of `class_ids`,
+    as far as seats and schedules allow, in a fixed number of queries.
+
+    Seats go to students in the order given. A student is skipped for a
+    class they are already in, that is full, or that clashes with their
+    schedule (including another class of this batch they were just put
+    in). Returns (enrolled_count, rejected) where rejected is a list of
+    {'student_id', 'class_id', 'error'} entries.
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    class_ids = list(dict.fromkeys(class_ids))
+    with transaction.atomic():
+        # Lock order as in reserve_seat(): classes, then students
+        classes = {
+            row['pk']: row for row in Class.objects.select_for_update().filter(pk__in=class_ids, is_active=True)
+            .order_by('pk').values('pk', 'name', 'max_students', 'enrolled_count')
+        }
+        missing = [class_id for class_id in class_ids if class_id not in classes]
+        if missing:
+            raise EnrollmentError(f"Classes not found: {', '.join(map(str, missing))}.")
+        found = set(Student.objects.select_for_update().filter(pk__in=student_ids).order_by('pk').values_list('pk', flat=True))
+        existing = {
+            (student_id, class_id): (pk, is_active)
+            for pk, student_id, class_id, is_active in Enrollment.objects.filter(
+                student_id__in=found, class_instance_id__in=class_ids
+            ).values_list('pk', 'student_id', 'class_instance_id', 'is_active')
+        }
+        clashes, overlapping = _cohort_clashes(list(found), class_ids)
+
+        free = {class_id: row['max_students'] - row['enrolled_count'] for class_id, row in classes.items()}
+        rejected = []
+        enrolled = []
+        for student_id in student_ids:
+            if student_id not in found:
+                rejected.extend({'student_id': student_id, 'class_id': class_id, 'error': "Student not found."}
+                                for class_id in class_ids)
+                continue
+            placed = set()
+            for class_id in class_ids:
+                error = None
+                previous = existing.get((student_id, class_id))
+                overlap = overlapping.get(class_id, set()) & placed
+                if previous and previous[1]:
+                    error = "Student is already enrolled in this class."
+                elif (student_id, class_id) in clashes:
+                    error = f"This class clashes with {clashes[student_id, class_id]} in the student's schedule."
+                elif overlap:
+                    error = f"This class clashes with {classes[min(overlap)]['name']} in the student's schedule."
+                elif free[class_id] <= 0:
+                    error = "This class is full."
+                if error:
+                    rejected.append({'student_id': student_id, 'class_id': class_id, 'error': error})
+                    continue
+                free[class_id] -= 1
+                placed.add(class_id)
+                enrolled.append((student_id, class_id))
+
+        # Reactivates soft-deleted enrollments instead of colliding with them
+        Enrollment.objects.bulk_create(
+            (Enrollment(student_id=student_id, class_instance_id=class_id) for student_id, class_id in enrolled),
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['student', 'class_instance'],
+            update_fields=['is_active', 'updated_at'],
+        )
+        serialization_cache.invalidate(Enrollment, [existing[pair][0] for pair in enrolled if pair in existing])
+        seated = {}
+        for student_id, class_id in enrolled:
+            seated.setdefault(class_id, []).append(student_id)
+        for class_id, students in seated.items():
+            Class.adjust_enrolled_count(class_id, len(students))
+            WaitlistEntry.objects.filter(class_instance_id=class_id, student_id__in=students).delete()
+    return len(enrolled), rejected
+
+
+def _describe(meeting):
+    return f"{meeting.get_weekday_display()} {meeting.start_time:%H:%M}-{meeting.end_time:%H:%M}"
+
+
+def check_schedule(class_instance, meetings):
+    """
+    Build the meetings of a class from `meetings` (dicts of weekday,
+    start_time, end_time and an optional room, which defaults to the class
+    room) without saving them, raising ScheduleConflict if any overlaps
+    another meeting of the list, or another class of the same teacher or in
+    the same room that semester.
+
+    Overlaps are found in one query over the GiST-indexed `period` ranges.
+    """
+    for meeting in meetings:
+        start_time, end_time = meeting.get('start_time'), meeting.get('end_time')
+        if meeting.get('weekday') is None or start_time is None or end_time is None:
+            raise ScheduleConflict("Every meeting needs a weekday, a start time and an end time.")
+        if end_time <= start_time:
+            raise ScheduleConflict(f"A meeting ending at {end_time:%H:%M} must start before it.")
+    new = [
+        ClassMeeting(
+            class_instance=class_instance,
+            semester=class_instance.semester,
+            teacher_id=class_instance.teacher_id,
+            weekday=meeting['weekday'],
+            start_time=meeting['start_time'],
+            end_time=meeting['end_time'],
+            room=meeting.get('room') or class_instance.room,
+        )
+        for meeting in meetings
+    ]
+    periods = [
+        NumericRange(minute_of_week(meeting.weekday, meeting.start_time), minute_of_week(meeting.weekday, meeting.end_time))
+        for meeting in new
+    ]
+    for index, (meeting, period) in enumerate(zip(new, periods)):
+        for other, other_period in zip(new[:index], periods[:index]):
+            if period.lower < other_period.upper and other_period.lower < period.upper:
+                raise ScheduleConflict(f"Meetings {_describe(other)} and {_describe(meeting)} overlap.")
+    if not new:
+        return new
+
+    clashes = Q()
+    for meeting, period in zip(new, periods):
+        same_resource = Q(teacher_id=class_instance.teacher_id)
+        if meeting.room:
+            same_resource |= Q(room=meeting.room)
+        clashes |= Q(period__overlap=period) & same_resource
+    conflict = (
+        ClassMeeting.objects.filter(clashes, semester=class_instance.semester)
+        # By id: the class may not be saved yet (admin forms check before saving)
+        .exclude(class_instance_id=class_instance.pk)
+        .select_related('class_instance')
+        .first()
+    )
+    if conflict is not None:
+        if conflict.teacher_id == class_instance.teacher_id:
+            message = f"The teacher already teaches {conflict.class_instance.name} on {_describe(conflict)}."
+        else:
+            message = f"Room {conflict.room} is taken by {conflict.class_instance.name} on {_describe(conflict)}."
+        raise ScheduleConflict(message)
+    return new
+
+
+def schedule_class(class_instance, meetings):
+    """
+    Replace the meetings of a class with `meetings`, once check_schedule()
+    has accepted them.
+
+    Schedule changes within a semester are serialized by an advisory lock,
+    so two concurrent requests cannot both book the same slot.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"classes.schedule:{class_instance.semester}"])
+        new = check_schedule(class_instance, meetings)
+        ClassMeeting.objects.filter(class_instance=class_instance).delete()
+        ClassMeeting.objects.bulk_create(new)
+    return new
+
+
+def record_attendance(rows, user, lesson_id=None):
+    """
+    Validate and upsert a batch of attendance rows in a fixed number of queries.
+
+    Rows may span several lessons; passing `lesson_id` pins every row to that lesson.
+    Returns (recorded_count, errors) where errors is a list of
+    {'index': i, 'errors': {...}} entries for rejected rows.
+    """
+    from .serializers import AttendanceRowSerializer
+
+    errors = []
+    valid = {}
+    for index, row in enumerate(rows):
+        if lesson_id is not None and isinstance(row, dict):
+            row = {**row, 'lesson': lesson_id}
+        serializer = AttendanceRowSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'index': index, 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        key = (data['lesson'], data['student'])
+        if key in valid:
+            errors.append({'index': index, 'errors': {'non_field_errors': ["Duplicate entry for this lesson and student."]}})
+            continue
+        valid[key] = (index, data)
+
+    with transaction.atomic():
+        # Locking the lessons serializes their writers, so every change reaches the summaries once
+        lessons = {
+            row['id']: row
+            for row in Lesson.objects.select_for_update(of=('self',))
+            .filter(pk__in={lesson for lesson, _ in valid}).order_by('pk')
+            .values('id', 'class_instance_id', 'class_instance__teacher_id', 'date')
+        }
+        enrolled = set(
+            Enrollment.objects.filter(
+                is_active=True,
+                class_instance_id__in={lesson['class_instance_id'] for lesson in lessons.values()},
+                student_id__in={student for _, student in valid},
+            ).values_list('class_instance_id', 'student_id')
+        )
+        role = get_role_context(user)
+
+        records = []
+        for (lesson_pk, student_pk), (index, data) in valid.items():
+            lesson = lessons.get(lesson_pk)
+            if lesson is None:
+                errors.append({'index': index, 'errors': {'lesson': ["Lesson not found."]}})
+            elif not (user.is_staff or (role.is_teacher and lesson['class_instance__teacher_id'] == role.teacher_id)):
+                errors.append({'index': index, 'errors': {'lesson': ["Permission denied."]}})
+            elif (lesson['class_instance_id'], student_pk) not in enrolled:
+                errors.append({'index': index, 'errors': {'student': ["Student is not enrolled in this class."]}})
+            else:
+                records.append(LessonAttendance(
+                    lesson_id=lesson_pk, student_id=student_pk,
+                    status=data['status'], notes=data['notes'],
+                ))
+
+        if records:
+            previous = {
+                (lesson_pk, student_pk): status
+                for lesson_pk, student_pk, status in LessonAttendance.objects.filter(
+                    lesson_id__in={record.lesson_id for record in records},
+                    student_id__in={record.student_id for record in records},
+                ).values_list('lesson_id', 'student_id', 'status')
+            }
+            LessonAttendance.objects.bulk_create(
+                records,
+                update_conflicts=True,
+                unique_fields=['lesson', 'student'],
+                update_fields=['status', 'notes', 'updated_at'],
+            )
+            analytics.apply_changes(
+                (
+                    record.student_id,
+                    lessons[record.lesson_id]['class_instance_id'],
+                    lessons[record.lesson_id]['date'],
+                    previous.get((record.lesson_id, record.student_id)),
+                    record.status,
+                )
+                for record in records
+            )
+    errors.sort(key=lambda error: error['index'])
+    return len(records), errors
+
+
+def check_max_points(assessment, max_points):
+    """
+    Return `max_points` for `assessment` (None when creating one), or raise
+    ValidationError if a grade already recorded on it is higher.
+    """
+    if assessment is not None and assessment.pk is not None:
+        highest = assessment.grades.aggregate(highest=Max('points'))['highest']
+        if highest is not None and max_points < highest:
+            raise ValidationError(f"Ensure this value is at least {highest}, the highest grade recorded.")
+    return max_points
+
+
+def record_grades(assessment, rows):
+    """
+    Validate and upsert a batch of {'student', 'points'} rows for one
+    assessment, then refresh the scores of the students graded. Returns
+    (recorded_count, errors) where errors is a list of
+    {'index': i, 'errors': {...}} entries for rejected rows.
+    """
+    from .serializers import AssessmentGradeRowSerializer
+
+    errors = []
+    valid = {}
+    for index, row in enumerate(rows):
+        serializer = AssessmentGradeRowSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'index': index, 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        if data['points'] > assessment.max_points:
+            errors.append({'index': index, 'errors': {'points': [f"Ensure this value is at most {assessment.max_points}."]}})
+        elif data['student'] in valid:
+            errors.append({'index': index, 'errors': {'student': ["Duplicate entry for this student."]}})
+        else:
+            valid[data['student']] = (index, data)
+
+    with transaction.atomic():
+        enrolled = set(
+            Enrollment.objects.filter(
+                class_instance_id=assessment.class_instance_id, student_id__in=valid, is_active=True
+            ).values_list('student_id', flat=True)
+        )
+        records = []
+        for student_pk, (index, data) in valid.items():
+            if student_pk not in enrolled:
+                errors.append({'index': index, 'errors': {'student': ["Student is not enrolled in this class."]}})
+            else:
+                records.append(AssessmentGrade(assessment=assessment, student_id=student_pk, points=data['points']))
+
+        if records:
+            AssessmentGrade.objects.bulk_create(
+                records,
+                update_conflicts=True,
+                unique_fields=['assessment', 'student'],
+                update_fields=['points', 'updated_at'],
+            )
+            gradebook.update_scores(assessment.class_instance_id, [record.student_id for record in records])
+    errors.sort(key=lambda error: error['index'])
+    return len(records), errors
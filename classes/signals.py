@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from backend import serialization_cache
+from parents.models import Parent
+from students.models import Student
+from teachers.models import Teacher
+from .models import Course, Class, ClassMeeting, GradingScale, Lesson, Enrollment, LessonAttendance
+from . import analytics, gradebook
+from .services import promote_waitlist
+
+CACHED_MODELS = [Course, Class, Lesson, Enrollment, LessonAttendance, Teacher, Student, Parent, get_user_model()]
+
+
+@receiver(post_delete, sender=Enrollment)
+def release_seat(sender, instance, origin=None, **kwargs):
+    """Free the seat of a deleted enrollment (covers admin, queryset and cascade deletes)"""
+    if instance.is_active:
+        Class.adjust_enrolled_count(instance.class_instance_id, -1)
+        # Only for direct deletes: in a cascade the class itself may be going away
+        if isinstance(origin, Enrollment) or getattr(origin, 'model', None) is Enrollment:
+            promote_waitlist(instance.class_instance_id)
+
+
+@receiver(post_save, sender=Class)
+def sync_meetings(sender, instance, created, **kwargs):
+    """Keep the semester and teacher copied onto ClassMeeting in step with the class"""
+    if not created:
+        ClassMeeting.objects.filter(class_instance=instance).exclude(
+            semester=instance.semester, teacher_id=instance.teacher_id
+        ).update(semester=instance.semester, teacher_id=instance.teacher_id)
+        # More seats, or a reactivated class
+        promote_waitlist(instance.pk)
+
+
+def _rebuild_attendance(class_ids):
+    transaction.on_commit(lambda: analytics.rebuild(class_ids))
+
+
+@receiver(post_save, sender=Lesson)
+def move_attendance(sender, instance, created, **kwargs):
+    """A lesson moved to another class or date counts its attendance there instead"""
+    loaded = getattr(instance, '_loaded_placement', None)
+    placement = instance._placement()
+    if not created and loaded is not None and loaded != placement:
+        _rebuild_attendance({loaded[0], placement[0]})
+    instance._loaded_placement = placement
+
+
+@receiver(post_delete, sender=Lesson)
+def drop_attendance(sender, instance, origin=None, **kwargs):
+    """Take a deleted lesson's attendance out of the summaries"""
+    # Only for direct deletes: in a cascade the class's summaries go away with it
+    if isinstance(origin, Lesson) or getattr(origin, 'model', None) is Lesson:
+        _rebuild_attendance({instance.class_instance_id})
+
+
+@receiver(post_save, sender=GradingScale)
+@receiver(post_delete, sender=GradingScale)
+def rescale_grades(sender, instance, **kwargs):
+    """Letters may have gained, changed or lost their points"""
+    gradebook.sync_grade_points()
+
+
+def invalidate_serialized(sender, instance, **kwargs):
+    serialization_cache.invalidate(sender, [instance.pk])
+
+
+for model in CACHED_MODELS:
+    post_init.connect(serialization_cache.stamp_loaded, sender=model, dispatch_uid=f"serialization_cache:{model._meta.label}:init")
+    post_save.connect(invalidate_serialized, sender=model, dispatch_uid=f"serialization_cache:{model._meta.label}")
+    post_delete.connect(invalidate_serialized, sender=model, dispatch_uid=f"serialization_cache:{model._meta.label}:delete")
@@ -1,3 +1,1534 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from parents.models import Parent
+from students.models import Student
+from teachers.models import Teacher
+from accounts.roles import get_role_context
+from backend import renderers, serialization_cache
+from backend.instrumentation import RequestMetrics, fingerprint
+from backend.pagination import IdCursorPagination, estimate_count
+from .models import (
+    Assessment, AssessmentGrade, AttendanceSummary, Course, Class, ClassMeeting, Enrollment, GradingScale, Holiday,
+    Lesson, LessonAttendance, WaitlistEntry, WeeklyAttendance
+)
+from .serializers import ClassListSerializer
+from .views import (
+    AssessmentViewSet, AttendanceAnalyticsView, ClassViewSet, CourseViewSet, EnrollmentViewSet, LessonViewSet, SearchView,
+    TranscriptView
+)
+from . import analytics, gradebook, imports, services
+
+
+def make_class(max_students=30, **kwargs):
+    if "teacher" not in kwargs:
+        teacher_user = User.objects.create(username=f"teacher{User.objects.count()}", role=User.Roles.TEACHER)
+        kwargs["teacher"] = Teacher.objects.create(user=teacher_user)
+    if "course" not in kwargs:
+        kwargs["course"] = Course.objects.create(name="Mathematics", code=f"MATH{Course.objects.count()}")
+    fields = {"name": "Math - Section A", "semester": "Fall 2024", "schedule": "Mon 9:00", **kwargs}
+    return Class.objects.create(max_students=max_students, **fields)
+
+
+def make_students(count):
+    users = User.objects.bulk_create(
+        User(username=f"student{i}", role=User.Roles.STUDENT) for i in range(count)
+    )
+    return Student.objects.bulk_create(Student(user=user) for user in users)
+
+
+class EnrollmentServiceTests(TestCase):
+    def setUp(self):
+        self.class_instance = make_class(max_students=1)
+        self.student, self.other = make_students(2)
+
+    def test_enroll_takes_a_seat(self):
+        services.enroll(self.student.id, self.class_instance.id)
+        self.class_instance.refresh_from_db()
+        self.assertEqual(self.class_instance.enrolled_count, 1)
+        self.assertEqual(self.class_instance.available_spots, 0)
+
+    def test_full_class_is_rejected(self):
+        services.enroll(self.student.id, self.class_instance.id)
+        with self.assertRaisesMessage(services.EnrollmentError, "This class is full."):
+            services.enroll(self.other.id, self.class_instance.id)
+
+    def test_duplicate_enrollment_is_rejected(self):
+        self.class_instance.max_students = 5
+        self.class_instance.save()
+        services.enroll(self.student.id, self.class_instance.id)
+        with self.assertRaisesMessage(services.EnrollmentError, "already enrolled"):
+            services.enroll(self.student.id, self.class_instance.id)
+
+    def test_reenrolling_reactivates_soft_deleted_row(self):
+        first = services.enroll(self.student.id, self.class_instance.id)
+        services.unenroll(self.student.id, self.class_instance.id)
+        second = services.enroll(self.student.id, self.class_instance.id)
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Enrollment.objects.count(), 1)
+        self.class_instance.refresh_from_db()
+        self.assertEqual(self.class_instance.enrolled_count, 1)
+
+    def test_unenroll_requires_active_enrollment(self):
+        with self.assertRaises(services.EnrollmentError):
+            services.unenroll(self.student.id, self.class_instance.id)
+
+    def test_reconcile_repairs_drifted_seat_counts(self):
+        services.enroll(self.student.id, self.class_instance.id)
+        healthy = make_class()
+        Class.objects.filter(pk=self.class_instance.pk).update(enrolled_count=5)
+
+        out = io.StringIO()
+        call_command("reconcile_seat_counts", "--dry-run", stdout=out)
+        self.assertIn(f"Class {self.class_instance.pk}: stored=5 actual=1", out.getvalue())
+        self.assertIn("Found 1 class(es)", out.getvalue())
+        self.class_instance.refresh_from_db()
+        self.assertEqual(self.class_instance.enrolled_count, 5)
+
+        out = io.StringIO()
+        call_command("reconcile_seat_counts", stdout=out)
+        self.assertIn(f"Class {self.class_instance.pk}: stored=5 actual=1", out.getvalue())
+        self.assertIn("Repaired 1 class(es)", out.getvalue())
+        self.assertNotIn(f"Class {healthy.pk}:", out.getvalue())
+        self.class_instance.refresh_from_db()
+        self.assertEqual(self.class_instance.enrolled_count, 1)
+
+        out = io.StringIO()
+        call_command("reconcile_seat_counts", stdout=out)
+        self.assertIn("Repaired 0 class(es)", out.getvalue())
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        self.teacher = make_class().teacher
+        self.course = Course.objects.create(name="Physics", code="PHYS1")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="registrar", is_staff=True))
+
+    def create(self, name, meetings, teacher=None, semester="Fall 2024", room="R101"):
+        return self.client.post("/api/classes/classes/", {
+            "name": name, "semester": semester, "schedule": "Weekly", "room": room,
+            "teacher_id": (teacher or self.teacher).id, "course_id": self.course.id,
+            "meetings": meetings,
+        }, format="json")
+
+    def test_teacher_and_room_double_booking_is_rejected(self):
+        monday = [{"weekday": 0, "start_time": "09:00", "end_time": "10:30"}]
+        response = self.create("Physics A", monday)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["meetings"][0]["room"], "R101")
+
+        response = self.create("Physics B", [{"weekday": 0, "start_time": "10:00", "end_time": "11:00"}], room="R202")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("already teaches Physics A on Monday 09:00-10:30", response.json()["meetings"][0])
+
+        other_teacher = make_class(name="Other").teacher
+        response = self.create("Physics C", monday, teacher=other_teacher)
+        self.assertIn("Room R101 is taken", response.json()["meetings"][0])
+        self.assertFalse(Class.objects.filter(name="Physics C").exists())
+
+        # Back-to-back slots and other semesters are fine
+        self.assertEqual(self.create("Physics D", [{"weekday": 0, "start_time": "10:30", "end_time": "11:30"}]).status_code, 201)
+        self.assertEqual(self.create("Physics E", monday, semester="Spring 2025").status_code, 201)
+
+    def test_enrolling_in_a_clashing_class_is_rejected(self):
+        first = self.create("Physics A", [{"weekday": 2, "start_time": "13:00", "end_time": "14:00"}]).json()
+        other_teacher = make_class(name="Other").teacher
+        second = self.create("Physics B", [{"weekday": 2, "start_time": "13:30", "end_time": "15:00"}],
+                             teacher=other_teacher, room="R202").json()
+        student, = make_students(1)
+
+        services.enroll(student.id, first["id"])
+        with self.assertRaisesMessage(services.EnrollmentError, "clashes with Physics A"):
+            services.enroll(student.id, second["id"])
+        services.unenroll(student.id, first["id"])
+        services.enroll(student.id, second["id"])
+
+    def test_changing_teacher_rechecks_existing_meetings(self):
+        self.create("Physics A", [{"weekday": 4, "start_time": "08:00", "end_time": "09:00"}])
+        other_teacher = make_class(name="Other").teacher
+        moving = self.create("Physics B", [{"weekday": 4, "start_time": "08:00", "end_time": "09:00"}],
+                             teacher=other_teacher, room="R202").json()
+        response = self.client.patch(f"/api/classes/classes/{moving['id']}/", {"teacher_id": self.teacher.id}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Class.objects.get(pk=moving["id"]).teacher, other_teacher)
+
+    def test_patching_incomplete_meetings_is_a_validation_error(self):
+        created = self.create("Physics A", [{"weekday": 1, "start_time": "08:00", "end_time": "09:00"}]).json()
+        response = self.client.patch(f"/api/classes/classes/{created['id']}/", {
+            "meetings": [{"weekday": 1, "start_time": "10:00"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["meetings"][0], {"end_time": ["This field is required."]})
+        self.assertEqual(Class.objects.get(pk=created["id"]).meetings.get().start_time, time(8))
+
+        with self.assertRaises(services.ScheduleConflict):
+            services.schedule_class(Class.objects.get(pk=created["id"]), [{"weekday": 1, "start_time": time(10)}])
+
+    def test_admin_edits_go_through_the_scheduler(self):
+        self.create("Physics A", [{"weekday": 3, "start_time": "08:00", "end_time": "09:00"}])
+        other_teacher = make_class(name="Other").teacher
+        moving = Class.objects.get(pk=self.create(
+            "Physics B", [], teacher=other_teacher, room="R202",
+        ).json()["id"])
+        self.client.force_login(User.objects.create(username="superuser", is_staff=True, is_superuser=True))
+
+        def change(teacher, meetings):
+            data = {
+                "course": self.course.id, "teacher": teacher.id, "name": moving.name, "semester": moving.semester,
+                "max_students": 30, "schedule": "Weekly", "room": "R202", "is_active": "on",
+                "meetings-TOTAL_FORMS": len(meetings), "meetings-INITIAL_FORMS": 0,
+                "meetings-MIN_NUM_FORMS": 0, "meetings-MAX_NUM_FORMS": 1000,
+            }
+            for index, (start, end) in enumerate(meetings):
+                data.update({
+                    f"meetings-{index}-weekday": 3, f"meetings-{index}-start_time": start,
+                    f"meetings-{index}-end_time": end, f"meetings-{index}-room": "",
+                })
+            return self.client.post(f"/admin/classes/class/{moving.id}/change/", data)
+
+        # Re-rendering the form with its errors looks up each raw-id widget's label
+        with self.assertLogs("backend.requests", "WARNING"):
+            response = change(self.teacher, [("08:30", "09:30")])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "already teaches Physics A")
+        self.assertFalse(moving.meetings.exists())
+
+        self.assertEqual(change(other_teacher, [("08:30", "09:30")]).status_code, 302)
+        # Moving the class to a busy teacher is checked against the slots it already has
+        with self.assertLogs("backend.requests", "WARNING"):
+            response = self.client.post(f"/admin/classes/class/{moving.id}/change/", {
+                "course": self.course.id, "teacher": self.teacher.id, "name": moving.name, "semester": moving.semester,
+                "max_students": 30, "schedule": "Weekly", "room": "R202", "is_active": "on",
+                "meetings-TOTAL_FORMS": 1, "meetings-INITIAL_FORMS": 1,
+                "meetings-MIN_NUM_FORMS": 0, "meetings-MAX_NUM_FORMS": 1000,
+                "meetings-0-id": moving.meetings.get().id, "meetings-0-class_instance": moving.id,
+                "meetings-0-weekday": 3, "meetings-0-start_time": "08:30", "meetings-0-end_time": "09:30",
+                "meetings-0-room": "R202",
+            })
+        self.assertContains(response, "already teaches Physics A")
+        moving.refresh_from_db()
+        self.assertEqual((moving.teacher, moving.meetings.get().teacher), (other_teacher, other_teacher))
+
+
+class RolloverTests(TestCase):
+    def setUp(self):
+        self.source = make_class(room="R101")
+        services.schedule_class(self.source, [
+            {"weekday": 0, "start_time": time(9), "end_time": time(10, 30)},
+            {"weekday": 2, "start_time": time(9), "end_time": time(10, 30)},
+        ])
+        make_class(name="Dropped", is_active=False)
+        # Two weeks from Monday 2025-09-01; the first Monday is a holiday
+        Holiday.objects.create(date=date(2025, 9, 1), name="Labor Day")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="registrar", is_staff=True))
+
+    def roll(self, **options):
+        return self.client.post("/api/classes/classes/rollover/", {
+            "source_semester": "Fall 2024", "semester": "Fall 2025",
+            "starts": "2025-09-01", "ends": "2025-09-14", **options,
+        }, format="json")
+
+    def test_rollover_clones_active_classes_and_skips_holidays(self):
+        response = self.roll()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"classes": 1, "cloned": 1, "lessons": 3})
+
+        copy = Class.objects.get(semester="Fall 2025")
+        self.assertEqual((copy.source_class_id, copy.teacher_id, copy.room), (self.source.id, self.source.teacher_id, "R101"))
+        self.assertEqual(copy.meetings.count(), 2)
+        lessons = list(copy.lessons.values_list("date", "duration_minutes", "title"))
+        self.assertEqual([lesson[0].date() for lesson in lessons], [date(2025, 9, 3), date(2025, 9, 8), date(2025, 9, 10)])
+        self.assertEqual(lessons[1][1:], (90, "Week 2 - Math - Section A"))
+
+    def test_rollover_is_idempotent_and_resumes(self):
+        self.roll()
+        copy = Class.objects.get(semester="Fall 2025")
+        copy.lessons.filter(date__date=date(2025, 9, 10)).delete()
+
+        response = self.roll()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"classes": 1, "cloned": 0, "lessons": 1})
+        self.assertEqual(self.roll().status_code, 200)
+        self.assertEqual(Class.objects.filter(semester="Fall 2025").count(), 1)
+        self.assertEqual(copy.lessons.count(), 3)
+
+    def test_rollover_without_teachers_or_rooms(self):
+        response = self.roll(keep_teachers=False)
+        self.assertEqual(response.status_code, 400)
+
+        placeholder = make_class(name="Staffing", semester="Spring 2024").teacher
+        response = self.roll(keep_teachers=False, teacher_id=placeholder.id, keep_rooms=False)
+        self.assertEqual(response.status_code, 201)
+        copy = Class.objects.get(semester="Fall 2025")
+        self.assertEqual((copy.teacher_id, copy.room), (placeholder.id, ""))
+        self.assertEqual(set(copy.meetings.values_list("teacher_id", "room")), {(placeholder.id, "")})
+
+    def test_rollover_rejects_double_bookings(self):
+        parallel = make_class(name="Parallel", room="R202")
+        services.schedule_class(parallel, [{"weekday": 0, "start_time": time(10), "end_time": time(11)}])
+        placeholder = make_class(name="Staffing", semester="Spring 2024").teacher
+
+        response = self.roll(keep_teachers=False, teacher_id=placeholder.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], (
+            "Fall 2025 would double-book 1 meeting(s): Math - Section A on Monday 09:00-10:30 "
+            "and Parallel on Monday 10:00-11:00 share a teacher."
+        ))
+        self.assertFalse(Class.objects.filter(semester="Fall 2025").exists())
+
+        # Copies are also checked against what the target semester already has
+        taken = make_class(name="Taken", semester="Fall 2025", room="R101")
+        services.schedule_class(taken, [{"weekday": 2, "start_time": time(10), "end_time": time(11)}])
+        response = self.roll()
+        self.assertIn("and Taken on Wednesday 10:00-11:00 share room R101", response.json()["error"])
+        self.assertEqual(self.roll(keep_rooms=False).status_code, 201)
+
+    def test_rollover_command(self):
+        out = io.StringIO()
+        call_command("rollover_semester", "Fall 2024", "Fall 2025", "--starts", "2025-09-01",
+                     "--ends", "2025-09-14", stdout=out)
+        self.assertIn("Created 3 lessons for Fall 2025", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "must differ"):
+            call_command("rollover_semester", "Fall 2024", "Fall 2024", "--starts", "2025-09-01",
+                         "--ends", "2025-09-14", stdout=out)
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.class_instance = make_class(max_students=1)
+        self.students = make_students(4)
+        services.enroll(self.students[0].id, self.class_instance.id)
+
+    def client_for(self, student):
+        client = APIClient()
+        client.force_authenticate(student.user)
+        return client
+
+    def url(self):
+        return f"/api/classes/classes/{self.class_instance.id}/waitlist/"
+
+    def test_waitlist_is_served_in_order_on_unenroll(self):
+        for student in self.students[1:]:
+            self.assertEqual(self.client_for(student).post(self.url()).status_code, 201)
+        client = self.client_for(self.students[3])
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.url())
+        self.assertEqual((response.json()["position"], response.json()["waiting"]), (3, 3))
+        self.assertLessEqual(len(queries), 2)
+
+        response = self.client_for(self.students[0]).post(f"/api/classes/classes/{self.class_instance.id}/unenroll/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Enrollment.objects.get(student=self.students[1]).is_active)
+        self.assertEqual(client.get(self.url()).json()["position"], 2)
+        self.assertEqual(self.client_for(self.students[1]).get(self.url()).status_code, 404)
+        self.assertEqual(client.get("/api/classes/classes/abc/waitlist/").status_code, 404)
+        self.class_instance.refresh_from_db()
+        self.assertEqual(self.class_instance.enrolled_count, 1)
+
+    def test_more_seats_and_admin_deactivation_promote(self):
+        for student in self.students[1:]:
+            services.join_waitlist(student.id, self.class_instance.id)
+        self.class_instance.max_students = 2
+        self.class_instance.save()
+        self.assertTrue(Enrollment.objects.filter(student=self.students[1], is_active=True).exists())
+
+        enrollment = Enrollment.objects.get(student=self.students[0])
+        enrollment.is_active = False
+        enrollment.save()
+        self.assertTrue(Enrollment.objects.filter(student=self.students[2], is_active=True).exists())
+
+        Enrollment.objects.get(student=self.students[1]).delete()
+        self.assertTrue(Enrollment.objects.filter(student=self.students[3], is_active=True).exists())
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_only_full_classes_can_be_joined(self):
+        client = self.client_for(self.students[0])
+        self.assertIn("already enrolled", client.post(self.url()).json()["error"])
+        self.class_instance.max_students = 2
+        self.class_instance.save()
+        response = self.client_for(self.students[1]).post(self.url())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("open seats", response.json()["error"])
+
+
+class CohortEnrollmentTests(TestCase):
+    def setUp(self):
+        self.small = make_class(max_students=2)
+        self.large = make_class(name="Science - Section A")
+        students = make_students(24)
+        self.students, self.others = students[:4], students[4:]
+        Student.objects.filter(pk__in=[s.pk for s in self.students]).update(grade="10")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="registrar", is_staff=True))
+
+    def test_cohort_is_enrolled_with_set_based_checks(self):
+        first, second, third, fourth = self.students
+        services.enroll(first.id, self.small.id)
+        services.unenroll(first.id, self.small.id)
+        services.enroll(second.id, self.large.id)
+
+        response = self.client.post("/api/classes/enrollments/bulk/", {
+            "grade": "10", "class_ids": [self.small.id, self.large.id],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["enrolled"], 5)
+        self.assertEqual(response.json()["rejected"], [
+            {"student_id": second.id, "class_id": self.large.id, "error": "Student is already enrolled in this class."},
+            {"student_id": third.id, "class_id": self.small.id, "error": "This class is full."},
+            {"student_id": fourth.id, "class_id": self.small.id, "error": "This class is full."},
+        ])
+        self.small.refresh_from_db()
+        self.large.refresh_from_db()
+        self.assertEqual((self.small.enrolled_count, self.large.enrolled_count), (2, 4))
+        # The soft-deleted enrollment was reactivated rather than duplicated
+        self.assertEqual(Enrollment.objects.filter(student=first, class_instance=self.small).count(), 1)
+
+    def test_query_count_does_not_grow_with_the_cohort(self):
+        counts = []
+        for cohort in (self.others[:2], self.others[2:]):
+            with CaptureQueriesContext(connection) as queries:
+                enrolled, _ = services.enroll_cohort([s.id for s in cohort], [self.large.id])
+            self.assertEqual(enrolled, len(cohort))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_schedule_clashes_are_rejected(self):
+        services.schedule_class(self.small, [{"weekday": 0, "start_time": time(9), "end_time": time(10)}])
+        services.schedule_class(self.large, [{"weekday": 0, "start_time": time(9, 30), "end_time": time(11)}])
+        other = make_class(name="Art - Section A")
+        services.schedule_class(other, [{"weekday": 0, "start_time": time(8), "end_time": time(9, 15)}])
+        first, second = self.students[:2]
+        services.enroll(first.id, other.id)
+
+        enrolled, rejected = services.enroll_cohort([first.id, second.id], [self.small.id, self.large.id])
+        self.assertEqual(enrolled, 2)
+        self.assertEqual([(row["student_id"], row["class_id"], row["error"]) for row in rejected], [
+            (first.id, self.small.id, "This class clashes with Art - Section A in the student's schedule."),
+            (second.id, self.large.id, "This class clashes with Math - Section A in the student's schedule."),
+        ])
+
+    def test_target_class_already_taken_blocks_overlapping_targets(self):
+        services.schedule_class(self.small, [{"weekday": 0, "start_time": time(9), "end_time": time(10)}])
+        services.schedule_class(self.large, [{"weekday": 0, "start_time": time(9, 30), "end_time": time(11)}])
+        student = self.students[0]
+        services.enroll(student.id, self.small.id)
+
+        enrolled, rejected = services.enroll_cohort([student.id], [self.small.id, self.large.id])
+        self.assertEqual(enrolled, 0)
+        self.assertEqual([(row["class_id"], row["error"]) for row in rejected], [
+            (self.small.id, "Student is already enrolled in this class."),
+            (self.large.id, "This class clashes with Math - Section A in the student's schedule."),
+        ])
+
+    def test_command_reports_students_who_did_not_fit(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("enroll_cohort", str(self.small.id), "--grade", "10", stdout=out, stderr=err)
+        self.assertIn("Enrolled 2 of 4", out.getvalue())
+        self.assertEqual(len(list(csv.reader(io.StringIO(err.getvalue())))), 3)
+        with self.assertRaisesMessage(CommandError, "Classes not found"):
+            call_command("enroll_cohort", "999999", "--grade", "10", stdout=out, stderr=err)
+
+
+class RecordAttendanceTests(TestCase):
+    def setUp(self):
+        self.class_instance = make_class()
+        self.teacher_user = self.class_instance.teacher.user
+        get_role_context(self.teacher_user)
+        self.students = make_students(3)
+        for student in self.students[:2]:
+            services.enroll(student.id, self.class_instance.id)
+        self.lessons = [
+            Lesson.objects.create(
+                class_instance=self.class_instance, title=f"Lesson {day}",
+                date=datetime(2024, 9, day, 9, tzinfo=timezone.utc),
+            )
+            for day in (2, 3)
+        ]
+
+    def test_batch_spanning_lessons_is_upserted_in_constant_queries(self):
+        rows = [
+            {"lesson": lesson.id, "student": student.id, "status": "present"}
+            for lesson in self.lessons
+            for student in self.students[:2]
+        ]
+        # Savepoint, locked lessons, enrollments, previous statuses, upsert and two summary upserts
+        with self.assertNumQueries(8):
+            recorded, errors = services.record_attendance(rows, self.teacher_user)
+        self.assertEqual((recorded, errors), (4, []))
+
+        rows[0]["status"] = "late"
+        services.record_attendance(rows, self.teacher_user)
+        self.assertEqual(LessonAttendance.objects.count(), 4)
+        self.assertEqual(
+            LessonAttendance.objects.get(lesson=self.lessons[0], student=self.students[0]).status, "late"
+        )
+
+    def test_invalid_rows_are_reported_not_dropped(self):
+        lesson = self.lessons[0]
+        rows = [
+            {"student": self.students[0].id, "status": "present"},
+            {"student": self.students[2].id, "status": "present"},
+            {"student": self.students[1].id, "status": "asleep"},
+            {"student": self.students[0].id, "status": "absent"},
+        ]
+        recorded, errors = services.record_attendance(rows, self.teacher_user, lesson_id=lesson.id)
+
+        self.assertEqual(recorded, 1)
+        self.assertEqual([error["index"] for error in errors], [1, 2, 3])
+        self.assertIn("student", errors[0]["errors"])
+        self.assertIn("status", errors[1]["errors"])
+
+    def test_other_teachers_cannot_record(self):
+        outsider = make_class().teacher.user
+        rows = [{"lesson": self.lessons[0].id, "student": self.students[0].id, "status": "present"}]
+        recorded, errors = services.record_attendance(rows, outsider)
+        self.assertEqual(recorded, 0)
+        self.assertEqual(errors[0]["errors"], {"lesson": ["Permission denied."]})
+
+
+class AttendanceAnalyticsTests(TestCase):
+    def setUp(self):
+        self.class_instance = make_class()
+        self.teacher_user = self.class_instance.teacher.user
+        self.students = make_students(2)
+        for student in self.students:
+            services.enroll(student.id, self.class_instance.id)
+        # Six lessons over two weeks, from Monday 2024-09-02
+        self.lessons = [
+            Lesson.objects.create(
+                class_instance=self.class_instance, title=f"Lesson {day}",
+                date=datetime(2024, 9, day, 9, tzinfo=timezone.utc),
+            )
+            for day in (2, 3, 4, 9, 10, 11)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher_user)
+
+    def record(self, statuses):
+        rows = [
+            {"lesson": lesson.id, "student": student.id, "status": status}
+            for lesson, row in zip(self.lessons, statuses)
+            for student, status in zip(self.students, row)
+        ]
+        response = self.client.post("/api/classes/lessons/attendance/", {"attendance": rows}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_summaries_follow_recorded_attendance(self):
+        self.record([("present", "absent")] * 5 + [("late", "excused")])
+        # Re-recording moves counts between statuses instead of adding to them
+        self.record([("present", "present")] + [("present", "absent")] * 4 + [("late", "excused")])
+
+        response = self.client.get(f"/api/classes/analytics/attendance/?class_id={self.class_instance.id}")
+        body = response.json()
+        first, second = sorted(body["students"], key=lambda row: row["student_id"])
+        self.assertEqual((first["present"], first["late"], first["rate"], first["chronic_absence"]), (5, 1, 1.0, False))
+        self.assertEqual((second["present"], second["absent"], second["excused"]), (1, 4, 1))
+        self.assertTrue(second["chronic_absence"])
+        self.assertEqual(body["students"][0]["student_id"], second["student_id"])
+        self.assertEqual(body["classes"][0]["total"], 12)
+        self.assertEqual(body["classes"][0]["chronic_students"], 1)
+        self.assertEqual([(week["week"], week["total"]) for week in body["weeks"]], [("2024-09-02", 6), ("2024-09-09", 6)])
+
+        chronic = self.client.get("/api/classes/analytics/attendance/?chronic=true").json()["students"]
+        self.assertEqual([row["student_id"] for row in chronic], [second["student_id"]])
+
+    def test_rebuild_matches_incremental_summaries(self):
+        self.record([("present", "absent")] * 3 + [("late", "excused")] * 3)
+        incremental = sorted(AttendanceSummary.objects.values_list("student_id", "present", "absent", "late", "excused"))
+        weeks = sorted(WeeklyAttendance.objects.values_list("week", "present", "absent", "late", "excused"))
+        AttendanceSummary.objects.update(present=0)
+
+        out = io.StringIO()
+        call_command("rebuild_attendance_summaries", stdout=out)
+        self.assertIn("Rebuilt 2 student summaries and 2 weekly rows", out.getvalue())
+        self.assertEqual(sorted(AttendanceSummary.objects.values_list("student_id", "present", "absent", "late", "excused")), incremental)
+        self.assertEqual(sorted(WeeklyAttendance.objects.values_list("week", "present", "absent", "late", "excused")), weeks)
+
+    def test_deleting_or_moving_lessons_updates_summaries(self):
+        self.record([("present", "absent")] * 6)
+        weeks = lambda: sorted(WeeklyAttendance.objects.values_list("week", "present", "absent"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[5].delete()
+        self.assertEqual(weeks(), [(date(2024, 9, 2), 3, 3), (date(2024, 9, 9), 2, 2)])
+        self.assertEqual(AttendanceSummary.objects.get(student=self.students[0]).present, 5)
+
+        lesson = Lesson.objects.get(pk=self.lessons[4].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.date = datetime(2024, 9, 16, 9, tzinfo=timezone.utc)
+            lesson.save()
+        self.assertEqual(weeks(), [(date(2024, 9, 2), 3, 3), (date(2024, 9, 9), 1, 1), (date(2024, 9, 16), 1, 1)])
+
+        # Nothing to rebuild must not mean "rebuild everything"
+        AttendanceSummary.objects.update(present=0)
+        self.assertEqual(analytics.rebuild(set()), (0, 0))
+        self.assertEqual(AttendanceSummary.objects.get(student=self.students[0]).present, 0)
+
+    def test_other_teachers_and_students_see_nothing(self):
+        self.record([("present", "absent")] * 6)
+        outsider = APIClient()
+        outsider.force_authenticate(make_class(name="Other").teacher.user)
+        body = outsider.get("/api/classes/analytics/attendance/").json()
+        self.assertEqual((body["classes"], body["students"]), ([], []))
+        student = APIClient()
+        student.force_authenticate(self.students[0].user)
+        self.assertEqual(student.get("/api/classes/analytics/attendance/").status_code, 403)
+
+
+class GradebookTests(TestCase):
+    def setUp(self):
+        self.class_instance = make_class()
+        self.student, self.other, self.outsider = make_students(3)
+        for student in (self.student, self.other):
+            services.enroll(student.id, self.class_instance.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.class_instance.teacher.user)
+
+    def grade(self, assessment, rows):
+        return self.client.post(f"/api/classes/assessments/{assessment['id']}/grades/", {"grades": rows}, format="json")
+
+    def test_scores_are_weighted_then_finalized(self):
+        quiz, exam = (
+            self.client.post("/api/classes/assessments/", {
+                "class_instance": self.class_instance.id, "title": title, "weight": weight, "max_points": max_points,
+            }, format="json").json()
+            for title, weight, max_points in (("Quiz", "1", "100"), ("Exam", "3", "50"))
+        )
+        response = self.grade(quiz, [
+            {"student": self.student.id, "points": "80"},
+            {"student": self.other.id, "points": "50"},
+            {"student": self.outsider.id, "points": "90"},
+            {"student": self.other.id, "points": "101"},
+        ])
+        self.assertEqual(response.json()["recorded"], 2)
+        self.assertEqual([error["index"] for error in response.json()["errors"]], [2, 3])
+        self.assertEqual(self.grade(exam, [{"student": self.student.id, "points": "45"}]).status_code, 200)
+
+        scores = dict(Enrollment.objects.values_list("student_id", "score"))
+        # (1 * 80% + 3 * 90%) / 4
+        self.assertEqual(scores[self.student.id], Decimal("87.50"))
+        self.assertEqual(scores[self.other.id], Decimal("50.00"))
+
+        response = self.client.post(f"/api/classes/classes/{self.class_instance.id}/finalize-grades/")
+        self.assertEqual(response.json(), {"graded": 2})
+        grades = {row[0]: row[1:] for row in Enrollment.objects.values_list("student_id", "grade", "grade_points")}
+        self.assertEqual(grades[self.student.id], ("B+", Decimal("3.30")))
+        self.assertEqual(grades[self.other.id], ("F", Decimal("0.00")))
+
+        # Lowering the exam's weight rescores the class
+        self.client.patch(f"/api/classes/assessments/{exam['id']}/", {"weight": "1"}, format="json")
+        self.assertEqual(Enrollment.objects.get(student=self.student).score, Decimal("85.00"))
+
+    def test_points_cannot_outgrow_max_points(self):
+        quiz = self.client.post("/api/classes/assessments/", {
+            "class_instance": self.class_instance.id, "title": "Quiz", "max_points": "100",
+        }, format="json").json()
+        self.grade(quiz, [{"student": self.student.id, "points": "90"}])
+        response = self.client.patch(f"/api/classes/assessments/{quiz['id']}/", {"max_points": "1"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("the highest grade recorded", response.json()["max_points"][0])
+        self.assertEqual(self.client.patch(
+            f"/api/classes/assessments/{quiz['id']}/", {"max_points": "90"}, format="json"
+        ).status_code, 200)
+
+        # Points past max_points (admin edits) are capped instead of overflowing the score
+        AssessmentGrade.objects.filter(student=self.student).update(points=Decimal("9000"))
+        gradebook.rescore(self.class_instance.id)
+        self.assertEqual(Enrollment.objects.get(student=self.student).score, Decimal("100.00"))
+
+    def test_scores_below_the_scale_get_a_blank_grade(self):
+        GradingScale.objects.filter(min_score=0).delete()
+        quiz = self.client.post("/api/classes/assessments/", {
+            "class_instance": self.class_instance.id, "title": "Quiz",
+        }, format="json").json()
+        self.grade(quiz, [{"student": self.student.id, "points": "5"}])
+        gradebook.finalize(self.class_instance.id)
+        enrollment = Enrollment.objects.get(student=self.student)
+        self.assertEqual((enrollment.grade, enrollment.grade_points), ("", None))
+
+    def test_transcript_weights_gpa_by_credits(self):
+        spring = make_class(name="Physics", semester="Spring 2025")
+        Course.objects.filter(pk=self.class_instance.course_id).update(credits=4)
+        Course.objects.filter(pk=spring.course_id).update(credits=2)
+        lab = make_class(name="Lab")
+        Course.objects.filter(pk=lab.course_id).update(credits=1)
+        withdrawn = make_class(name="Chemistry")
+        services.enroll(self.student.id, spring.id, grade="b")
+        services.enroll(self.student.id, lab.id, grade="C")
+        services.enroll(self.student.id, withdrawn.id, grade="F")
+        services.unenroll(self.student.id, withdrawn.id)
+        enrollment = Enrollment.objects.get(student=self.student, class_instance=self.class_instance)
+        enrollment.grade = "A"
+        enrollment.save(update_fields=["grade"])
+
+        transcript = gradebook.transcript(self.student.id)
+        # Fall: (4 * 4.0 + 1 * 2.0) / 5, Spring: 3.0, overall (18 + 6) / 7
+        self.assertEqual(transcript["gpa"], Decimal("3.43"))
+        self.assertEqual(transcript["credits"], 7)
+        self.assertEqual(
+            [(semester["semester"], semester["gpa"], len(semester["classes"])) for semester in transcript["semesters"]],
+            [("Fall 2024", Decimal("3.60"), 2), ("Spring 2025", Decimal("3.00"), 1)],
+        )
+        # Letters off the scale (e.g. withdrawals) do not count
+        enrollment.grade = "W"
+        enrollment.save()
+        self.assertIsNone(enrollment.grade_points)
+
+    def test_cached_transcript_follows_grade_changes(self):
+        enrollment = Enrollment.objects.get(student=self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.grade = "A"
+            enrollment.save()
+        self.assertEqual(gradebook.transcript(self.student.id)["gpa"], Decimal("4.00"))
+        # Cache hits only look up the version of the student's rows
+        with self.assertNumQueries(1):
+            gradebook.transcript(self.student.id)
+
+        # Writes no signal sees (other processes, import_school's SQL) move the key too
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Enrollment._meta.db_table} SET grade = 'B', grade_points = 3, updated_at = now() WHERE id = %s",
+                [enrollment.pk],
+            )
+        self.assertEqual(gradebook.transcript(self.student.id)["gpa"], Decimal("3.00"))
+        self.assertIsNone(gradebook.transcript(0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.grade = "C"
+            enrollment.save()
+        self.assertEqual(gradebook.transcript(self.student.id)["gpa"], Decimal("2.00"))
+
+        # Scale changes reach stored grade points and every cached transcript
+        with self.captureOnCommitCallbacks(execute=True):
+            scale = GradingScale.objects.get(letter="C")
+            scale.points = Decimal("2.10")
+            scale.save()
+        self.assertEqual(gradebook.transcript(self.student.id)["gpa"], Decimal("2.10"))
+
+    def test_transcript_access(self):
+        student = APIClient()
+        student.force_authenticate(self.student.user)
+        self.assertEqual(student.get("/api/classes/transcript/").json()["student_id"], self.student.id)
+        self.assertEqual(student.get(f"/api/classes/transcript/?student_id={self.other.id}").status_code, 403)
+        self.assertEqual(self.client.get(f"/api/classes/transcript/?student_id={self.other.id}").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/classes/transcript/?student_id={self.outsider.id}").status_code, 403)
+        # Students only see their own grades
+        assessment = self.client.post("/api/classes/assessments/", {
+            "class_instance": self.class_instance.id, "title": "Quiz",
+        }, format="json").json()
+        self.grade(assessment, [{"student": self.student.id, "points": "70"}, {"student": self.other.id, "points": "60"}])
+        grades = student.get(f"/api/classes/assessments/{assessment['id']}/grades/").json()
+        self.assertEqual([row["student"] for row in grades], [self.student.id])
+        response = student.post(f"/api/classes/assessments/{assessment['id']}/grades/", {"grades": []}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class SerializationCacheTests(TestCase):
+    def test_cached_rows_follow_related_edits(self):
+        class_instance = Class.objects.select_related("course", "teacher__user").get(pk=make_class().pk)
+        first = ClassListSerializer(class_instance).data
+        before = serialization_cache.stats()["hits"]
+        self.assertEqual(ClassListSerializer(class_instance).data, first)
+        self.assertEqual(serialization_cache.stats()["hits"], before + 1)
+
+        user = class_instance.teacher.user
+        user.first_name = "Ada"
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(ClassListSerializer(class_instance).data["teacher_name"], "Ada")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.enroll(make_students(1)[0].id, class_instance.id)
+        class_instance.refresh_from_db()
+        self.assertEqual(ClassListSerializer(class_instance).data["enrolled_count"], 1)
+
+    def test_rows_loaded_before_a_write_are_not_cached(self):
+        pk = make_class().pk
+        classes = Class.objects.select_related("course", "teacher__user")
+        stale = classes.get(pk=pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Class.objects.filter(pk=pk).update(name="Renamed")
+            serialization_cache.invalidate(Class, [pk])
+        self.assertEqual(ClassListSerializer(stale).data["name"], "Math - Section A")
+        self.assertEqual(ClassListSerializer(classes.get(pk=pk)).data["name"], "Renamed")
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.class_instance = make_class()
+        self.client = APIClient()
+        self.client.force_authenticate(self.class_instance.teacher.user)
+        self.url = f"/api/classes/classes/{self.class_instance.id}/"
+
+    def test_unchanged_class_answers_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_new_lesson_changes_the_class_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        Lesson.objects.create(
+            class_instance=self.class_instance, title="Intro",
+            date=datetime(2024, 9, 2, 9, tzinfo=timezone.utc),
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_deletes_are_never_answered_with_a_stale_304(self):
+        url = "/api/classes/classes/"
+        other = make_class(name="Other", teacher=self.class_instance.teacher)
+        first = self.client.get(url)
+        self.assertNotIn("Last-Modified", first)
+        other.delete()
+        # Without Last-Modified, If-Modified-Since alone cannot match
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+    def test_renamed_teacher_changes_the_list_etag(self):
+        url = "/api/classes/classes/"
+        etag = self.client.get(url)["ETag"]
+        user = self.class_instance.teacher.user
+        user.first_name = "Renamed"
+        user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["teacher_name"], "Renamed")
+
+
+@override_settings(REQUEST_METRICS_HEADERS=True)
+class RequestMetricsTests(TestCase):
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" = 1 AND "name" = \'x\' AND "k" IN (%s, %s)'),
+            fingerprint('SELECT * FROM "t" WHERE "id" = 22 AND "name" = \'y\' AND "k" IN (%s, %s, %s)'),
+        )
+
+    def test_headers_report_queries_and_duplicates(self):
+        lesson = Lesson.objects.create(
+            class_instance=make_class(), title="Intro", date=datetime(2024, 9, 2, 9, tzinfo=timezone.utc),
+        )
+        for student in make_students(3):
+            LessonAttendance.objects.create(lesson=lesson, student=student, status="present")
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+
+        with self.assertLogs("backend.requests", "INFO") as logs:
+            response = client.get(f"/api/classes/lessons/{lesson.id}/attendance/")
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("render;dur=", response["Server-Timing"])
+        [record] = logs.records
+        self.assertEqual(record.levelname, "INFO")
+        self.assertEqual(json.loads(record.getMessage())["queries"], int(response["X-Query-Count"]))
+
+    def test_repeated_query_shapes_are_flagged(self):
+        metrics = RequestMetrics()
+        execute = lambda sql, params, many, context: None
+        for pk in (1, 2, 3):
+            metrics.record_query(execute, f'SELECT * FROM "accounts_user" WHERE "id" = {pk}', (), False, {})
+        metrics.record_query(execute, 'SELECT 1', (), False, {})
+        self.assertEqual(metrics.queries, 4)
+        self.assertEqual(metrics.duplicates(3), [('SELECT * FROM "accounts_user" WHERE "id" = ?', 3)])
+
+
+def build_school(size):
+    """One class with `size` lessons, students and attendance rows, plus `size` sibling classes"""
+    main = make_class(max_students=size)
+    siblings = Class.objects.bulk_create(
+        Class(course=main.course, teacher=main.teacher, name=f"Section {i}", semester="Fall 2024", schedule="Tue 9:00")
+        for i in range(size)
+    )
+    lessons = Lesson.objects.bulk_create(
+        Lesson(class_instance=main, title=f"Lesson {i}", date=datetime(2024, 9, 2, 9, tzinfo=timezone.utc))
+        for i in range(size)
+    )
+    users = User.objects.bulk_create(
+        User(username=f"budget{size}_{i}", first_name="Student", last_name=str(i)) for i in range(size)
+    )
+    students = Student.objects.bulk_create(Student(user=user) for user in users)
+    enrollments = Enrollment.objects.bulk_create(Enrollment(student=s, class_instance=main) for s in students)
+    Class.objects.filter(pk=main.pk).update(enrolled_count=size)
+    LessonAttendance.objects.bulk_create(
+        LessonAttendance(lesson=lessons[0], student=s, status="present") for s in students
+    )
+    assessment = Assessment.objects.create(class_instance=main, title="Quiz")
+    AssessmentGrade.objects.bulk_create(AssessmentGrade(assessment=assessment, student=s, points=80) for s in students)
+    Enrollment.objects.bulk_create(
+        Enrollment(student=students[0], class_instance=sibling, grade="B", grade_points=Decimal("3.00"))
+        for sibling in siblings
+    )
+    return {
+        "course": main.course_id,
+        "class": main.id,
+        "lesson": lessons[0].id,
+        "enrollment": enrollments[0].id,
+        "student": students[0].id,
+        "assessment": assessment.id,
+        "attendance": [{"student": s.id, "status": "late"} for s in students[:40]],
+        "siblings": len(siblings),
+    }
+
+
+# (viewset, action, method, url template[, roles]). Budgets live on the viewsets as
+# `query_budgets`, keyed by (action, method); each request runs once per role.
+ROLES = ("admin", "teacher", "student")
+BUDGETED_REQUESTS = [
+    (CourseViewSet, "list", "get", "/api/classes/courses/"),
+    (CourseViewSet, "retrieve", "get", "/api/classes/courses/{course}/"),
+    (ClassViewSet, "list", "get", "/api/classes/classes/"),
+    (ClassViewSet, "list", "get", "/api/classes/classes/?facets=true&semester=Fall 2024&has_seats=true"),
+    (ClassViewSet, "retrieve", "get", "/api/classes/classes/{class}/"),
+    (ClassViewSet, "lessons", "get", "/api/classes/classes/{class}/lessons/"),
+    (ClassViewSet, "enrollments", "get", "/api/classes/classes/{class}/enrollments/", ("admin", "teacher")),
+    (LessonViewSet, "list", "get", "/api/classes/lessons/"),
+    (LessonViewSet, "retrieve", "get", "/api/classes/lessons/{lesson}/"),
+    (LessonViewSet, "attendance", "get", "/api/classes/lessons/{lesson}/attendance/"),
+    (LessonViewSet, "attendance", "post", "/api/classes/lessons/{lesson}/attendance/", ("admin", "teacher")),
+    (EnrollmentViewSet, "list", "get", "/api/classes/enrollments/"),
+    (EnrollmentViewSet, "retrieve", "get", "/api/classes/enrollments/{enrollment}/"),
+    (SearchView, "get", "get", "/api/classes/search/?q=lesson or section or mathematics"),
+    (AttendanceAnalyticsView, "get", "get", "/api/classes/analytics/attendance/?class_id={class}", ("admin", "teacher")),
+    (AssessmentViewSet, "list", "get", "/api/classes/assessments/"),
+    (AssessmentViewSet, "retrieve", "get", "/api/classes/assessments/{assessment}/"),
+    (AssessmentViewSet, "grades", "get", "/api/classes/assessments/{assessment}/grades/"),
+    (TranscriptView, "get", "get", "/api/classes/transcript/?student_id={student}"),
+]
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.algebra = make_class(name="Algebra - Section A")
+        Course.objects.filter(pk=self.algebra.course_id).update(
+            name="Linear Algebra", description="Vectors, matrices and eigenvalues for engineers."
+        )
+        self.archived = make_class(name="Algebra Revision", is_active=False)
+        self.spring = make_class(name="Algebra Workshop", semester="Spring 2025")
+        self.lesson = Lesson.objects.create(
+            class_instance=self.algebra, title="Eigenvalues",
+            description="Computing eigenvalues of a matrix by hand.", date=datetime(2024, 9, 2, tzinfo=timezone.utc),
+        )
+        Lesson.objects.create(
+            class_instance=self.algebra, title="Introduction", description="Course overview.",
+            date=datetime(2024, 9, 1, tzinfo=timezone.utc),
+        )
+        student_user = User.objects.create(username="searcher", role=User.Roles.STUDENT)
+        Student.objects.create(user=student_user)
+        self.admin = User.objects.create(username="search_admin", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(student_user)
+
+    def search(self, **params):
+        response = self.client.get("/api/classes/search/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_ranks_and_highlights_matches(self):
+        results = self.search(q="eigenvalue")
+        self.assertEqual([c["code"] for c in results["courses"]], [self.algebra.course.code])
+        self.assertIn("<mark>eigenvalues</mark>", results["courses"][0]["headline"])
+        # Teacher-entered text is escaped; only the match markers are HTML
+        Course.objects.filter(pk=self.algebra.course_id).update(
+            description="When a<b the eigenvalues & more"
+        )
+        headline = self.search(q="eigenvalue")["courses"][0]["headline"]
+        self.assertIn("a&lt;b the <mark>eigenvalues</mark> &amp; more", headline)
+        # Classes match through their course's text as well as their own
+        self.assertEqual([c["id"] for c in results["classes"]], [self.algebra.id])
+
+        results = self.search(q="algebra")
+        self.assertEqual([c["id"] for c in results["classes"]], [self.algebra.id, self.spring.id])
+        self.assertGreater(results["classes"][0]["rank"], results["classes"][1]["rank"])
+
+    def test_filters_by_semester_and_hides_inactive_classes_from_students(self):
+        results = self.search(q="algebra", semester="Spring 2025")
+        self.assertEqual([c["id"] for c in results["classes"]], [self.spring.id])
+        self.assertEqual(results["courses"], [])
+
+        results = self.search(q="algebra", is_active="false")
+        self.assertEqual(results["classes"], [])
+
+        self.client.force_authenticate(self.admin)
+        results = self.search(q="algebra", is_active="false")
+        self.assertEqual([c["id"] for c in results["classes"]], [self.archived.id])
+
+    def test_lessons_are_scoped_like_the_lesson_list(self):
+        self.assertEqual(self.search(q="matrix")["lessons"], [])
+
+        student = Student.objects.get(user__username="searcher")
+        services.enroll(student.id, self.algebra.id)
+        lessons = self.search(q="matrix")["lessons"]
+        self.assertEqual([l["id"] for l in lessons], [self.lesson.id])
+        self.assertEqual(lessons[0]["class_id"], self.algebra.id)
+
+    def test_admin_search_matches_text_and_related_names(self):
+        admin = site._registry[Class]
+        request = RequestFactory().get("/")
+        request.user = self.admin
+        teacher = self.algebra.teacher.user.username
+        for term, expected in (("eigenvalues", {self.algebra.id}), (teacher, {self.algebra.id}),
+                               (self.spring.course.code, {self.spring.id})):
+            queryset, _ = admin.get_search_results(request, Class.objects.all(), term)
+            self.assertEqual(set(queryset.values_list("id", flat=True)), expected, term)
+
+    def test_requires_a_query(self):
+        response = self.client.get("/api/classes/search/")
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogFilterTests(TestCase):
+    def setUp(self):
+        self.fall = make_class(max_students=1)
+        self.spring = make_class(semester="Spring 2025")
+        self.spring_same_course = make_class(semester="Spring 2025", course=self.fall.course, teacher=self.fall.teacher)
+        Teacher.objects.filter(pk=self.fall.teacher_id).update(department="Mathematics")
+        Teacher.objects.filter(pk=self.spring.teacher_id).update(department="Science")
+        services.enroll(make_students(1)[0].id, self.fall.id)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="catalog_admin", is_staff=True))
+
+    def list_classes(self, **params):
+        response = self.client.get("/api/classes/classes/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, body):
+        return sorted(row["id"] for row in body["results"])
+
+    def test_filters(self):
+        self.assertEqual(self.ids(self.list_classes(semester="Spring 2025")), [self.spring.id, self.spring_same_course.id])
+        self.assertEqual(self.ids(self.list_classes(course=self.fall.course_id)), [self.fall.id, self.spring_same_course.id])
+        self.assertEqual(self.ids(self.list_classes(department="Science")), [self.spring.id])
+        self.assertEqual(self.ids(self.list_classes(has_seats="false")), [self.fall.id])
+        self.assertEqual(self.ids(self.list_classes(semester="Spring 2025", department="Mathematics")), [self.spring_same_course.id])
+        self.assertNotIn("facets", self.list_classes())
+
+    def test_facets_ignore_their_own_filter(self):
+        body = self.list_classes(semester="Spring 2025", facets="true")
+        self.assertEqual(self.ids(body), [self.spring.id, self.spring_same_course.id])
+        facets = body["facets"]
+        self.assertEqual(facets["semester"], [{"value": "Spring 2025", "count": 2}, {"value": "Fall 2024", "count": 1}])
+        self.assertEqual(
+            sorted((row["value"], row["count"]) for row in facets["course"]),
+            [(self.fall.course_id, 1), (self.spring.course_id, 1)],
+        )
+        self.assertEqual(facets["department"], [{"value": "Mathematics", "count": 1}, {"value": "Science", "count": 1}])
+
+    def test_rejects_invalid_filters(self):
+        response = self.client.get("/api/classes/classes/", {"course": "maths"})
+        self.assertEqual(response.status_code, 400)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.class_instance = make_class(room="B12")
+        Lesson.objects.create(class_instance=self.class_instance, title="Intro", date=datetime(2024, 9, 2, tzinfo=timezone.utc))
+        services.enroll(make_students(1)[0].id, self.class_instance.id)
+        admin = User.objects.create(username="sparse_admin", is_staff=True)
+        get_role_context(admin)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [query["sql"] for query in queries]
+
+    def test_fields_limit_the_payload_and_the_columns_read(self):
+        body, queries = self.get(f"/api/classes/classes/{self.class_instance.id}/", fields="name,room")
+        self.assertEqual(body, {"name": "Math - Section A", "room": "B12"})
+        select = next(sql for sql in queries if '"classes_class"."room"' in sql)
+        self.assertNotIn('"classes_class"."schedule"', select)
+        self.assertNotIn("classes_course", select)
+        self.assertFalse(any(sql.startswith('SELECT "classes_lesson"') for sql in queries))
+
+    def test_unexpanded_relations_collapse_to_ids(self):
+        body, queries = self.get(f"/api/classes/classes/{self.class_instance.id}/", expand="course")
+        self.assertEqual(body["teacher"], self.class_instance.teacher_id)
+        self.assertEqual(body["course"]["code"], self.class_instance.course.code)
+        self.assertNotIn("lessons", body)
+
+        body, _ = self.get(f"/api/classes/classes/{self.class_instance.id}/")
+        self.assertEqual([lesson["title"] for lesson in body["lessons"]], ["Intro"])
+        self.assertEqual(body["teacher"]["id"], self.class_instance.teacher_id)
+
+    def test_list_endpoints(self):
+        body, queries = self.get("/api/classes/enrollments/", fields="id,class_instance", expand="")
+        self.assertEqual(body["results"][0]["class_instance"], self.class_instance.id)
+        self.assertEqual(len(queries), 2)
+
+        body, _ = self.get("/api/classes/lessons/", fields="title")
+        self.assertEqual(body["results"], [{"title": "Intro"}])
+
+    def test_unknown_names_are_rejected(self):
+        url = f"/api/classes/classes/{self.class_instance.id}/"
+        self.assertEqual(self.client.get(url, {"fields": "name,secret"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"expand": "students"}).status_code, 400)
+
+
+class FastPathTests(TestCase):
+    """The values() list paths must render exactly what the serializers do"""
+
+    def setUp(self):
+        full = make_class(max_students=1, room="A1")
+        User.objects.filter(pk=full.teacher.user_id).update(first_name="Ada", last_name="Lovelace")
+        nameless = make_class(semester="Spring 2025")
+        User.objects.filter(pk=nameless.teacher.user_id).update(first_name="", last_name=" Turing ")
+        for student in make_students(2):
+            services.enroll(student.id, nameless.id)
+        student = Student.objects.create(user=User.objects.create(username="overbooked"), grade="10", major="Physics")
+        services.enroll(student.id, full.id)
+        # Drift the counter past capacity so available_spots goes negative
+        Class.objects.filter(pk=full.pk).update(enrolled_count=3)
+        admin = User.objects.create(username="fast_admin", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def assertSameAsSerializer(self, viewset, url):
+        fast = self.client.get(url)
+        with mock.patch.object(viewset, "fast_list", None):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+        return fast.json()
+
+    def test_class_list(self):
+        body = self.assertSameAsSerializer(ClassViewSet, "/api/classes/classes/")
+        self.assertEqual(
+            [(row["teacher_name"], row["available_spots"]) for row in body["results"]],
+            [("Ada Lovelace", -2), ("Turing", 28)],
+        )
+
+    def test_enrollment_list(self):
+        body = self.assertSameAsSerializer(EnrollmentViewSet, "/api/classes/enrollments/?page_size=2")
+        self.assertIsNotNone(body["next"])
+        self.assertSameAsSerializer(EnrollmentViewSet, body["next"])
+
+    def test_sparse_requests_use_the_serializer(self):
+        response = self.client.get("/api/classes/classes/", {"fields": "name"})
+        self.assertEqual(response.json()["results"][0], {"name": "Math - Section A"})
+
+
+class EstimatedTotalTests(TestCase):
+    """`?total=estimate` on the cursor-paginated lists"""
+
+    def setUp(self):
+        self.big, self.small = make_class(), make_class()
+        Lesson.objects.bulk_create(
+            Lesson(class_instance=class_instance, title=f"Lesson {i}", date=datetime(2024, 9, 2, 9, tzinfo=timezone.utc))
+            for class_instance, count in ((self.big, 6), (self.small, 2)) for i in range(count)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Lesson._meta.db_table}")
+        self.client = APIClient()
+
+    def total(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get("/api/classes/lessons/", {"page_size": 1, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 1)
+        return response.json().get("estimated_total")
+
+    def test_only_reported_on_request(self):
+        admin = User.objects.create(username="admin", is_staff=True)
+        self.assertIsNone(self.total(admin))
+        self.assertIsNone(self.total(admin, total="exact"))
+
+    def test_small_results_are_counted_exactly(self):
+        admin = User.objects.create(username="admin", is_staff=True)
+        self.assertEqual(self.total(admin, total="estimate"), 8)
+        # Filtered down to one teacher's lessons
+        self.assertEqual(self.total(self.small.teacher.user, total="estimate"), 2)
+
+    @skipUnlessDBFeature("is_postgresql_13")
+    def test_large_results_use_the_planner_estimate(self):
+        admin = User.objects.create(username="admin", is_staff=True)
+        with mock.patch.object(IdCursorPagination, "exact_total_below", 4), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.total(admin, total="estimate"), 8)
+            # Below the threshold even with a large table behind the filter
+            self.assertEqual(self.total(self.small.teacher.user, total="estimate"), 2)
+        self.assertEqual(sum(query["sql"].startswith("EXPLAIN") for query in queries), 1)
+        self.assertEqual(estimate_count(Lesson.objects.all(), exact_below=4), 8)
+
+
+class ORJSONRendererTests(TestCase):
+    payload = {
+        "id": UUID("12345678-1234-5678-1234-567812345678"),
+        "at": datetime(2024, 9, 2, 9, 30, 0, 123456, tzinfo=timezone.utc),
+        "day": datetime(2024, 9, 2).date(),
+        "length": timedelta(minutes=90),
+        "score": Decimal("3.75"),
+        "notes": "caf\u00e9 \u2028 line",
+        "nested": [{"ok": True, "n": None, 1: "int key"}],
+        "ids": (1, 2),
+    }
+
+    def test_matches_json_renderer(self):
+        self.assertEqual(renderers.ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(renderers.ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+            body = io.BytesIO(b'{"attendance": []}')
+            self.assertEqual(renderers.ORJSONParser().parse(body), {"attendance": []})
+
+    def test_parser(self):
+        body = b'{"attendance": [{"lesson": 1, "notes": "\xc3\xa9"}]}'
+        self.assertEqual(renderers.ORJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        with self.assertRaises(ParseError):
+            renderers.ORJSONParser().parse(io.BytesIO(b'{"attendance": ['))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.class_instance = make_class()
+        other = make_class(semester="Spring 2025")
+        self.students = make_students(3)
+        for student in self.students:
+            services.enroll(student.id, self.class_instance.id)
+        services.enroll(self.students[0].id, other.id)
+        services.unenroll(self.students[2].id, self.class_instance.id)
+        lesson = Lesson.objects.create(class_instance=self.class_instance, title="Intro, part 1",
+                                       date=datetime(2024, 9, 2, 9, tzinfo=timezone.utc))
+        LessonAttendance.objects.create(lesson=lesson, student=self.students[0], status="late", notes='said "hi"')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="registrar", is_staff=True))
+
+    def export(self, dataset, **params):
+        response = self.client.get(f"/api/classes/export/{dataset}/", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response, body = self.export("enrollments", semester="Fall 2024")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="enrollments.csv"', response["Content-Disposition"])
+        lines = body.splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["enrollment_id", "student_id", "username"])
+        self.assertEqual(len(lines), 4)
+        self.assertEqual([line.split(",")[-2] for line in lines[1:]], ["true", "true", "false"])
+
+        _, body = self.export("attendance")
+        self.assertIn('"Intro, part 1",2024-09-02T09:00:00Z', body)
+        self.assertIn('late,"said ""hi"""', body)
+
+    def test_ndjson_rosters_only_list_active_students(self):
+        response, body = self.export("rosters", class_id=self.class_instance.id, format="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(sorted(row["student_id"] for row in rows), [s.id for s in self.students[:2]])
+        self.assertEqual(rows[0]["class_id"], self.class_instance.id)
+
+    def test_requires_staff_and_a_known_dataset(self):
+        self.assertEqual(self.client.get("/api/classes/export/grades/").status_code, 404)
+        self.client.force_authenticate(User.objects.create(username="nosy"))
+        self.assertEqual(self.client.get("/api/classes/export/enrollments/").status_code, 403)
+
+
+class ImportSchoolTests(TestCase):
+    USERS = (
+        "username,role,first_name,last_name,email,password,grade,department\n"
+        "t.rahimi,teacher,Neda,Rahimi,neda@school.test,,,Science\n"
+        "s.karimi,student,Ali,Karimi,,,9,\n"
+        "s.jafari,student,Sara,Jafari,,,10,\n"
+        "s.karimi,student,Ali,Karimi,,,9,\n"
+        "bad user,student,,,,,,\n"
+        "p.moradi,parent,Omid,Moradi,,,,\n"
+    )
+    CLASSES = (
+        "course_code,semester,name,teacher,max_students,schedule\n"
+        "MATH0,Fall 2024,Algebra,t.rahimi,1,Mon 9:00\n"
+        "NOPE1,Fall 2024,Algebra,t.rahimi,1,Mon 9:00\n"
+        "MATH0,Fall 2024,Geometry,nobody,20,Tue 9:00\n"
+    )
+    ENROLLMENTS = (
+        "student,course_code,semester,class_name,grade\n"
+        "s.karimi,MATH0,Fall 2024,Algebra,\n"
+        "s.jafari,MATH0,Fall 2024,Algebra,\n"
+        "s.nobody,MATH0,Fall 2024,Algebra,\n"
+    )
+
+    def setUp(self):
+        self.course = Course.objects.create(name="Mathematics", code="MATH0")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, body):
+        path = os.path.join(self.directory.name, f"{name}.csv")
+        with open(path, "w") as output:
+            output.write(body)
+        return path
+
+    def run_import(self, *args):
+        errors = os.path.join(self.directory.name, "errors.csv")
+        stdout = io.StringIO()
+        call_command(
+            "import_school",
+            "--users", self.write("users", self.USERS),
+            "--classes", self.write("classes", self.CLASSES),
+            "--enrollments", self.write("enrollments", self.ENROLLMENTS),
+            "--errors", errors, "--batch-size", "2", *args, stdout=stdout,
+        )
+        with open(errors) as report:
+            return list(csv.reader(report))[1:], stdout.getvalue()
+
+    def test_merges_valid_rows_and_reports_the_rest(self):
+        rejected, output = self.run_import()
+
+        self.assertEqual(rejected, [
+            ["users", "5", "username", "Duplicate username in this file."],
+            ["users", "6", "username",
+             "Enter a valid username. This value may contain only letters, numbers, and @/./+/-/_ characters."],
+            ["classes", "3", "course_code", "Unknown course code."],
+            ["classes", "4", "teacher", "Unknown teacher."],
+            ["enrollments", "3", "class_name", "This class is full."],
+            ["enrollments", "4", "student", "Unknown student."],
+        ])
+        self.assertIn("6 row(s) rejected", output)
+        teacher = Teacher.objects.get(user__username="t.rahimi")
+        self.assertEqual((teacher.department, teacher.user.role), ("Science", User.Roles.TEACHER))
+        self.assertFalse(teacher.user.has_usable_password())
+        self.assertEqual(Student.objects.get(user__username="s.jafari").grade, "10")
+        self.assertTrue(Parent.objects.filter(user__username="p.moradi").exists())
+
+        algebra = Class.objects.get(name="Algebra", course=self.course)
+        self.assertEqual((algebra.teacher, algebra.enrolled_count), (teacher, 1))
+        self.assertEqual(
+            list(algebra.enrollments.values_list("student__user__username", flat=True)), ["s.karimi"]
+        )
+
+        # Importing the same files again only updates what is already there
+        self.run_import()
+        self.assertEqual(User.objects.filter(username__in=["t.rahimi", "s.karimi", "p.moradi"]).count(), 3)
+        self.assertEqual(Class.objects.filter(name="Algebra").count(), 1)
+        algebra.refresh_from_db()
+        self.assertEqual(algebra.enrolled_count, 1)
+
+    def test_dry_run_rolls_back(self):
+        rejected, output = self.run_import("--dry-run")
+        self.assertEqual(len(rejected), 6)
+        self.assertIn("dry run", output)
+        self.assertFalse(User.objects.filter(username="t.rahimi").exists())
+        self.assertFalse(Class.objects.exists())
+
+    def test_keeps_schedules_and_waitlists_consistent(self):
+        monday, tuesday = ({"weekday": day, "start_time": time(9), "end_time": time(10)} for day in (0, 1))
+        algebra = make_class(max_students=1, course=self.course, name="Algebra", room="A1")
+        geometry = make_class(course=self.course, name="Geometry", room="B2")
+        calculus = make_class(course=self.course, name="Calculus", room="C3")
+        statistics = make_class(course=self.course, name="Statistics", room="D4")
+        for class_instance, meeting in ((algebra, monday), (geometry, monday), (calculus, tuesday), (statistics, tuesday)):
+            services.schedule_class(class_instance, [meeting])
+        seated, waiting, busy, queued, twice = make_students(5)
+        services.enroll(seated.id, algebra.id)
+        services.join_waitlist(waiting.id, algebra.id)
+        services.enroll(busy.id, geometry.id)
+        WaitlistEntry.objects.create(student=queued, class_instance=calculus)
+
+        self.USERS = "username,role\n"
+        self.CLASSES = "course_code,semester,name,teacher,max_students,schedule,room\n" + "".join(
+            f"MATH0,Fall 2024,{k.name},{k.teacher.user.username},{seats},Mon 9:00,{room}\n"
+            for k, seats, room in ((algebra, 3, "Z9"), (geometry, 30, "Z9"), (calculus, 30, "D4"))
+        )
+        self.ENROLLMENTS = "student,course_code,semester,class_name\n" + "".join(
+            f"{student.user.username},MATH0,Fall 2024,{k.name}\n"
+            for student, k in ((busy, algebra), (queued, calculus), (twice, calculus), (twice, statistics))
+        )
+        rejected, output = self.run_import()
+
+        self.assertEqual(rejected, [
+            ["classes", "3", "room", "The room is taken by another class at one of its meeting times."],
+            ["classes", "4", "room", "The room is taken by another class at one of its meeting times."],
+            ["enrollments", "2", "class_name", "This class clashes with Geometry in the student's schedule."],
+            ["enrollments", "5", "class_name", "This class clashes with Calculus in the student's schedule."],
+        ])
+        self.assertEqual(
+            sorted(ClassMeeting.objects.values_list("class_instance__name", "room")),
+            [("Algebra", "Z9"), ("Calculus", "C3"), ("Geometry", "B2"), ("Statistics", "D4")],
+        )
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertTrue(Enrollment.objects.filter(student=queued, class_instance=calculus, is_active=True).exists())
+        # The extra seats went to the waitlist once the file's enrollments were in
+        self.assertIn("1 student(s) promoted from waitlists", output)
+        self.assertEqual(
+            sorted(algebra.enrollments.filter(is_active=True).values_list("student_id", flat=True)),
+            [seated.id, waiting.id],
+        )
+        algebra.refresh_from_db()
+        self.assertEqual(algebra.enrolled_count, 2)
+
+    def test_hashes_only_the_passwords_of_created_users(self):
+        User.objects.create_user(username="s.jafari", password="kept", role=User.Roles.STUDENT)
+        self.USERS = (
+            "username,role,first_name,last_name,email,password,grade,department\n"
+            "s.karimi,student,Ali,Karimi,,Fjord-lantern-41,9,\n"
+            "s.jafari,student,Sara,Jafari,,Ignored-quartz-88,10,\n"
+            "s.karimi,student,Ali,Karimi,,Duplicate-heron-27,9,\n"
+            "p.moradi,parent,Omid,Moradi,,Second-marble-63,,\n"
+        )
+        with mock.patch("classes.imports.hash_passwords", wraps=imports.hash_passwords) as hashed:
+            self.run_import()
+
+        self.assertEqual(hashed.call_count, 1)
+        self.assertEqual(list(hashed.call_args.args[0]), ["Fjord-lantern-41", "Second-marble-63"])
+        self.assertTrue(User.objects.get(username="s.karimi").check_password("Fjord-lantern-41"))
+        self.assertTrue(User.objects.get(username="s.jafari").check_password("kept"))
+
+    def test_missing_columns(self):
+        self.USERS = "username,email\nsomeone,someone@school.test\n"
+        with self.assertRaisesMessage(CommandError, "users: missing column(s) role"):
+            self.run_import()
+
+
+@override_settings(SERIALIZER_CACHE_ENABLED=False)
+class QueryBudgetTests(TestCase):
+    """
+    Run every budgeted viewset action against a small and a large dataset,
+    as an admin, the class's teacher and one of its students.
+
+    Fails when an action's query count depends on the number of rows (an
+    N+1) or exceeds the budget declared on its viewset.
+    """
+    sizes = (10, 1000)
+
+    def measure(self, size):
+        counts = {}
+        with transaction.atomic():
+            ids = build_school(size)
+            users = {
+                "admin": User.objects.create(username=f"budget_admin_{size}", is_staff=True),
+                "teacher": Class.objects.get(pk=ids["class"]).teacher.user,
+                "student": Student.objects.get(pk=ids["student"]).user,
+            }
+            for role, user in users.items():
+                get_role_context(user)
+                client = APIClient()
+                client.force_authenticate(user)
+                for viewset, action, method, template, *roles in BUDGETED_REQUESTS:
+                    if role not in (roles[0] if roles else ROLES):
+                        continue
+                    url = template.format(**ids)
+                    data = {"attendance": ids["attendance"]} if method == "post" else None
+                    with CaptureQueriesContext(connection) as queries:
+                        response = getattr(client, method)(url, data, format="json")
+                    self.assertLess(response.status_code, 300, f"{role} {method.upper()} {url}: {response.content[:200]}")
+                    # Keyed by URL too: one action can be budgeted under several queries
+                    counts[(role, viewset, action, method, template)] = len(queries)
+            transaction.set_rollback(True)
+        return counts
+
+    def test_every_budgeted_action_is_exercised(self):
+        exercised = {(viewset, (action, method)) for viewset, action, method, *_ in BUDGETED_REQUESTS}
+        declared = {
+            (viewset, key)
+            for viewset in (CourseViewSet, ClassViewSet, LessonViewSet, EnrollmentViewSet, SearchView, AttendanceAnalyticsView,
+                            AssessmentViewSet, TranscriptView)
+            for key in viewset.query_budgets
+        }
+        self.assertEqual(exercised, declared)
+
+    def test_query_counts_are_flat_and_within_budget(self):
+        small, large = (self.measure(size) for size in self.sizes)
+        self.assertEqual(
+            len(small), sum(len(request[4]) if len(request) > 4 else len(ROLES) for request in BUDGETED_REQUESTS)
+        )
+        for key, count in small.items():
+            role, viewset, action, method, template = key
+            label = f"{viewset.__name__}.{action} ({method.upper()} {template} as {role})"
+            with self.subTest(label):
+                self.assertEqual(
+                    large[key], count,
+                    f"{label} issued {count} queries for {self.sizes[0]} rows but {large[key]} for {self.sizes[1]}",
+                )
+                self.assertLessEqual(count, viewset.query_budgets[action, method], f"{label} is over its query budget")
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class EnrollmentConcurrencyTests(TransactionTestCase):
+    """Hammer a small class from many threads, as happens when registration opens"""
+
+    threads = 40
+    seats = 7
+
+    def test_concurrent_enrollments_never_overbook(self):
+        class_instance = make_class(max_students=self.seats)
+        students = make_students(self.threads)
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def worker(student):
+            barrier.wait()
+            try:
+                services.enroll(student.id, class_instance.id)
+                outcomes.append("enrolled")
+            except services.EnrollmentError:
+                outcomes.append("rejected")
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(student,)) for student in students]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        class_instance.refresh_from_db()
+        self.assertEqual(outcomes.count("enrolled"), self.seats)
+        self.assertEqual(outcomes.count("rejected"), self.threads - self.seats)
+        self.assertEqual(Enrollment.objects.filter(is_active=True).count(), self.seats)
+        self.assertEqual(class_instance.enrolled_count, self.seats)
+
+    def test_concurrent_duplicate_requests_do_not_raise_integrity_errors(self):
+        class_instance = make_class(max_students=self.seats)
+        student = make_students(1)[0]
+        barrier = threading.Barrier(10)
+        errors = []
+
+        def worker():
+            barrier.wait()
+            try:
+                services.enroll(student.id, class_instance.id)
+            except services.EnrollmentError:
+                pass
+            except Exception as exc:  # an IntegrityError here is the bug we guard against
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        class_instance.refresh_from_db()
+        self.assertEqual(errors, [])
+        self.assertEqual(class_instance.enrolled_count, 1)
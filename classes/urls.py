@@ -1,14 +1,22 @@
 # classes/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CourseViewSet, ClassViewSet, LessonViewSet, EnrollmentViewSet
+from .views import (
+    AssessmentViewSet, AttendanceAnalyticsView, CourseViewSet, ClassViewSet, LessonViewSet, EnrollmentViewSet,
+    ExportView, SearchView, TranscriptView
+)
 
 router = DefaultRouter()
 router.register(r'courses', CourseViewSet, basename='course')
 router.register(r'classes', ClassViewSet, basename='class')
 router.register(r'lessons', LessonViewSet, basename='lesson')
 router.register(r'enrollments', EnrollmentViewSet, basename='enrollment')
+router.register(r'assessments', AssessmentViewSet, basename='assessment')
 
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='search'),
+    path('export/<str:dataset>/', ExportView.as_view(), name='export'),
+    path('analytics/attendance/', AttendanceAnalyticsView.as_view(), name='attendance-analytics'),
+    path('transcript/', TranscriptView.as_view(), name='transcript'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
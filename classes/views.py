@@ -1,21 +1,49 @@
 # classes/views.py
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Course, Class, Lesson, Enrollment, LessonAttendance
+from rest_framework.views import APIView
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, F, OuterRef, Q, Value
+from django.http import Http404, StreamingHttpResponse
+from accounts.roles import get_role_context
+from students.models import Student
+from backend.conditional import ConditionalGetMixin
+from backend.renderers import CSVRenderer, NDJSONRenderer
+from backend.sparse import SparseFieldsViewMixin
+from .models import (
+    Assessment, AttendanceSummary, Course, Class, Lesson, Enrollment, LessonAttendance, WeeklyAttendance
+)
+from . import analytics, gradebook, rollover, search, services
+from .exports import EXPORTS
+from .fastpath import FastListMixin, class_list_values, class_list_row, enrollment_values, enrollment_row
+from .filters import CatalogFilterBackend, facet_counts
+from .pagination import LessonCursorPagination, EnrollmentCursorPagination
 from .serializers import (
     CourseSerializer, ClassSerializer, ClassListSerializer,
-    LessonSerializer, EnrollmentSerializer, LessonAttendanceSerializer
+    LessonSerializer, EnrollmentSerializer, LessonAttendanceSerializer,
+    SearchParamsSerializer, CourseSearchSerializer, ClassSearchSerializer, LessonSearchSerializer,
+    ExportParamsSerializer, RolloverSerializer, CohortEnrollmentSerializer,
+    AttendanceAnalyticsParamsSerializer, ClassAttendanceSerializer, StudentAttendanceSerializer,
+    WeeklyAttendanceSerializer, AssessmentSerializer, AssessmentGradeSerializer,
+    TranscriptParamsSerializer, TranscriptSerializer
 )
 
+def owner_teacher_id(obj):
+    """Teacher id owning a class, or the class of a lesson or assessment"""
+    if isinstance(obj, (Lesson, Assessment)):
+        return obj.class_instance.teacher_id
+    return obj.teacher_id
+
 class IsTeacherOwnerOrAdmin(permissions.BasePermission):
     """Allow access to class owner (teacher) or admin"""
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        if hasattr(request.user, 'teacher_profile'):
-            return obj.teacher == request.user.teacher_profile
+        role = get_role_context(request.user)
+        if role.is_teacher:
+            return owner_teacher_id(obj) == role.teacher_id
         return False
 
 class IsEnrolledStudentOrTeacherOrAdmin(permissions.BasePermission):
@@ -23,16 +51,22 @@ class IsEnrolledStudentOrTeacherOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        if hasattr(request.user, 'teacher_profile'):
-            return obj.teacher == request.user.teacher_profile
-        if hasattr(request.user, 'student_profile'):
+        role = get_role_context(request.user)
+        if role.is_teacher:
+            return obj.teacher_id == role.teacher_id
+        if role.is_student:
+            # Set by ClassViewSet.get_queryset when it already matched the enrollment
+            if getattr(obj, 'student_enrolled', False):
+                return True
             return obj.enrollments.filter(
-                student=request.user.student_profile, 
+                student_id=role.student_id, 
                 is_active=True
             ).exists()
         return False
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    # Max queries per (action, HTTP method), for every role; enforced by classes.tests.QueryBudgetTests
+    query_budgets = {('list', 'get'): 2, ('retrieve', 'get'): 2}
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     
@@ -41,8 +75,18 @@ class CourseViewSet(viewsets.ModelViewSet):
             return [permissions.IsAdminUser()]
         return [permissions.IsAuthenticated()]
 
-class ClassViewSet(viewsets.ModelViewSet):
+class ClassViewSet(SparseFieldsViewMixin, ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
+    query_budgets = {('list', 'get'): 3, ('retrieve', 'get'): 4, ('lessons', 'get'): 3, ('enrollments', 'get'): 2}
     queryset = Class.objects.select_related('teacher__user', 'course').filter(is_active=True)
+    filter_backends = [CatalogFilterBackend]
+    fast_list = (class_list_values, class_list_row)
+    
+    @property
+    def conditional_related(self):
+        # Lists embed the teacher's name; the detail view nests the teacher and lessons
+        if self.action == 'retrieve':
+            return ('course', 'lessons', 'teacher', 'teacher__user')
+        return ('course', 'teacher__user')
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -52,113 +96,210 @@ class ClassViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [permissions.IsAuthenticated(), IsTeacherOwnerOrAdmin()]
+        elif self.action == 'rollover':
+            return [permissions.IsAdminUser()]
+        elif self.action == 'finalize_grades':
+            return [permissions.IsAuthenticated(), IsTeacherOwnerOrAdmin()]
         elif self.action in ['retrieve', 'lessons', 'enrollments']:
             return [permissions.IsAuthenticated(), IsEnrolledStudentOrTeacherOrAdmin()]
         return [permissions.IsAuthenticated()]
     
     def get_queryset(self):
         user = self.request.user
+        role = get_role_context(user)
         queryset = self.queryset
         
         # Filter based on user type
-        if hasattr(user, 'teacher_profile') and not user.is_staff:
+        if role.is_teacher and not user.is_staff:
             # Teachers see only their classes
-            queryset = queryset.filter(teacher=user.teacher_profile)
-        elif hasattr(user, 'student_profile') and not user.is_staff:
+            queryset = queryset.filter(teacher_id=role.teacher_id)
+        elif role.is_student and not user.is_staff:
             # Students see all active classes or their enrolled classes
-            if self.action == 'list':
+            if self.action in ['list', 'enroll', 'waitlist']:
                 # Show all available classes for enrollment
                 pass
             else:
                 # For detail views, show only enrolled classes
                 queryset = queryset.filter(
-                    enrollments__student=user.student_profile,
+                    enrollments__student_id=role.student_id,
                     enrollments__is_active=True
-                )
+                ).annotate(student_enrolled=Value(True))
         
-        return queryset
+        return self.shape_queryset(queryset)
+    
+    def list(self, request, *args, **kwargs):
+        backend = CatalogFilterBackend()
+        if not backend.get_params(request)['facets']:
+            return super().list(request, *args, **kwargs)
+        
+        # Facet counts ignore their own filter, so they depend on every visible class
+        base = self.get_queryset()
+        conditions = backend.get_conditions(request, self)
+        
+        def respond():
+            response = super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+            response.data['facets'] = facet_counts(base, conditions)
+            return response
+        
+        return self.conditional_response(base, respond)
     
     def perform_create(self, serializer):
         # Auto-assign teacher if not admin
-        teacher_profile = getattr(self.request.user, 'teacher_profile', None)
-        if teacher_profile and not self.request.user.is_staff:
-            serializer.save(teacher=teacher_profile)
+        role = get_role_context(self.request.user)
+        if role.is_teacher and not self.request.user.is_staff:
+            serializer.save(teacher_id=role.teacher_id)
         else:
             serializer.save()
     
+    @action(detail=False, methods=['post'])
+    def rollover(self, request):
+        """Clone a semester's classes into a new semester and generate their lessons (admin only)"""
+        params = RolloverSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        try:
+            summary = rollover.rollover(
+                data['source_semester'], data['semester'], data['starts'], data['ends'],
+                keep_teachers=data['keep_teachers'], keep_rooms=data['keep_rooms'], teacher_id=data['teacher_id'],
+            )
+        except rollover.RolloverError as exc:
+            return Response({'error': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        created = summary['cloned'] or summary['lessons']
+        return Response(summary, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
     @action(detail=True, methods=['get'])
     def lessons(self, request, pk=None):
         """Get all lessons for a class"""
         class_instance = self.get_object()
-        lessons = class_instance.lessons.all().order_by('date')
-        serializer = LessonSerializer(lessons, many=True)
-        return Response(serializer.data)
+        lessons = class_instance.lessons.all()
+        
+        def respond():
+            paginator = LessonCursorPagination()
+            page = paginator.paginate_queryset(lessons, request, view=self)
+            serializer = LessonSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        
+        return self.conditional_response(lessons, respond, related=())
     
     @action(detail=True, methods=['get'])
     def enrollments(self, request, pk=None):
         """Get all enrollments for a class (teacher/admin only)"""
         class_instance = self.get_object()
+        role = get_role_context(request.user)
         if not (request.user.is_staff or 
-                (hasattr(request.user, 'teacher_profile') and 
-                 class_instance.teacher == request.user.teacher_profile)):
+                (role.is_teacher and class_instance.teacher_id == role.teacher_id)):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        enrollments = class_instance.enrollments.filter(is_active=True)
-        serializer = EnrollmentSerializer(enrollments, many=True)
-        return Response(serializer.data)
+        enrollments = class_instance.enrollments.filter(is_active=True).select_related(
+            'student', 'class_instance__course', 'class_instance__teacher__user'
+        )
+        paginator = EnrollmentCursorPagination()
+        page = paginator.paginate_queryset(enrollments, request, view=self)
+        serializer = EnrollmentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def enroll(self, request, pk=None):
         """Enroll current user (student) in this class"""
-        if not hasattr(request.user, 'student_profile'):
+        role = get_role_context(request.user)
+        if not role.is_student:
             return Response({'error': 'Only students can enroll in classes'}, 
                           status=status.HTTP_403_FORBIDDEN)
         
         class_instance = self.get_object()
-        data = {'class_id': class_instance.id}
-        serializer = EnrollmentSerializer(data=data, context={'request': request})
-        
-        if serializer.is_valid():
-            serializer.save(student=request.user.student_profile, class_instance=class_instance)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            enrollment = services.enroll(role.student_id, class_instance.id)
+        except services.EnrollmentError as exc:
+            return Response({'error': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = EnrollmentSerializer(enrollment, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['post'])
     def unenroll(self, request, pk=None):
         """Unenroll current user from this class"""
-        if not hasattr(request.user, 'student_profile'):
+        role = get_role_context(request.user)
+        if not role.is_student:
             return Response({'error': 'Only students can unenroll from classes'}, 
                           status=status.HTTP_403_FORBIDDEN)
         
         class_instance = self.get_object()
         try:
-            enrollment = Enrollment.objects.get(
-                student=request.user.student_profile,
-                class_instance=class_instance,
-                is_active=True
-            )
-            enrollment.is_active = False
-            enrollment.save()
-            return Response({'message': 'Successfully unenrolled'})
-        except Enrollment.DoesNotExist:
-            return Response({'error': 'You are not enrolled in this class'}, 
-                          status=status.HTTP_400_BAD_REQUEST)
+            services.unenroll(role.student_id, class_instance.id)
+        except services.EnrollmentError as exc:
+            return Response({'error': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message': 'Successfully unenrolled'})
+    
+    @action(detail=True, methods=['get', 'post', 'delete'])
+    def waitlist(self, request, pk=None):
+        """
+        The current student's place on the waitlist of this (full) class.
+        
+        POST joins the waitlist, DELETE leaves it and GET returns the position
+        (1 = next in line) in a single query, so clients can poll it instead
+        of the enroll endpoint. Seats are handed out automatically.
+        """
+        role = get_role_context(request.user)
+        if not role.is_student:
+            return Response({'error': 'Only students can join waitlists'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        if request.method == 'GET':
+            # Not get_object(), to keep the poll at one query; a pk that is not
+            # a class id simply has no waitlist entry
+            try:
+                class_id = Class._meta.pk.to_python(pk)
+            except ValidationError:
+                raise Http404("You are not on the waitlist for this class")
+            position = services.waitlist_position(role.student_id, class_id)
+            if position is None:
+                raise Http404("You are not on the waitlist for this class")
+            return Response(self._waitlist_position(position))
+        
+        class_instance = self.get_object()
+        try:
+            if request.method == 'DELETE':
+                services.leave_waitlist(role.student_id, class_instance.id)
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            position = services.join_waitlist(role.student_id, class_instance.id)
+        except services.EnrollmentError as exc:
+            return Response({'error': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self._waitlist_position(position), status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'], url_path='finalize-grades')
+    def finalize_grades(self, request, pk=None):
+        """Turn the weighted assessment scores of this class into letter grades (teacher/admin only)"""
+        class_instance = self.get_object()
+        return Response({'graded': gradebook.finalize(class_instance.id)})
+    
+    def _waitlist_position(self, position):
+        return {
+            'class_id': position['class_instance_id'],
+            'position': position['position'],
+            'waiting': position['waiting'],
+            'joined_at': position['joined_at'],
+        }
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    query_budgets = {
+        ('list', 'get'): 2, ('retrieve', 'get'): 2, ('attendance', 'get'): 3, ('attendance', 'post'): 9,
+    }
     serializer_class = LessonSerializer
+    pagination_class = LessonCursorPagination
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'teacher_profile') and not user.is_staff:
+        role = get_role_context(user)
+        lessons = Lesson.objects.all()
+        if role.is_teacher and not user.is_staff:
             # Teachers see lessons from their classes
-            return Lesson.objects.filter(class_instance__teacher=user.teacher_profile)
-        elif hasattr(user, 'student_profile') and not user.is_staff:
+            lessons = lessons.filter(class_instance__teacher_id=role.teacher_id)
+        elif role.is_student and not user.is_staff:
             # Students see lessons from their enrolled classes
-            return Lesson.objects.filter(
-                class_instance__enrollments__student=user.student_profile,
+            lessons = lessons.filter(
+                class_instance__enrollments__student_id=role.student_id,
                 class_instance__enrollments__is_active=True
             )
-        return Lesson.objects.all()
+        return self.shape_queryset(lessons)
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -172,60 +313,333 @@ class LessonViewSet(viewsets.ModelViewSet):
         
         if request.method == 'GET':
             # Get attendance records
-            attendance = lesson.attendance.all()
-            serializer = LessonAttendanceSerializer(attendance, many=True)
-            return Response(serializer.data)
+            attendance = lesson.attendance.select_related('student__user', 'lesson')
+            return self.conditional_response(
+                attendance,
+                lambda: Response(LessonAttendanceSerializer(attendance, many=True).data),
+                related=('student__user', 'lesson'),
+            )
         
         elif request.method == 'POST':
             # Record attendance (teacher only)
+            role = get_role_context(request.user)
             if not (request.user.is_staff or 
-                    (hasattr(request.user, 'teacher_profile') and 
-                     lesson.class_instance.teacher == request.user.teacher_profile)):
+                    (role.is_teacher and lesson.class_instance.teacher_id == role.teacher_id)):
                 return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
             
-            # Bulk create/update attendance
-            attendance_data = request.data.get('attendance', [])
-            for item in attendance_data:
-                item['lesson'] = lesson.id
-                serializer = LessonAttendanceSerializer(data=item)
-                if serializer.is_valid():
-                    LessonAttendance.objects.update_or_create(
-                        lesson=lesson,
-                        student_id=item['student'],
-                        defaults={
-                            'status': item['status'],
-                            'notes': item.get('notes', '')
-                        }
-                    )
-            
-            return Response({'message': 'Attendance recorded successfully'})
+            return self._record_attendance(request, lesson_id=lesson.id)
+    
+    @action(detail=False, methods=['post'], url_path='attendance')
+    def bulk_attendance(self, request):
+        """Record attendance for rows spanning several lessons (e.g. a whole day)"""
+        return self._record_attendance(request)
+    
+    def _record_attendance(self, request, lesson_id=None):
+        attendance_data = request.data.get('attendance', [])
+        if not isinstance(attendance_data, list):
+            return Response({'error': 'attendance must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        recorded, errors = services.record_attendance(attendance_data, request.user, lesson_id=lesson_id)
+        if errors and not recorded:
+            return Response({'recorded': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': 'Attendance recorded successfully',
+            'recorded': recorded,
+            'errors': errors,
+        })
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(SparseFieldsViewMixin, ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
+    query_budgets = {('list', 'get'): 2, ('retrieve', 'get'): 2}
     serializer_class = EnrollmentSerializer
+    pagination_class = EnrollmentCursorPagination
+    conditional_related = ('student', 'class_instance', 'class_instance__course', 'class_instance__teacher__user')
+    fast_list = (enrollment_values, enrollment_row)
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'student_profile') and not user.is_staff:
+        role = get_role_context(user)
+        enrollments = Enrollment.objects.select_related(
+            'student', 'class_instance__course', 'class_instance__teacher__user'
+        )
+        if role.is_student and not user.is_staff:
             # Students see only their enrollments
-            return Enrollment.objects.filter(student=user.student_profile, is_active=True)
-        elif hasattr(user, 'teacher_profile') and not user.is_staff:
+            enrollments = enrollments.filter(student_id=role.student_id)
+        elif role.is_teacher and not user.is_staff:
             # Teachers see enrollments in their classes
-            return Enrollment.objects.filter(
-                class_instance__teacher=user.teacher_profile,
-                is_active=True
-            )
-        return Enrollment.objects.filter(is_active=True)
+            enrollments = enrollments.filter(class_instance__teacher_id=role.teacher_id)
+        return self.shape_queryset(enrollments.filter(is_active=True))
     
     def get_permissions(self):
         if self.action in ['create']:
             return [permissions.IsAuthenticated()]  # Students can enroll themselves
-        elif self.action in ['destroy', 'update', 'partial_update']:
+        elif self.action in ['destroy', 'update', 'partial_update', 'bulk']:
             return [permissions.IsAdminUser()]  # Only admins can modify enrollments directly
         return [permissions.IsAuthenticated()]
     
     def perform_create(self, serializer):
         # Students can only enroll themselves
-        if hasattr(self.request.user, 'student_profile') and not self.request.user.is_staff:
-            serializer.save(student=self.request.user.student_profile)
+        role = get_role_context(self.request.user)
+        if role.is_student and not self.request.user.is_staff:
+            serializer.save(student_id=role.student_id)
+        else:
+            serializer.save()
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Enroll a cohort (`student_ids`, or every student of a `grade`) in
+        `class_ids` in one transaction; students who do not fit a class are
+        listed in `rejected` with the reason.
+        """
+        params = CohortEnrollmentSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        if 'grade' in data:
+            student_ids = Student.objects.filter(grade=data['grade']).order_by('pk').values_list('pk', flat=True)
         else:
-            serializer.save()
\ No newline at end of file
+            student_ids = data['student_ids']
+        try:
+            enrolled, rejected = services.enroll_cohort(list(student_ids), data['class_ids'])
+        except services.EnrollmentError as exc:
+            return Response({'error': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        if rejected and not enrolled:
+            return Response({'enrolled': 0, 'rejected': rejected}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'enrolled': enrolled, 'rejected': rejected}, status=status.HTTP_201_CREATED)
+
+class AssessmentViewSet(viewsets.ModelViewSet):
+    """
+    Weighted assessments of a class (`?class_id=` narrows the list). Teachers
+    manage and grade their own classes' assessments; students see those of
+    their classes, and only their own grades.
+    """
+    query_budgets = {('list', 'get'): 2, ('retrieve', 'get'): 1, ('grades', 'get'): 2}
+    serializer_class = AssessmentSerializer
+    
+    def get_queryset(self):
+        user = self.request.user
+        role = get_role_context(user)
+        assessments = Assessment.objects.select_related('class_instance')
+        if role.is_teacher and not user.is_staff:
+            assessments = assessments.filter(class_instance__teacher_id=role.teacher_id)
+        elif role.is_student and not user.is_staff:
+            assessments = assessments.filter(Exists(Enrollment.objects.filter(
+                class_instance_id=OuterRef('class_instance_id'), student_id=role.student_id, is_active=True
+            )))
+        elif not user.is_staff:
+            return assessments.none()
+        class_id = self.request.query_params.get('class_id')
+        if class_id and class_id.isdigit():
+            assessments = assessments.filter(class_instance_id=class_id)
+        return assessments
+    
+    def get_permissions(self):
+        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+            return [permissions.IsAuthenticated(), IsTeacherOwnerOrAdmin()]
+        return [permissions.IsAuthenticated()]
+    
+    def _check_owner(self, class_instance):
+        role = get_role_context(self.request.user)
+        if not (self.request.user.is_staff or (role.is_teacher and class_instance.teacher_id == role.teacher_id)):
+            raise PermissionDenied("You can only manage assessments of your own classes.")
+    
+    def perform_create(self, serializer):
+        self._check_owner(serializer.validated_data['class_instance'])
+        serializer.save()
+    
+    def perform_update(self, serializer):
+        assessment = serializer.save()
+        # Weights and maximum points feed every score of the class
+        gradebook.rescore(assessment.class_instance_id)
+    
+    def perform_destroy(self, instance):
+        class_id = instance.class_instance_id
+        instance.delete()
+        gradebook.rescore(class_id)
+    
+    @action(detail=True, methods=['get', 'post'])
+    def grades(self, request, pk=None):
+        """
+        GET lists the grades of this assessment (a student only gets their
+        own); POST records `grades`, a list of {student, points} rows, and
+        updates the students' weighted scores.
+        """
+        assessment = self.get_object()
+        role = get_role_context(request.user)
+        
+        if request.method == 'GET':
+            grades = assessment.grades.select_related('student__user').order_by('student_id')
+            if role.is_student and not request.user.is_staff:
+                grades = grades.filter(student_id=role.student_id)
+            return Response(AssessmentGradeSerializer(grades, many=True).data)
+        
+        self._check_owner(assessment.class_instance)
+        rows = request.data.get('grades', [])
+        if not isinstance(rows, list):
+            return Response({'error': 'grades must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        recorded, errors = services.record_grades(assessment, rows)
+        if errors and not recorded:
+            return Response({'recorded': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'recorded': recorded, 'errors': errors})
+
+class SearchView(APIView):
+    """
+    Full-text search across courses, classes and lessons.
+    
+    `?q=` uses web search syntax; `semester` and `is_active` narrow the classes
+    and lessons searched (and the courses, to those with a matching class).
+    Classes and lessons are scoped like their list endpoints; only staff can
+    search inactive classes.
+    """
+    query_budgets = {('get', 'get'): 3}
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        params = SearchParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = search.parse_query(params.validated_data['q'])
+        limit = params.validated_data['limit']
+        
+        class_filters = {}
+        if params.validated_data.get('semester'):
+            class_filters['semester'] = params.validated_data['semester']
+        if params.validated_data['is_active'] is not None:
+            class_filters['is_active'] = params.validated_data['is_active']
+        
+        courses = Course.objects.all()
+        if class_filters:
+            courses = courses.filter(Exists(Class.objects.filter(course=OuterRef('pk'), **class_filters)))
+        classes, lessons = self.get_scoped_querysets(request.user)
+        classes = classes.filter(**class_filters)
+        lessons = lessons.filter(**{f'class_instance__{key}': value for key, value in class_filters.items()})
+        
+        return Response({
+            'courses': CourseSearchSerializer(search.search_courses(query, courses, limit), many=True).data,
+            'classes': ClassSearchSerializer(search.search_classes(query, classes, limit), many=True).data,
+            'lessons': LessonSearchSerializer(search.search_lessons(query, lessons, limit), many=True).data,
+        })
+    
+    def get_scoped_querysets(self, user):
+        """Classes and lessons this user may see, mirroring ClassViewSet.list and LessonViewSet"""
+        role = get_role_context(user)
+        classes = Class.objects.all()
+        lessons = Lesson.objects.all()
+        if not user.is_staff:
+            classes = classes.filter(is_active=True)
+            lessons = lessons.filter(class_instance__is_active=True)
+        if role.is_teacher and not user.is_staff:
+            classes = classes.filter(teacher_id=role.teacher_id)
+            lessons = lessons.filter(class_instance__teacher_id=role.teacher_id)
+        elif role.is_student and not user.is_staff:
+            lessons = lessons.filter(
+                class_instance__enrollments__student_id=role.student_id,
+                class_instance__enrollments__is_active=True
+            )
+        return classes, lessons
+
+class AttendanceAnalyticsView(APIView):
+    """
+    Attendance rates per class, per student and (for one `class_id`) per
+    week, read from the summary tables kept by classes.analytics.
+    
+    Students are listed lowest attendance first and flagged
+    `chronic_absence` when they missed at least 10% of at least five
+    lessons; `chronic=true` lists only them. Teachers see their own
+    classes, admins every class.
+    """
+    query_budgets = {('get', 'get'): 4}
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        role = get_role_context(request.user)
+        if not (request.user.is_staff or role.is_teacher):
+            return Response({'error': 'Only teachers and admins can see attendance analytics'},
+                          status=status.HTTP_403_FORBIDDEN)
+        params = AttendanceAnalyticsParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        
+        filters = {}
+        if not request.user.is_staff:
+            filters['class_instance__teacher_id'] = role.teacher_id
+        if 'class_id' in data:
+            filters['class_instance_id'] = data['class_id']
+        if data.get('semester'):
+            filters['class_instance__semester'] = data['semester']
+        summaries = AttendanceSummary.objects.filter(**filters)
+        
+        students = analytics.student_rates(summaries.select_related('student__user'))
+        if 'student_id' in data:
+            students = students.filter(student_id=data['student_id'])
+        if data['chronic'] is not None:
+            students = students.filter(chronic_absence=data['chronic'])
+        students = students.order_by(F('rate').asc(nulls_last=True), 'student_id', 'class_instance_id')
+        
+        body = {
+            'classes': ClassAttendanceSerializer(
+                analytics.class_rates(summaries).order_by('class_instance_id'), many=True
+            ).data,
+            'students': StudentAttendanceSerializer(students[:data['limit']], many=True).data,
+        }
+        if 'class_id' in data:
+            weeks = WeeklyAttendance.objects.filter(**filters)
+            body['weeks'] = WeeklyAttendanceSerializer(analytics.week_rates(weeks), many=True).data
+        return Response(body)
+
+class TranscriptView(APIView):
+    """
+    A student's letter grades by semester with credit-weighted GPAs (see
+    classes.gradebook). Students get their own transcript; admins, and
+    teachers of one of the student's classes, pass `student_id`.
+    """
+    query_budgets = {('get', 'get'): 3}
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        params = TranscriptParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        role = get_role_context(request.user)
+        student_id = params.validated_data.get('student_id')
+        if student_id is None:
+            if not role.is_student:
+                return Response({'error': 'student_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+            student_id = role.student_id
+        
+        allowed = request.user.is_staff or (role.is_student and student_id == role.student_id)
+        if not allowed and role.is_teacher:
+            allowed = Enrollment.objects.filter(
+                student_id=student_id, class_instance__teacher_id=role.teacher_id
+            ).exists()
+        if not allowed:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        transcript = gradebook.transcript(student_id)
+        if transcript is None:
+            raise Http404("Student not found")
+        return Response(TranscriptSerializer(transcript).data)
+
+class ExportView(APIView):
+    """
+    Stream an export (see classes.exports) as CSV or NDJSON.
+    
+    Pick the format with `?format=csv|ndjson` or the Accept header; filter
+    with `semester` and `class_id`. Rows are read through a server-side
+    cursor and written as they arrive, so memory use does not grow with
+    the export.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+    
+    def get(self, request, dataset):
+        export = EXPORTS.get(dataset)
+        if export is None:
+            raise Http404(f"Unknown export '{dataset}'")
+        params = ExportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        
+        renderer = request.accepted_renderer
+        rows = export.rows(**params.validated_data)
+        response = StreamingHttpResponse(
+            renderer.stream(export.header, rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{renderer.format}"'
+        return response
@@ -1,11 +1,13 @@
 
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Now
 
 class Parent(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="parent_profile")
     phone = models.CharField(max_length=30, blank=True)
     address = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
 
     def __str__(self):
         return f"Parent<{self.user.username}>"
@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from backend.serialization_cache import CachedSerializerMixin
 from .models import Parent
 
-class ParentSerializer(serializers.ModelSerializer):
+class ParentSerializer(CachedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Parent
         fields = ["id", "user", "phone", "address"]
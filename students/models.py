@@ -1,11 +1,13 @@
 # Create your models here.
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Now
 
 class Student(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="student_profile")
     grade = models.CharField(max_length=50, blank=True)
     major = models.CharField(max_length=100, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
 
     def __str__(self):
         return f"Student<{self.user.username}>"
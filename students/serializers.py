@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from backend.serialization_cache import CachedSerializerMixin
 from .models import Student
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(CachedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Student
         fields = ["id", "user", "grade", "major"]
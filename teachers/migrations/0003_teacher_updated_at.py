@@ -0,0 +1,19 @@
+# Generated by Django 5.0.7 on 2026-10-18 21:03
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teachers', '0002_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teacher',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now()),
+        ),
+    ]
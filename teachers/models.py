@@ -3,11 +3,18 @@ from django.db import models
 # Create your models here.
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Now
 
 class Teacher(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="teacher_profile")
     department = models.CharField(max_length=100, blank=True)
     bio = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["department"], name="teacher_department_idx"),
+        ]
 
     def __str__(self):
         return f"Teacher<{self.user.username}>"
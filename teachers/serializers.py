@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from backend.serialization_cache import CachedSerializerMixin
 from .models import Teacher
 
-class TeacherSerializer(serializers.ModelSerializer):
+class TeacherSerializer(CachedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Teacher
         fields = ["id", "user", "department", "bio"]